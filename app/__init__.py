@@ -1,20 +1,40 @@
 import os
 import secrets
+from typing import Optional
 from urllib.parse import quote_plus
 
 from dotenv import load_dotenv
-from flask import Flask, redirect, url_for
+from flask import Flask
 
 from .context import (
+    assets,
+    compressor,
     db,
+    fragment_cache,
+    gae,
+    like_buffer,
     login_manager,
+    metrics,
     provider_manager,
+    purge_queue,
+    shelf_cache,
+    storage_manager,
+    suggest_index,
+    transcode_queue,
+    view_buffer,
 )
 
 
-def create_app():
+# config overrides the environment, e.g. to point the tests at their own
+# database
+def create_app(config: Optional[dict] = None):
     app = Flask(__name__, template_folder="../templates", static_folder="../static")
-    app.secret_key = secrets.token_urlsafe(16)
+
+    if gae.SECRET_KEY:
+        app.secret_key = gae.SECRET_KEY
+    else:
+        print("No session key configured, sessions will not survive restarts.")
+        app.secret_key = secrets.token_urlsafe(16)
 
     load_dotenv()
 
@@ -30,13 +50,40 @@ def create_app():
 
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+    if config:
+        app.config.update(config)
+
     db.init_app(app)
 
     login_manager.init_app(app)
 
+    shelf_cache.init_app(app)
+
+    suggest_index.init_app(app)
+
+    metrics.init_app(app)
+
+    view_buffer.init_app(app)
+
+    like_buffer.init_app(app)
+
+    purge_queue.init_app(app)
+
+    transcode_queue.init_app(app)
+
+    assets.init_app(app)
+
+    compressor.init_app(app)
+
+    app.add_template_global(fragment_cache.render, "cached_fragment")
+
     provider_manager.setup()
 
-    from . import routes
+    from . import cli, routes
+    from .sessions import ServerSessionInterface
+
+    app.session_interface = ServerSessionInterface()
+    metrics.collector("session_cache", app.session_interface.cache.stats)
 
     app.register_blueprint(routes.user.route_user_bp)
     app.register_blueprint(routes.main.main_bp)
@@ -45,26 +92,17 @@ def create_app():
     app.register_blueprint(routes.watch.route_watch_bp)
     app.register_blueprint(routes.video.route_video_bp)
     app.register_blueprint(routes.transcoder.route_transcoder_bp)
+    app.register_blueprint(routes.channel.route_channel_bp)
+    app.register_blueprint(routes.metrics.route_metrics_bp)
 
-    @app.route("/favicon.ico")
-    def favicon():
-        return redirect(url_for("static", filename="favicon.ico"))
-
-    @app.route("/apple-touch-icon.png")
-    def apple_touch_icon():
-        return redirect(url_for("static", filename="apple-touch-icon.png"))
-
-    @app.route("/android-chrome-192x192.png")
-    def android_chrome_192x192():
-        return redirect(url_for("static", filename="android-chrome-192x192.png"))
-
-    @app.route("/android-chrome-512x512.png")
-    def android_chrome_512x512():
-        return redirect(url_for("static", filename="android-chrome-512x512.png"))
+    if storage_manager.storage_type == "local":
+        app.register_blueprint(routes.storage.route_storage_bp)
 
-    @app.route("/site.webmanifest")
-    def site_webmanifest():
-        return redirect(url_for("static", filename="site.webmanifest"))
+    app.cli.add_command(cli.schema_cli)
+    app.cli.add_command(cli.stats_cli)
+    app.cli.add_command(cli.trending_cli)
+    app.cli.add_command(cli.videos_cli)
+    app.cli.add_command(cli.transcoder_cli)
 
     with app.app_context():
         db.create_all()
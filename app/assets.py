@@ -0,0 +1,146 @@
+import gzip
+import mimetypes
+import os
+from hashlib import sha256
+from typing import NamedTuple, Optional
+
+from flask import Flask, Response, abort, current_app, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+mimetypes.add_type("application/manifest+json", ".webmanifest")
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# icons are fetched by fixed URLs, so they can only be cached for a while
+ROOT_MAX_AGE = 24 * 3600
+ROOT_ASSETS = (
+    "favicon.ico",
+    "apple-touch-icon.png",
+    "android-chrome-192x192.png",
+    "android-chrome-512x512.png",
+    "site.webmanifest",
+)
+COMPRESSIBLE = ("text/", "javascript", "json", "icon")
+
+
+class Asset(NamedTuple):
+    digest: str
+    mimetype: str
+    # encoding ("br", "gzip" or "identity") -> body
+    bodies: dict[str, bytes]
+
+
+# Static files are read once at startup, fingerprinted with a content hash
+# and precompressed in memory. url_for("static", filename="watch.js") then
+# builds "/static/watch.<hash>.js", which is served with an immutable
+# Cache-Control, so browsers only refetch a file after it has changed.
+# Unhashed names keep working, with a short lifetime.
+class StaticAssets:
+    def __init__(self):
+        self.assets: dict[str, Asset] = {}
+        self.hashed_names: dict[str, str] = {}
+        self.by_hashed_name: dict[str, str] = {}
+
+    def init_app(self, app: Flask) -> None:
+        # under the debug server files are edited in place, so they are served
+        # as they are, without fingerprints
+        if not app.debug:
+            self.build(app.static_folder)
+
+            app.url_defaults(self.hash_static_url)
+            app.view_functions["static"] = self.send_static
+
+        for filename in ROOT_ASSETS:
+            if os.path.isfile(os.path.join(app.static_folder, filename)):
+                app.add_url_rule(
+                    f"/{filename}",
+                    f"asset_{filename}",
+                    lambda filename=filename: self.send_root(filename),
+                )
+
+    def send_root(self, filename: str) -> Response:
+        if filename in self.assets:
+            return self.send(filename, ROOT_MAX_AGE)
+
+        return current_app.send_static_file(filename)
+
+    def build(self, folder: str) -> None:
+        for directory, _, files in os.walk(folder):
+            for file in files:
+                path = os.path.join(directory, file)
+                filename = os.path.relpath(path, folder).replace(os.sep, "/")
+
+                with open(path, "rb") as f:
+                    data = f.read()
+
+                digest = sha256(data).hexdigest()[:12]
+                mimetype = mimetypes.guess_type(file)[0] or "application/octet-stream"
+                bodies = {"identity": data}
+
+                if any(kind in mimetype for kind in COMPRESSIBLE):
+                    compressed = {"gzip": gzip.compress(data, 9, mtime=0)}
+
+                    if brotli is not None:
+                        compressed["br"] = brotli.compress(data, quality=11)
+
+                    bodies.update(
+                        (encoding, body)
+                        for encoding, body in compressed.items()
+                        if len(body) < len(data)
+                    )
+
+                stem, ext = os.path.splitext(filename)
+                hashed_name = f"{stem}.{digest}{ext}"
+
+                self.assets[filename] = Asset(digest, mimetype, bodies)
+                self.hashed_names[filename] = hashed_name
+                self.by_hashed_name[hashed_name] = filename
+
+        print(f"Fingerprinted {len(self.assets)} static asset(s).")
+
+    def hash_static_url(self, endpoint: str, values: dict) -> None:
+        if endpoint == "static" and values.get("filename") in self.hashed_names:
+            values["filename"] = self.hashed_names[values["filename"]]
+
+    def send_static(self, filename: str) -> Response:
+        if filename in self.by_hashed_name:
+            return self.send(self.by_hashed_name[filename], IMMUTABLE_MAX_AGE, True)
+
+        return self.send(filename, ROOT_MAX_AGE)
+
+    def send(self, filename: str, max_age: int, immutable: bool = False) -> Response:
+        asset: Optional[Asset] = self.assets.get(filename)
+
+        if asset is None:
+            abort(404)
+
+        accepted = request.accept_encodings
+        encoding = next(
+            (
+                encoding
+                for encoding in ("br", "gzip")
+                if encoding in asset.bodies and accepted[encoding]
+            ),
+            "identity",
+        )
+
+        response = Response(mimetype=asset.mimetype)
+        response.set_etag(f"{asset.digest}-{encoding}")
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.cache_control.immutable = immutable
+        response.vary.add("Accept-Encoding")
+
+        if encoding != "identity":
+            response.content_encoding = encoding
+
+        if request.if_none_match.contains(response.get_etag()[0]):
+            response.status_code = 304
+            return response
+
+        response.set_data(asset.bodies[encoding])
+
+        return response
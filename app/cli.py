@@ -0,0 +1,84 @@
+import click
+from flask.cli import AppGroup
+
+from .context import transcode_queue
+from .publishing import backfill_seek_previews
+from .purge import pending_purges, purge_video
+from .schema import upgrade_schema
+from .stats import reconcile_video_stats
+from .trending import backfill_video_activity, refresh_trending_scores
+
+schema_cli = AppGroup("schema", help="Upgrade the database schema.")
+stats_cli = AppGroup("stats", help="Maintain the denormalized per-video counters.")
+trending_cli = AppGroup("trending", help="Maintain the hourly activity rollups.")
+videos_cli = AppGroup("videos", help="Manage uploaded videos.")
+transcoder_cli = AppGroup("transcoder", help="Inspect transcoding jobs.")
+
+
+@schema_cli.command("upgrade")
+def schema_upgrade():
+    applied = upgrade_schema()
+
+    for change in applied:
+        click.echo(change)
+
+    click.echo(f"{len(applied)} change(s) applied.")
+
+
+@stats_cli.command("reconcile")
+@click.option("--dry-run", is_flag=True, help="Report drift without fixing it.")
+def stats_reconcile(dry_run):
+    drift = reconcile_video_stats(dry_run=dry_run)
+
+    for video_id, changed in drift:
+        click.echo(f"video {video_id}: {changed}")
+
+    click.echo(
+        f"{len(drift)} video(s) {'drifted' if dry_run else 'reconciled'}."
+    )
+
+
+@trending_cli.command("backfill")
+def trending_backfill():
+    buckets = backfill_video_activity()
+    refresh_trending_scores()
+
+    click.echo(f"Rebuilt {buckets} hourly bucket(s) and refreshed trending scores.")
+
+
+@trending_cli.command("refresh")
+def trending_refresh():
+    refresh_trending_scores()
+
+    click.echo("Trending scores refreshed.")
+
+
+@videos_cli.command("purge")
+def videos_purge():
+    pending = pending_purges()
+    click.echo(f"{len(pending)} deleted video(s) to purge.")
+
+    for video_id, video_hash in pending:
+        purge_video(video_id, video_hash)
+
+
+@videos_cli.command("backfill-seek-previews")
+def videos_backfill_seek_previews():
+    recorded = backfill_seek_previews()
+
+    click.echo(f"Recorded seek previews for {recorded} video(s).")
+
+
+@transcoder_cli.command("jobs")
+@click.option("--retry", "retry_hashes", multiple=True, help="Requeue a failed upload.")
+def transcoder_jobs(retry_hashes):
+    for upload_hash in retry_hashes:
+        requeued = transcode_queue.requeue(upload_hash)
+        click.echo(f"{upload_hash}: {'requeued' if requeued else 'not failed or done'}")
+
+    for state, count in transcode_queue.stats().items():
+        click.echo(f"{state:>8}  {count}")
+
+    for row in transcode_queue.failed():
+        click.echo(f"failed  {row.key}  after {row.attempts} attempt(s)")
+        click.echo(f"        {row.updated_at:%Y-%m-%d %H:%M}  {row.last_error}")
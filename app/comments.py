@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+from .context import db
+from .models.comment import Comment
+from .models.user import User
+from .util import decode_keyset_cursor, encode_cursor
+
+COMMENTS_PAGE_SIZE = 20
+MAX_COMMENTS_PAGE_SIZE = 100
+
+
+def comment_select(video_id: int):
+    return (
+        db.select(Comment, User.picture.label("user_picture"))
+        .join(User, Comment.user_id == User.id)
+        .where(Comment.video_id == video_id)
+    )
+
+
+# Newest first, keyset-paginated on (created_at, id) like the video listings;
+# ix_comments_video_created carries the primary key, so each page is a range
+# scan of the video's comments.
+def list_comments(
+    video_id: int,
+    cursor: str | None = None,
+    limit: int = COMMENTS_PAGE_SIZE,
+):
+    limit = max(1, min(limit, MAX_COMMENTS_PAGE_SIZE))
+
+    stmt = comment_select(video_id)
+
+    if cursor:
+        last_created_at, last_id = decode_keyset_cursor(cursor, datetime)
+
+        stmt = stmt.where(
+            or_(
+                Comment.created_at < last_created_at,
+                and_(Comment.created_at == last_created_at, Comment.id < last_id),
+            )
+        )
+
+    rows = db.session.execute(
+        stmt.order_by(Comment.created_at.desc(), Comment.id.desc()).limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        comment = rows[-1][0]
+        next_cursor = encode_cursor(comment.created_at.isoformat(), comment.id)
+
+    return rows, next_cursor
+
+
+def comment_json(comment: Comment, user_picture: str | None) -> dict:
+    return {
+        "id": comment.id,
+        "text": comment.text,
+        "created_at": comment.created_at.isoformat(),
+        "date": comment.created_at.strftime("%b %d, %Y"),
+        "user_picture": user_picture,
+    }
@@ -0,0 +1,117 @@
+import gzip
+import zlib
+from typing import Iterable, Iterator
+
+from flask import Flask, Response, request
+
+from .metrics import Metrics
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# below this, headers outweigh what compression saves
+MIN_SIZE = 512
+COMPRESSIBLE = ("text/html", "text/plain", "application/json", "text/vtt")
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+# Compresses dynamic responses after they are rendered: buffered bodies in
+# one go, streamed ones chunk by chunk with a sync flush so each chunk still
+# reaches the client as soon as it is produced. Static assets come
+# precompressed (see assets.py) and files are sent as they are, so both are
+# skipped. Records the bytes sent per endpoint as response_bytes.<endpoint>,
+# next to the uncompressed size as response_raw_bytes.<endpoint>.
+class ResponseCompressor:
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    def init_app(self, app: Flask) -> None:
+        app.after_request(self.compress)
+
+    def compress(self, response: Response) -> Response:
+        encoding = self._encoding(response)
+        endpoint = request.endpoint or "unmatched"
+
+        if encoding is None:
+            if not response.is_streamed and not response.direct_passthrough:
+                size = response.calculate_content_length() or 0
+                self.metrics.record(f"response_bytes.{endpoint}", size)
+                self.metrics.record(f"response_raw_bytes.{endpoint}", size)
+
+            return response
+
+        response.vary.add("Accept-Encoding")
+        response.content_encoding = encoding
+
+        if response.is_streamed:
+            response.response = self._stream(response.iter_encoded(), encoding)
+            response.headers.pop("Content-Length", None)
+            self.metrics.incr(f"response_streamed.{endpoint}")
+            return response
+
+        data = response.get_data()
+
+        if encoding == "br":
+            body = brotli.compress(data, quality=BROTLI_QUALITY)
+        else:
+            body = gzip.compress(data, GZIP_LEVEL, mtime=0)
+
+        response.set_data(body)
+
+        # a strong ETag names exact bytes, which are now different
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+        self.metrics.record(f"response_bytes.{endpoint}", len(body))
+        self.metrics.record(f"response_raw_bytes.{endpoint}", len(data))
+
+        return response
+
+    def _encoding(self, response: Response) -> str | None:
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE
+            or request.method == "HEAD"
+        ):
+            return None
+
+        if not response.is_streamed:
+            length = response.calculate_content_length()
+
+            if length is not None and length < MIN_SIZE:
+                return None
+
+        accepted = request.accept_encodings
+
+        if brotli is not None and accepted["br"]:
+            return "br"
+
+        if accepted["gzip"]:
+            return "gzip"
+
+        return None
+
+    def _stream(self, chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+            for chunk in chunks:
+                yield compressor.process(chunk) + compressor.flush()
+
+            yield compressor.finish()
+            return
+
+        # wbits 31: zlib stream with a gzip header and trailer
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        yield compressor.flush()
@@ -4,25 +4,97 @@ from flask_sqlalchemy import SQLAlchemy
 
 from app.transcoder import TranscoderService
 
+from .assets import StaticAssets
+
+from .compression import ResponseCompressor
+
+from .ffmpeg_transcoder import FFmpegTranscoderService
+
+from .fragments import FragmentCache
+
 from .oauth import OAuthProviderManager
 
 from .gae import GAE
 
+from .job_queue import JobQueue
+
+from .metrics import Metrics
+
+from .result_cache import ResultCache
+
+from .sampler import RandomSampler
+
+from .shelves import ShelfCache
+
 from .storage import StorageManager
 
+from .suggest import SuggestIndex
+
+from .tasks import TaskQueue
+
+from .write_buffer import WriteBuffer
+
 login_manager = LoginManager()
 
 db = SQLAlchemy()
 
+shelf_cache = ShelfCache()
+
+random_sampler = RandomSampler()
+
+suggest_index = SuggestIndex()
+
+# publishing clears the cache of the worker it happens in; the ttl bounds how
+# long other workers and instances miss new videos (deleted ones drop out when
+# the cached ids are hydrated)
+search_cache = ResultCache(maxsize=2048, ttl=60)
+
+# only ready videos are cached; the ttl bounds how long any other change made
+# through another worker goes unseen
+watch_cache = ResultCache(maxsize=4096, ttl=300)
+
+counter_cache = ResultCache(maxsize=4096, ttl=10)
+
+assets = StaticAssets()
+
+metrics = Metrics()
+metrics.collector("search_cache", search_cache.stats)
+metrics.collector("watch_cache", watch_cache.stats)
+metrics.collector("counter_cache", counter_cache.stats)
+
+fragment_cache = FragmentCache()
+metrics.collector("fragment_cache", fragment_cache.stats)
+
+compressor = ResponseCompressor(metrics)
+
+view_buffer = WriteBuffer("view_ingest", metrics)
+
+like_buffer = WriteBuffer("like_deltas", metrics)
+
+purge_queue = TaskQueue("purge", metrics)
+
 gae = GAE()
 
 provider_manager = OAuthProviderManager(gae.OAUTH2_PROVIDERS)
 
-storage_manager = StorageManager(gae.GCP_BUCKET_NAME, gae.GCP_BUCKET_CREDENTIALS)
+transcode_queue = JobQueue("transcode", db, metrics, workers=gae.TRANSCODE_WORKERS)
 
-transcoder_service = TranscoderService(
-    gae.GCP_TRANSCODER_CREDENTIALS,
-    gae.GCP_PROJECT_NAME,
-    gae.GCP_LOCATION,
-    gae.GCP_PUBSUB_UPLOAD_QUEUE_TOPIC,
+storage_manager = StorageManager(
+    gae.GCP_BUCKET_NAME,
+    gae.GCP_BUCKET_CREDENTIALS,
+    gae.STORAGE_TYPE,
+    gae.STORAGE_ROOT,
+    metrics,
+    gae.STORAGE_POOL_SIZE,
 )
+metrics.collector("storage_exists", storage_manager.exists_stats)
+
+if gae.TRANSCODER_ENGINE == "ffmpeg":
+    transcoder_service = FFmpegTranscoderService(storage_manager, metrics)
+else:
+    transcoder_service = TranscoderService(
+        gae.GCP_TRANSCODER_CREDENTIALS,
+        gae.GCP_PROJECT_NAME,
+        gae.GCP_LOCATION,
+        gae.GCP_PUBSUB_UPLOAD_QUEUE_TOPIC,
+    )
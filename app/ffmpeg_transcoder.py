@@ -0,0 +1,411 @@
+import json
+import mimetypes
+import os
+import subprocess
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from tempfile import TemporaryDirectory, TemporaryFile
+from threading import Lock
+from time import perf_counter
+from typing import NamedTuple, Optional
+from uuid import uuid4
+
+from .metrics import Metrics
+from .seek_previews import SeekSprites
+from .storage import StorageManager
+
+SEGMENT_SECONDS = 6
+AUDIO_BITRATE = "128k"
+ENCODERS = {"h264": ["-c:v", "libx264"], "h265": ["-c:v", "libx265", "-tag:v", "hvc1"]}
+
+
+# The ffmpeg processes of one job, so that when one fails the others can be
+# stopped before their working directory is removed.
+class ProcessGroup:
+    def __init__(self):
+        self.lock = Lock()
+        self.processes: list[subprocess.Popen] = []
+        self.stopped = False
+
+    def spawn(self, command: list[str], **kwargs) -> subprocess.Popen:
+        with self.lock:
+            if self.stopped:
+                raise RuntimeError("The job was stopped.")
+
+            process = subprocess.Popen(command, **kwargs)
+            self.processes.append(process)
+
+            return process
+
+    def stop(self) -> None:
+        with self.lock:
+            self.stopped = True
+
+            for process in self.processes:
+                if process.poll() is None:
+                    process.kill()
+
+
+class FFmpegJob(NamedTuple):
+    name: str
+    input_path: str
+    output_prefix: str
+    renditions: list
+    seek_sprites: Optional[SeekSprites]
+
+
+# Transcodes with a local ffmpeg instead of the Cloud Transcoder API, with
+# the same interface and the same output layout: per-rendition CMAF segments
+# under transcoded/<hash>/, manifest.mpd and master.m3u8 over them, the card
+# thumbnail and the seek-preview sheets. Renditions (and the audio, the
+# thumbnail and the sprites) are separate ffmpeg processes, run in parallel
+# across the cores; a final stream-copy pass packages them into segments.
+# Outputs are stored with the manifests last, since their presence is what
+# marks a video ready. Jobs are created like Cloud Transcoder jobs but run
+# with run_transcoder_job in the caller's thread, so the transcode queue job
+# that calls it lasts as long as the encode.
+class FFmpegTranscoderService:
+    def __init__(
+        self,
+        storage_manager: StorageManager,
+        metrics: Metrics,
+        cores: Optional[int] = None,
+    ):
+        self.storage_manager = storage_manager
+        self.metrics = metrics
+
+        # x264 and x265 scale poorly past a few threads per encode, so the
+        # cores are shared by several encoder processes of a few threads each
+        cores = cores or os.cpu_count() or 1
+        self.encode_threads = max(1, cores // 4)
+        self.encoders = ThreadPoolExecutor(
+            max_workers=max(1, cores // self.encode_threads),
+            thread_name_prefix="ffmpeg-encode",
+        )
+
+        self.lock = Lock()
+        self.states: dict[str, str] = {}
+        self.progress: dict[str, dict[str, float]] = {}
+
+        metrics.collector("ffmpeg", self.stats)
+
+    def create_transcoder_job(
+        self, input_uri, output_uri, renditions, seek_sprites=None
+    ) -> FFmpegJob:
+        name = f"ffmpeg/{uuid4().hex}"
+
+        with self.lock:
+            self.states[name] = "PENDING"
+
+        return FFmpegJob(
+            name,
+            self.storage_manager.path_of(input_uri),
+            self.storage_manager.path_of(output_uri).rstrip("/") + "/",
+            renditions,
+            seek_sprites,
+        )
+
+    def get_transcoder_job_status(self, job_id):
+        with self.lock:
+            return self.states.get(job_id, "STATE_UNSPECIFIED")
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "running": sum(state == "RUNNING" for state in self.states.values()),
+                "progress": {
+                    name: round(sum(parts.values()) / len(parts), 3)
+                    for name, parts in self.progress.items()
+                    if parts and self.states.get(name) == "RUNNING"
+                },
+            }
+
+    # Runs the job to the end, raising if any step fails; needs an app
+    # context for the storage.
+    def run_transcoder_job(self, job: FFmpegJob) -> None:
+        started = perf_counter()
+        self._set_state(job.name, "RUNNING")
+
+        # ffmpeg reads local objects from disk and bucket objects over HTTPS
+        source = (
+            self.storage_manager.uri(job.input_path)
+            if self.storage_manager.storage_type == "local"
+            else self.storage_manager.public_url(job.input_path)
+        )
+
+        try:
+            with TemporaryDirectory(prefix="ffmpeg-") as workdir:
+                duration, has_audio = probe(source)
+                self._encode(
+                    job.name,
+                    source,
+                    workdir,
+                    duration,
+                    has_audio,
+                    job.renditions,
+                    job.seek_sprites,
+                )
+                self._package(workdir, job.renditions, has_audio)
+                self._store(workdir, job.output_prefix)
+        except Exception:
+            self._set_state(job.name, "FAILED")
+            self.metrics.incr("ffmpeg.failed")
+            raise
+        finally:
+            with self.lock:
+                self.progress.pop(job.name, None)
+
+            self.metrics.observe("ffmpeg.job", perf_counter() - started)
+
+        self._set_state(job.name, "SUCCEEDED")
+        self.metrics.incr("ffmpeg.succeeded")
+
+    def _set_state(self, name: str, state: str) -> None:
+        with self.lock:
+            self.states[name] = state
+
+    # One ffmpeg process per rendition, plus the audio, the thumbnail and
+    # the seek-preview sheets, all run in parallel on the encoder pool.
+    # Keyframes are placed every segment and never on scene cuts, so every
+    # rendition splits at the same instants and players can switch cleanly.
+    def _encode(
+        self, name, source, workdir, duration, has_audio, renditions, seek_sprites
+    ):
+        threads = ["-threads", str(self.encode_threads)]
+        commands = {}
+
+        for rendition in renditions:
+            gop = str(max(1, round(rendition.frame_rate * SEGMENT_SECONDS)))
+            keyframes = (
+                ["-g", gop, "-keyint_min", gop, "-sc_threshold", "0"]
+                if rendition.codec == "h264"
+                else ["-x265-params", f"keyint={gop}:min-keyint={gop}:scenecut=0"]
+            )
+
+            commands[rendition.key] = [
+                "-i", source, "-map", "0:v:0", "-an",
+                "-vf", f"scale={rendition.width}:{rendition.height}",
+                "-r", f"{rendition.frame_rate:g}",
+                *ENCODERS[rendition.codec], *keyframes, *threads,
+                "-b:v", str(rendition.bitrate_bps),
+                "-maxrate", str(int(rendition.bitrate_bps * 1.5)),
+                "-bufsize", str(rendition.bitrate_bps * 2),
+                "-pix_fmt", "yuv420p",
+                os.path.join(workdir, f"{rendition.key}.mp4"),
+            ]  # fmt: skip
+
+        if has_audio:
+            commands["audio"] = [
+                "-i", source, "-map", "0:a:0", "-vn",
+                "-c:a", "aac", "-b:a", AUDIO_BITRATE, *threads,
+                os.path.join(workdir, "audio.m4a"),
+            ]  # fmt: skip
+
+        os.makedirs(os.path.join(workdir, "out"))
+
+        commands["thumbnail"] = [
+            "-ss", f"{min(1.0, duration / 2):.3f}", "-i", source,
+            "-frames:v", "1", "-vf", "scale=240:240",
+            os.path.join(workdir, "out", "small-thumbnail0000000000.jpeg"),
+        ]  # fmt: skip
+
+        if seek_sprites:
+            tile = f"{seek_sprites.columns}x{seek_sprites.rows}"
+            commands["seek_sprites"] = [
+                "-i", source, "-an",
+                "-vf",
+                f"fps=1/{seek_sprites.interval},"
+                f"scale={seek_sprites.tile_width}:{seek_sprites.tile_height},"
+                f"tile={tile}",
+                "-q:v", "5", "-start_number", "0",
+                os.path.join(workdir, "out", "seek-sprite%010d.jpeg"),
+            ]  # fmt: skip
+
+        group = ProcessGroup()
+        futures = [
+            self.encoders.submit(self._ffmpeg, name, key, args, duration, group)
+            for key, args in commands.items()
+        ]
+
+        done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        failed = [future for future in done if future.exception()]
+
+        if failed:
+            # the others would go on writing into a removed workdir
+            group.stop()
+
+            for future in futures:
+                future.cancel()
+
+            wait(futures)
+            raise failed[0].exception()
+
+    # Stream-copies every encode into one DASH presentation with an HLS
+    # playlist alongside (-hls_playlist), both over the same fMP4 segments.
+    # Each codec gets its own adaptation set, since a player picks one set
+    # and switches between the representations in it.
+    def _package(self, workdir: str, renditions, has_audio: bool) -> None:
+        inputs = [f"{rendition.key}.mp4" for rendition in renditions]
+        adaptation_sets = []
+
+        for codec in ENCODERS:
+            streams = [
+                str(index)
+                for index, rendition in enumerate(renditions)
+                if rendition.codec == codec
+            ]
+
+            if streams:
+                adaptation_sets.append(
+                    f"id={len(adaptation_sets)},streams={','.join(streams)}"
+                )
+
+        if has_audio:
+            adaptation_sets.append(f"id={len(adaptation_sets)},streams={len(inputs)}")
+            inputs.append("audio.m4a")
+
+        args = []
+
+        for path in inputs:
+            args += ["-i", path]
+
+        for index in range(len(inputs)):
+            args += ["-map", str(index)]
+
+        run_ffmpeg(
+            [
+                *args,
+                "-c", "copy",
+                "-f", "dash",
+                "-seg_duration", str(SEGMENT_SECONDS),
+                "-use_template", "1",
+                "-use_timeline", "1",
+                "-hls_playlist", "1",
+                "-adaptation_sets", " ".join(adaptation_sets),
+                "-init_seg_name", "cmaf_$RepresentationID$_init.mp4",
+                "-media_seg_name", "cmaf_$RepresentationID$_$Number%05d$.m4s",
+                os.path.join("out", "manifest.mpd"),
+            ],
+            cwd=workdir,
+        )  # fmt: skip
+
+    def _store(self, workdir: str, output_prefix: str) -> None:
+        out = os.path.join(workdir, "out")
+        files = []
+
+        for directory, _, names in os.walk(out):
+            for file in names:
+                path = os.path.join(directory, file)
+                files.append(os.path.relpath(path, out).replace(os.sep, "/"))
+
+        def store(file: str) -> None:
+            with open(os.path.join(out, file), "rb") as f:
+                data = f.read()
+
+            content_type = mimetypes.guess_type(file)[0] or "application/octet-stream"
+            self.storage_manager.upload_bytes(data, output_prefix + file, content_type)
+
+        manifests = [file for file in files if file.endswith((".mpd", ".m3u8"))]
+        # media playlists first, the master playlist and the DASH manifest last
+        final = ["master.m3u8", "manifest.mpd"]
+
+        list(self.storage_manager.executor.map(store, set(files) - set(manifests)))
+
+        for file in sorted(manifests, key=lambda file: file in final):
+            store(file)
+
+    # Runs one ffmpeg process, reporting its progress from -progress output.
+    def _ffmpeg(
+        self,
+        name: str,
+        key: str,
+        args: list[str],
+        duration: float,
+        group: Optional[ProcessGroup] = None,
+    ) -> None:
+        def progress(out_time: float) -> None:
+            if duration:
+                with self.lock:
+                    self.progress.setdefault(name, {})[key] = min(
+                        1.0, out_time / duration
+                    )
+
+        started = perf_counter()
+        run_ffmpeg(args, progress=progress, group=group)
+        progress(duration)
+
+        elapsed = perf_counter() - started
+        self.metrics.observe(f"ffmpeg.{key.split('_')[0]}", elapsed)
+
+        with self.lock:
+            parts = self.progress.get(name) or {key: 1.0}
+            done = sum(parts.values()) / len(parts)
+
+        print(f"ffmpeg job {name}: {key} encoded in {elapsed:.1f}s ({done:.0%} done)")
+
+
+# Runs ffmpeg to the end, following its -progress output on stdout. Errors go
+# to a temporary file rather than a pipe, since a pipe nobody reads while
+# stdout is followed would stall ffmpeg once it filled up.
+def run_ffmpeg(
+    args: list[str],
+    cwd: Optional[str] = None,
+    progress=None,
+    group: Optional[ProcessGroup] = None,
+) -> None:
+    spawn = group.spawn if group else subprocess.Popen
+
+    with TemporaryFile() as errors:
+        process = spawn(
+            [
+                "ffmpeg", "-hide_banner", "-nostats", "-loglevel", "error", "-y",
+                "-progress", "pipe:1", *args,
+            ],
+            cwd=cwd,
+            stdout=subprocess.PIPE,
+            stderr=errors,
+            text=True,
+        )  # fmt: skip
+
+        for line in process.stdout:
+            key, _, value = line.strip().partition("=")
+
+            if progress and key == "out_time_us" and value.isdigit():
+                progress(int(value) / 1e6)
+
+        if process.wait() != 0:
+            errors.seek(max(0, errors.seek(0, os.SEEK_END) - 500))
+            stderr = errors.read().decode(errors="replace")
+
+            raise RuntimeError(f"ffmpeg exited with {process.returncode}: {stderr}")
+
+
+# Returns the duration in seconds (0 if unknown) and whether there is audio.
+def probe(source: str) -> tuple[float, bool]:
+    result = subprocess.run(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-show_entries",
+            "format=duration:stream=codec_type",
+            "-of",
+            "json",
+            source,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+        text=True,
+    )
+    info = json.loads(result.stdout)
+
+    try:
+        duration = float(info.get("format", {}).get("duration", 0))
+    except ValueError:
+        duration = 0.0
+
+    has_audio = any(
+        stream.get("codec_type") == "audio" for stream in info.get("streams", [])
+    )
+
+    return duration, has_audio
@@ -0,0 +1,26 @@
+from typing import Callable, Hashable
+
+from markupsafe import Markup
+
+from .result_cache import ResultCache
+
+
+# Rendered template fragments, keyed on the versions of the data they were
+# rendered from, so a fragment is only reused while that data is unchanged
+# and nothing has to be invalidated. Used from templates as
+#   {% call cached_fragment("shelf", name, version) %}...{% endcall %}
+class FragmentCache:
+    def __init__(self, maxsize: int = 1024):
+        self.cache = ResultCache(maxsize=maxsize)
+
+    def render(self, *key: Hashable, caller: Callable[[], str]) -> Markup:
+        fragment = self.cache.get(key)
+
+        if fragment is None:
+            fragment = Markup(caller())
+            self.cache.put(key, fragment)
+
+        return fragment
+
+    def stats(self) -> dict:
+        return self.cache.stats()
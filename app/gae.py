@@ -15,11 +15,33 @@ class GAE:
         )
 
         self.GCP_CREDENTIALS = os.getenv("PSEUDOTUBE_GCP_CREDENTIALS", None)
+        self.GCP_BUCKET_CREDENTIALS = None
+        self.GCP_TRANSCODER_CREDENTIALS = None
+
+        # "gs" for the Cloud Storage bucket, "local" for files under
+        # STORAGE_ROOT served by the app itself
+        self.STORAGE_TYPE = os.getenv("PSEUDOTUBE_STORAGE_TYPE", "gs")
+        self.STORAGE_ROOT = os.getenv("PSEUDOTUBE_STORAGE_ROOT", "storage")
+        # storage connections per worker process; size it to the threads
+        # serving requests, half of it is used for batched operations
+        self.STORAGE_POOL_SIZE = int(os.getenv("PSEUDOTUBE_STORAGE_POOL_SIZE", "16"))
+        # transcoding jobs (ffprobe and job submission) run concurrently per
+        # worker process
+        self.TRANSCODE_WORKERS = int(os.getenv("PSEUDOTUBE_TRANSCODE_WORKERS", "2"))
+        # "gcp" for the Cloud Transcoder API, "ffmpeg" to transcode with a
+        # local ffmpeg on the worker's own cores
+        self.TRANSCODER_ENGINE = os.getenv("PSEUDOTUBE_TRANSCODER_ENGINE", "gcp")
 
         self.OAUTH2_PROVIDERS = os.getenv("PSEUDOTUBE_OAUTH2_PROVIDERS", None)
 
+        # bearer token for /api/metrics, which is disabled without one
+        self.METRICS_TOKEN = os.getenv("PSEUDOTUBE_METRICS_TOKEN", None)
+
         self.GCF_FFPROBE = os.getenv("PSEUDOTUBE_GCF_FFPROBE", "/ffprobe")
 
+        # signs session cookies, so it must be the same for every worker
+        self.SECRET_KEY = os.getenv("PSEUDOTUBE_SECRET_KEY", None)
+
         if "IS_GAE" in os.environ:
             self.client = secretmanager.SecretManagerServiceClient()
 
@@ -27,6 +49,9 @@ class GAE:
             self.GCP_BUCKET_CREDENTIALS = self.get_secret_storage()
             self.GCP_TRANSCODER_CREDENTIALS = self.get_secret_transcoder()
 
+            if self.SECRET_KEY is None:
+                self.SECRET_KEY = self.get_secret_session()
+
         else:
             google_oauth_cred_filename = "oauth2.creds.json"
 
@@ -46,6 +71,12 @@ class GAE:
                 with open(google_transcoder_cred_filename, "r") as f:
                     self.GCP_TRANSCODER_CREDENTIALS = f.read()
 
+            session_key_filename = "session.key"
+
+            if self.SECRET_KEY is None and os.path.exists(session_key_filename):
+                with open(session_key_filename, "r") as f:
+                    self.SECRET_KEY = f.read().strip()
+
     def get_secret_oauth2(self):
         name = (
             f"projects/{self.GCP_PROJECT_NAME}/secrets/oauth2_providers/versions/latest"
@@ -62,3 +93,8 @@ class GAE:
         name = f"projects/{self.GCP_PROJECT_NAME}/secrets/transcoder/versions/latest"
         response = self.client.access_secret_version(request={"name": name})
         return response.payload.data.decode("UTF-8")
+
+    def get_secret_session(self):
+        name = f"projects/{self.GCP_PROJECT_NAME}/secrets/session_key/versions/latest"
+        response = self.client.access_secret_version(request={"name": name})
+        return response.payload.data.decode("UTF-8")
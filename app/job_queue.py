@@ -0,0 +1,348 @@
+import os
+import socket
+from datetime import datetime, timedelta
+from random import uniform
+from threading import Event, Lock, Thread
+from time import perf_counter, sleep
+from typing import Callable, Optional
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert
+
+from .metrics import Metrics
+
+
+# Jobs kept in the job_queue table, so they survive worker restarts. Each
+# process runs a fixed number of worker threads that claim due jobs with
+# SELECT ... FOR UPDATE SKIP LOCKED, hold them under a lease renewed by a
+# heartbeat thread, and retry failures with jittered exponential backoff.
+# A job whose worker died is claimed again once its lease runs out, so
+# handlers must be idempotent; a key is only ever queued once.
+class JobQueue:
+    def __init__(
+        self,
+        name: str,
+        db: SQLAlchemy,
+        metrics: Metrics,
+        workers: int = 2,
+        lease: float = 120,
+        attempts: int = 5,
+        backoff: float = 10,
+        poll_interval: float = 2,
+    ):
+        self.name = name
+        self.db = db
+        self.metrics = metrics
+        self.workers = workers
+        self.lease = timedelta(seconds=lease)
+        self.attempts = attempts
+        self.backoff = backoff
+        self.poll_interval = poll_interval
+
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"[-64:]
+        self.wakeup = Event()
+        self.lock = Lock()
+        self.held: set[int] = set()
+        self.threads: list[Thread] = []
+
+        self.app: Optional[Flask] = None
+        self.model = None
+        self.handle: Optional[Callable[[str], None]] = None
+        self.abandon: Optional[Callable[[str, str], None]] = None
+
+    def init_app(self, app: Flask) -> None:
+        # imported here since the model module needs the db from context
+        from .models.queued_job import QueuedJob
+
+        self.app = app
+        self.model = QueuedJob
+
+        # every serving process also works the queue, which is how jobs left
+        # behind by a dead worker are picked up without a new submit
+        app.before_request(self._start)
+        self.metrics.collector(f"{self.name}_jobs", self.stats)
+
+    def handler(self, handle: Callable[[str], None]):
+        self.handle = handle
+        return handle
+
+    # Called with the key and the last error once a job has used all attempts.
+    def on_abandon(self, abandon: Callable[[str, str], None]):
+        self.abandon = abandon
+        return abandon
+
+    def submit(self, key: str) -> bool:
+        now = datetime.now()
+
+        with self.db.engine.begin() as connection:
+            inserted = connection.execute(
+                insert(self.model)
+                .prefix_with("IGNORE")
+                .values(
+                    queue=self.name,
+                    key=key,
+                    state="queued",
+                    attempts=0,
+                    run_after=now,
+                    created_at=now,
+                    updated_at=now,
+                )
+            ).rowcount
+
+        self.metrics.incr(f"{self.name}.{'submitted' if inserted else 'duplicates'}")
+        self._start()
+        self.wakeup.set()
+
+        return inserted > 0
+
+    # Puts a failed (or finished) job back in the queue with fresh attempts.
+    def requeue(self, key: str) -> bool:
+        job = self.model
+
+        with self.db.engine.begin() as connection:
+            updated = connection.execute(
+                self.db.update(job)
+                .where(
+                    job.queue == self.name,
+                    job.key == key,
+                    job.state.in_(("failed", "done")),
+                )
+                .values(state="queued", attempts=0, run_after=datetime.now())
+            ).rowcount
+
+        self.wakeup.set()
+
+        return updated > 0
+
+    def failed(self, limit: int = 50) -> list:
+        job = self.model
+
+        with self.db.engine.connect() as connection:
+            return connection.execute(
+                self.db.select(job.key, job.attempts, job.updated_at, job.last_error)
+                .where(job.queue == self.name, job.state == "failed")
+                .order_by(job.updated_at.desc())
+                .limit(limit)
+            ).all()
+
+    def stats(self) -> dict:
+        job = self.model
+
+        with self.db.engine.connect() as connection:
+            rows = connection.execute(
+                self.db.select(job.state, func.count())
+                .where(job.queue == self.name)
+                .group_by(job.state)
+            ).all()
+
+        with self.lock:
+            held = len(self.held)
+
+        return {"held": held, **{state: count for state, count in rows}}
+
+    def _start(self) -> None:
+        # the threads are started lazily so they run in the forked worker
+        if len(self.threads) > self.workers and all(
+            thread.is_alive() for thread in self.threads
+        ):
+            return
+
+        with self.lock:
+            self.threads = [thread for thread in self.threads if thread.is_alive()]
+
+            if not any(thread.name.endswith("heartbeat") for thread in self.threads):
+                self.threads.append(self._spawn(self._heartbeat, "heartbeat"))
+
+            while len(self.threads) <= self.workers:
+                self.threads.append(self._spawn(self._work, "worker"))
+
+    def _spawn(self, target: Callable[[], None], role: str) -> Thread:
+        thread = Thread(target=target, name=f"{self.name}-{role}", daemon=True)
+        thread.start()
+        return thread
+
+    def _work(self) -> None:
+        while True:
+            try:
+                with self.app.app_context():
+                    self._fail_expired()
+                    claimed = self._claim()
+
+                    if claimed is not None:
+                        self._run(*claimed)
+                        continue
+
+            except Exception as e:
+                self.metrics.incr(f"{self.name}.errors")
+                print(f"{self.name} worker failed: {e}")
+
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+
+    # Fails the jobs whose lease ran out on their last attempt, as _run does
+    # for a job that raised; a job that keeps killing its worker is not run
+    # again.
+    def _fail_expired(self) -> None:
+        job = self.model
+        now = datetime.now()
+        error = "lease expired on the last attempt"
+
+        with self.db.engine.begin() as connection:
+            rows = connection.execute(
+                self.db.select(job.id, job.key)
+                .where(
+                    job.queue == self.name,
+                    job.state == "running",
+                    job.lease_until < now,
+                    job.attempts >= self.attempts,
+                )
+                .with_for_update(skip_locked=True)
+            ).all()
+
+            if not rows:
+                return
+
+            connection.execute(
+                self.db.update(job)
+                .where(job.id.in_([row.id for row in rows]))
+                .values(
+                    state="failed", lease_until=None, last_error=error, updated_at=now
+                )
+            )
+
+        self.metrics.incr(f"{self.name}.abandoned", len(rows))
+
+        for row in rows:
+            print(f"{self.name} job {row.key} failed: {error}")
+
+            if self.abandon:
+                self.abandon(row.key, error)
+
+    # Takes the oldest due job: first ones whose lease ran out (their worker
+    # died) with attempts left, then queued ones whose backoff has passed.
+    def _claim(self) -> Optional[tuple[int, str, int]]:
+        job = self.model
+        now = datetime.now()
+
+        with self.db.engine.begin() as connection:
+            for due in (
+                (job.state == "running")
+                & (job.lease_until < now)
+                & (job.attempts < self.attempts),
+                (job.state == "queued") & (job.run_after <= now),
+            ):
+                row = connection.execute(
+                    self.db.select(job.id, job.key, job.attempts, job.state)
+                    .where(job.queue == self.name, due)
+                    .order_by(job.run_after)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                ).first()
+
+                if row is not None:
+                    break
+            else:
+                return None
+
+            # the row lock already excludes other claimers; the state and
+            # attempts check also keeps a claim exact if it was not taken
+            claimed = connection.execute(
+                self.db.update(job)
+                .where(
+                    job.id == row.id,
+                    job.state == row.state,
+                    job.attempts == row.attempts,
+                )
+                .values(
+                    state="running",
+                    attempts=row.attempts + 1,
+                    lease_until=now + self.lease,
+                    worker=self.worker_id,
+                    updated_at=now,
+                )
+            ).rowcount
+
+        if not claimed:
+            return None
+
+        with self.lock:
+            self.held.add(row.id)
+
+        self.metrics.incr(
+            f"{self.name}.{'reclaimed' if row.state == 'running' else 'claimed'}"
+        )
+
+        return row.id, row.key, row.attempts + 1
+
+    def _run(self, job_id: int, key: str, attempt: int) -> None:
+        started = perf_counter()
+
+        try:
+            self.handle(key)
+            error = None
+        except Exception as e:
+            self.db.session.rollback()
+            error = str(e)[:512] or type(e).__name__
+            print(f"{self.name} job {key} failed (attempt {attempt}): {error}")
+        finally:
+            self.db.session.remove()
+
+            with self.lock:
+                self.held.discard(job_id)
+
+        job = self.model
+        now = datetime.now()
+
+        if error is None:
+            values = dict(state="done", lease_until=None, last_error=None)
+            self.metrics.incr(f"{self.name}.completed")
+        elif attempt < self.attempts:
+            delay = self.backoff * 2 ** (attempt - 1) * uniform(0.5, 1.5)
+            values = dict(
+                state="queued",
+                run_after=now + timedelta(seconds=delay),
+                lease_until=None,
+                last_error=error,
+            )
+            self.metrics.incr(f"{self.name}.retried")
+        else:
+            values = dict(state="failed", lease_until=None, last_error=error)
+            self.metrics.incr(f"{self.name}.abandoned")
+
+        # a job whose lease was lost to another worker is left to that worker
+        with self.db.engine.begin() as connection:
+            updated = connection.execute(
+                self.db.update(job)
+                .where(job.id == job_id, job.worker == self.worker_id)
+                .values(updated_at=now, **values)
+            ).rowcount
+
+        if updated and values["state"] == "failed" and self.abandon:
+            self.abandon(key, error)
+
+        self.metrics.observe(f"{self.name}.job", perf_counter() - started)
+
+    def _heartbeat(self) -> None:
+        while True:
+            with self.lock:
+                held = list(self.held)
+
+            if held:
+                try:
+                    with self.app.app_context(), self.db.engine.begin() as connection:
+                        connection.execute(
+                            self.db.update(self.model)
+                            .where(
+                                self.model.id.in_(held),
+                                self.model.worker == self.worker_id,
+                                self.model.state == "running",
+                            )
+                            .values(lease_until=datetime.now() + self.lease)
+                        )
+                except Exception as e:
+                    self.metrics.incr(f"{self.name}.heartbeat_errors")
+                    print(f"{self.name} heartbeat failed: {e}")
+
+            sleep(self.lease.total_seconds() / 4)
@@ -0,0 +1,132 @@
+from typing import NamedTuple, Optional
+
+from .transcoder import make_even
+
+# Standard rungs by their short side, with the H.264 bitrate (bps) that
+# reaches our target quality on typical content at up to 30 fps.
+STANDARD_RUNGS = (
+    (2160, 16_000_000),
+    (1440, 9_000_000),
+    (1080, 5_000_000),
+    (720, 3_000_000),
+    (480, 1_500_000),
+    (360, 800_000),
+    (240, 400_000),
+)
+MAX_RUNGS = 6
+# rungs at or below this are always kept, for slow and small-screen clients
+BASE_RUNG_HEIGHT = 480
+# HEVC reaches the same quality at about 60% of the H.264 bitrate; it is only
+# worth a second encode on the top rungs, which carry most of the egress. With
+# at most MAX_RUNGS + MAX_HEVC_RUNGS encodes a 4K upload costs no more than it
+# did with four rungs in both codecs.
+HEVC_FACTOR = 0.6
+HEVC_MIN_HEIGHT = 720
+MAX_HEVC_RUNGS = 2
+# frame rates above 30 cost about half again as many bits
+HIGH_FPS_FACTOR = 1.5
+HIGH_FPS_MIN_HEIGHT = 720
+MAX_FPS = 60
+
+# Bits per pixel per frame of a typically encoded H.264 source. Sources far
+# above it are usually noisy or high-motion, sources below it static or
+# already heavily compressed; the estimate is damped and clamped, since the
+# source encoder's own choices are only a rough proxy for complexity.
+REFERENCE_BPP = 0.1
+MIN_COMPLEXITY = 0.6
+MAX_COMPLEXITY = 1.3
+
+
+class Rendition(NamedTuple):
+    key: str
+    codec: str
+    width: int
+    height: int
+    bitrate_bps: int
+    frame_rate: float
+
+
+def estimate_complexity(
+    width: int, height: int, fps: float, bit_rate: Optional[int]
+) -> float:
+    if not bit_rate or not fps:
+        return 1.0
+
+    bpp = bit_rate / (width * height * fps)
+
+    return min(MAX_COMPLEXITY, max(MIN_COMPLEXITY, (bpp / REFERENCE_BPP) ** 0.5))
+
+
+# The standard rungs at or below the source's short side, at most MAX_RUNGS:
+# the base rungs are always kept, and above them the top rung and evenly
+# spaced ones in between.
+def pick_rungs(short_side: int) -> list[tuple[int, int]]:
+    rungs = [rung for rung in STANDARD_RUNGS if rung[0] <= short_side]
+    upper = [rung for rung in rungs if rung[0] > BASE_RUNG_HEIGHT]
+    base = rungs[len(upper) :]
+    slots = MAX_RUNGS - len(base)
+
+    if len(upper) > slots:
+        step = (len(upper) - 1) / (slots - 1)
+        upper = [upper[int(index * step + 0.5)] for index in range(slots)]
+
+    return upper + base
+
+
+# Picks the rungs for the source (a source smaller than every rung gets one
+# rung at its own size), keeps the source aspect ratio and orientation, and
+# scales each rung's bitrate by the title's complexity and frame area, never
+# above the source bitrate. Every rung gets an H.264 rendition any client can
+# decode, and the top MAX_HEVC_RUNGS from 720p up also an HEVC rendition for
+# clients that can.
+def plan_ladder(
+    width: int, height: int, fps: float, bit_rate: Optional[int] = None
+) -> list[Rendition]:
+    short_side = min(width, height)
+    complexity = estimate_complexity(width, height, fps, bit_rate)
+
+    rungs = pick_rungs(short_side)
+
+    if not rungs:
+        # scale the smallest rung's bitrate down with the pixel count
+        rungs = [(short_side, STANDARD_RUNGS[-1][1] * short_side**2 // 240**2)]
+
+    renditions = []
+
+    for index, (rung_height, base_bitrate) in enumerate(rungs):
+        scale = rung_height / short_side
+        rung_width = make_even(round(max(width, height) * scale))
+        rung_short = make_even(rung_height)
+        frame_rate = min(fps, MAX_FPS if rung_height >= HIGH_FPS_MIN_HEIGHT else 30)
+
+        # rung bitrates are for 16:9, wider or narrower frames scale by area
+        bitrate = base_bitrate * complexity * (rung_width / rung_short) / (16 / 9)
+
+        if frame_rate > 30:
+            bitrate *= HIGH_FPS_FACTOR
+
+        if bit_rate:
+            bitrate = min(bitrate, bit_rate)
+
+        # portrait sources keep their orientation
+        if width >= height:
+            size = (rung_width, rung_short)
+        else:
+            size = (rung_short, rung_width)
+
+        renditions.append(
+            Rendition(f"h264_{rung_height}p", "h264", *size, int(bitrate), frame_rate)
+        )
+
+        if index < MAX_HEVC_RUNGS and rung_height >= HEVC_MIN_HEIGHT:
+            renditions.append(
+                Rendition(
+                    f"h265_{rung_height}p",
+                    "h265",
+                    *size,
+                    int(bitrate * HEVC_FACTOR),
+                    frame_rate,
+                )
+            )
+
+    return renditions
@@ -0,0 +1,74 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy.dialects.mysql import insert
+
+from .context import db, like_buffer
+from .models.likes import Likes
+from .models.video import Video
+from .stats import bump_video_stats
+from .trending import bump_video_activity, hour_bucket
+
+
+# Liking is a single INSERT IGNORE against uq_likes_video_user and unliking a
+# single DELETE, so repeated or concurrent clicks are idempotent; only a
+# statement that actually changed a row queues a counter delta. Returns
+# whether the like state changed.
+def set_like(video_id: int, user_id: int, liked: bool) -> bool:
+    if liked:
+        result = db.session.execute(
+            insert(Likes)
+            .prefix_with("IGNORE")
+            .values(video_id=video_id, user_id=user_id, created_at=datetime.now())
+        )
+    else:
+        result = db.session.execute(
+            db.delete(Likes).where(Likes.video_id == video_id, Likes.user_id == user_id)
+        )
+
+    db.session.commit()
+
+    changed = result.rowcount > 0
+
+    if changed:
+        like_buffer.add((video_id, 1 if liked else -1, datetime.now()))
+
+    return changed
+
+
+# Deltas are summed per video before they reach video_stats, so a hot video
+# takes one counter upsert per flush instead of one row lock per click.
+@like_buffer.flusher
+def flush_like_deltas(events: list[tuple[int, int, datetime]]) -> None:
+    # a video deleted or purged since the click must not get its counters
+    # back, nor fail the batch on the foreign key
+    live = set(
+        db.session.scalars(
+            db.select(Video.id).where(
+                Video.id.in_({video_id for video_id, _, _ in events}),
+                Video.status == 0,
+            )
+        )
+    )
+
+    events = [event for event in events if event[0] in live]
+
+    if not events:
+        return
+
+    deltas = Counter()
+    buckets = Counter()
+
+    for video_id, delta, at in events:
+        deltas[video_id] += delta
+        buckets[video_id, hour_bucket(at)] += delta
+
+    for video_id, delta in deltas.items():
+        if delta:
+            bump_video_stats(video_id, likes=delta)
+
+    for (video_id, bucket), delta in buckets.items():
+        if delta:
+            bump_video_activity(video_id, likes=delta, at=bucket)
+
+    db.session.commit()
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+from .context import db
+from .models.user import User
+from .models.video import Video
+from .models.video_stats import VideoStats
+from .util import decode_keyset_cursor, encode_cursor
+
+PAGE_SIZE = 24
+MAX_PAGE_SIZE = 60
+
+LISTING_SORTS = ("recent", "views")
+
+
+def video_card_select():
+    return (
+        db.select(
+            Video,
+            VideoStats.view_count,
+            User.picture,
+        )
+        .join(VideoStats, VideoStats.video_id == Video.id)
+        .join(User, User.id == Video.user_id)
+        .where(Video.hidden == 0)
+        .where(Video.status == 0)
+    )
+
+
+def video_card_json(video: Video, view_count: int, picture: str | None) -> dict:
+    return {
+        "hash": video.hash,
+        "title": video.title,
+        "thumbnail_url": video.thumbnail_url,
+        "view_count": view_count,
+        "uploader_picture": picture,
+    }
+
+
+# Keyset pagination: the cursor is the (sort key, id) of the last row served,
+# so every page is an index range scan no matter how deep it is.
+def list_videos(
+    sort: str = "recent",
+    user_id: int | None = None,
+    cursor: str | None = None,
+    limit: int = PAGE_SIZE,
+):
+    if sort not in LISTING_SORTS:
+        raise ValueError(f"Invalid sort: {sort}")
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    if sort == "recent":
+        key, tiebreak = Video.created_at, Video.id
+    else:
+        key, tiebreak = VideoStats.view_count, VideoStats.video_id
+
+    stmt = video_card_select()
+
+    if user_id is not None:
+        stmt = stmt.where(Video.user_id == user_id)
+
+    if cursor:
+        last_key, last_id = decode_keyset_cursor(
+            cursor, datetime if sort == "recent" else int
+        )
+
+        stmt = stmt.where(
+            or_(key < last_key, and_(key == last_key, tiebreak < last_id))
+        )
+
+    rows = db.session.execute(
+        stmt.order_by(key.desc(), tiebreak.desc()).limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        video, view_count, _ = rows[-1]
+        next_cursor = encode_cursor(
+            video.created_at.isoformat() if sort == "recent" else view_count,
+            video.id,
+        )
+
+    return rows, next_cursor
@@ -0,0 +1,130 @@
+from collections import defaultdict, deque
+from math import ceil
+from threading import Lock
+from time import perf_counter, thread_time
+from typing import Callable
+
+from flask import (
+    Flask,
+    before_render_template,
+    g,
+    has_request_context,
+    request,
+    template_rendered,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+
+    return sorted_values[max(0, ceil(len(sorted_values) * fraction) - 1)]
+
+
+# In-process counters, gauges and latency reservoirs, plus collectors that
+# report the state of other components (caches, queues) when a snapshot is
+# taken. Each gunicorn worker reports its own numbers.
+class Metrics:
+    def __init__(self, samples: int = 2048):
+        self.samples = samples
+        self.lock = Lock()
+        self.counters: dict[str, int] = defaultdict(int)
+        self.gauges: dict[str, float] = {}
+        self.timings: dict[str, deque] = {}
+        self.values: dict[str, deque] = {}
+        self.collectors: dict[str, Callable[[], dict]] = {}
+
+    # Records latency and database round-trips per endpoint, as
+    # request.<endpoint> timings and queries.<endpoint> values, and the CPU
+    # time spent rendering each page template as render.<template>.
+    def init_app(self, app: Flask) -> None:
+        event.listen(Engine, "before_cursor_execute", self._count_query)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._finish_render, app)
+
+    def incr(self, name: str, value: int = 1) -> None:
+        with self.lock:
+            self.counters[name] += value
+
+    def gauge(self, name: str, value: float) -> None:
+        with self.lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, seconds: float) -> None:
+        self._append(self.timings, name, seconds)
+
+    def record(self, name: str, value: float) -> None:
+        self._append(self.values, name, value)
+
+    def collector(self, name: str, collect: Callable[[], dict]) -> None:
+        self.collectors[name] = collect
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            timings = {name: sorted(values) for name, values in self.timings.items()}
+            values = {name: sorted(samples) for name, samples in self.values.items()}
+
+        return {
+            "counters": counters,
+            "gauges": gauges,
+            "timings": {
+                name: {
+                    "count": len(samples),
+                    "p50_ms": percentile(samples, 0.5) * 1000,
+                    "p99_ms": percentile(samples, 0.99) * 1000,
+                    "max_ms": (samples[-1] if samples else 0.0) * 1000,
+                }
+                for name, samples in timings.items()
+            },
+            "values": {
+                name: {
+                    "count": len(samples),
+                    "mean": sum(samples) / len(samples) if samples else 0.0,
+                    "p50": percentile(samples, 0.5),
+                    "p99": percentile(samples, 0.99),
+                    "max": samples[-1] if samples else 0.0,
+                }
+                for name, samples in values.items()
+            },
+            **{name: collect() for name, collect in self.collectors.items()},
+        }
+
+    def _append(self, reservoirs: dict[str, deque], name: str, value: float) -> None:
+        with self.lock:
+            if name not in reservoirs:
+                reservoirs[name] = deque(maxlen=self.samples)
+            reservoirs[name].append(value)
+
+    def _count_query(self, *args, **kwargs) -> None:
+        if has_request_context():
+            g.query_count = g.get("query_count", 0) + 1
+
+    def _start_request(self) -> None:
+        g.request_started = perf_counter()
+        g.query_count = 0
+
+    def _start_render(self, sender, template, **extra) -> None:
+        if has_request_context():
+            g.render_started = thread_time()
+
+    def _finish_render(self, sender, template, **extra) -> None:
+        started = g.pop("render_started", None) if has_request_context() else None
+
+        if started is not None:
+            self.observe(f"render.{template.name}", thread_time() - started)
+
+    def _finish_request(self, response):
+        started = g.get("request_started")
+
+        if started is not None:
+            endpoint = request.endpoint or "unmatched"
+            self.observe(f"request.{endpoint}", perf_counter() - started)
+            self.record(f"queries.{endpoint}", g.get("query_count", 0))
+
+        return response
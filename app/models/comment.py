@@ -20,6 +20,10 @@ class Comment(db.Model):
     user = relationship("User", back_populates="comments")
     video = relationship("Video", back_populates="comments")
 
+    __table_args__ = (
+        db.Index("ix_comments_video_created", "video_id", "created_at"),
+    )
+
     def __init__(self, video_id: int, user_id: int, text: str):
         self.video_id = video_id
         self.user_id = user_id
@@ -17,6 +17,10 @@ class Likes(db.Model):
     user = relationship("User", back_populates="likes")
     video = relationship("Video", back_populates="likes")
 
+    __table_args__ = (
+        db.UniqueConstraint("video_id", "user_id", name="uq_likes_video_user"),
+    )
+
     def __init__(self, video_id: int, user_id: int):
         self.video_id = video_id
         self.user_id = user_id
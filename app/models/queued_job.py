@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..context import db
+
+
+class QueuedJob(db.Model):
+    __tablename__ = "job_queue"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    queue: Mapped[str] = mapped_column(String(32), nullable=False)
+    key: Mapped[str] = mapped_column(String(64), nullable=False)
+    state: Mapped[str] = mapped_column(
+        String(16), nullable=False, default="queued"
+    )  # queued, running, done, failed
+    attempts: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
+    run_after: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.now
+    )
+    lease_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    worker: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    last_error: Mapped[str | None] = mapped_column(String(512), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.now
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.now, onupdate=datetime.now
+    )
+
+    __table_args__ = (
+        # one job per key and queue, so submitting twice is a no-op
+        db.Index("uq_job_queue_queue_key", "queue", "key", unique=True),
+        db.Index("ix_job_queue_claim", "queue", "state", "run_after"),
+    )
+
+    def __init__(self, queue: str, key: str):
+        self.queue = queue
+        self.key = key
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, LargeBinary, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..context import db
+
+
+class ServerSession(db.Model):
+    __tablename__ = "sessions"
+
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
+    data: Mapped[bytes] = mapped_column(LargeBinary(65535), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    __table_args__ = (db.Index("ix_sessions_expires", "expires_at"),)
+
+    def __init__(self, id: str, data: bytes, expires_at: datetime, version: int = 0):
+        self.id = id
+        self.data = data
+        self.expires_at = expires_at
+        self.version = version
@@ -20,7 +20,7 @@ class Video(db.Model):
     )  # (0) public, (1) unlisted
     status: Mapped[int] = mapped_column(
         Integer(), nullable=False, default=1
-    )  # (0) ready, (1) processing, (2) failed
+    )  # (0) ready, (1) processing, (2) preparing, (3) failed, (4) deleted
     job: Mapped[str | None] = mapped_column(
         String(384), nullable=True
     )  # Transcoder job ID
@@ -28,12 +28,40 @@ class Video(db.Model):
         DateTime, nullable=False, default=datetime.now
     )
     duration: Mapped[float | None] = mapped_column(Float(), nullable=True)
+    manifests: Mapped[str] = mapped_column(
+        String(32), nullable=False, default="dash", server_default="dash"
+    )  # comma-separated manifest types written by the job ("dash", "hls")
+    seek_previews: Mapped[int] = mapped_column(
+        Integer(), nullable=False, default=0, server_default="0"
+    )  # (1) the job wrote seek-preview sprite sheets
 
     comments = relationship(
         "Comment", cascade="all, delete-orphan", back_populates="video"
     )
     likes = relationship("Likes", cascade="all, delete-orphan", back_populates="video")
     views = relationship("Views", cascade="all, delete-orphan", back_populates="video")
+    activity = relationship(
+        "VideoActivity", cascade="all, delete-orphan", back_populates="video"
+    )
+    stats = relationship(
+        "VideoStats", uselist=False, cascade="all, delete-orphan", back_populates="video"
+    )
+
+    __table_args__ = (
+        db.Index("uq_videos_hash", "hash", unique=True),
+        db.Index("ix_videos_status_hidden_id", "status", "hidden", "id"),
+        db.Index(
+            "ix_videos_status_hidden_created", "status", "hidden", "created_at", "id"
+        ),
+        db.Index("ix_videos_user_created", "user_id", "created_at", "id"),
+        db.Index("ix_videos_job", "job"),
+        db.Index(
+            "ft_videos_title_description",
+            "title",
+            "description",
+            mysql_prefix="FULLTEXT",
+        ),
+    )
 
     def __init__(
         self,
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from ..context import db
+
+
+class VideoActivity(db.Model):
+    __tablename__ = "video_activity_hourly"
+
+    video_id: Mapped[int] = mapped_column(ForeignKey("videos.id"), primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    views: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
+    likes: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
+
+    video = relationship("Video", back_populates="activity")
+
+    def __init__(self, video_id: int, bucket: datetime, views: int = 0, likes: int = 0):
+        self.video_id = video_id
+        self.bucket = bucket
+        self.views = views
+        self.likes = likes
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Float, ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from ..context import db
+
+
+class VideoStats(db.Model):
+    __tablename__ = "video_stats"
+
+    video_id: Mapped[int] = mapped_column(ForeignKey("videos.id"), primary_key=True)
+    view_count: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
+    like_count: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
+    comment_count: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
+    last_view_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    trending_score: Mapped[float] = mapped_column(Float(), nullable=False, default=0)
+
+    video = relationship("Video", back_populates="stats")
+
+    __table_args__ = (
+        db.Index("ix_video_stats_view_count", "view_count"),
+        db.Index("ix_video_stats_like_count", "like_count"),
+        db.Index("ix_video_stats_trending_score", "trending_score"),
+    )
+
+    def __init__(
+        self,
+        video_id: int,
+        view_count: int = 0,
+        like_count: int = 0,
+        comment_count: int = 0,
+        last_view_at: datetime | None = None,
+    ):
+        self.video_id = video_id
+        self.view_count = view_count
+        self.like_count = like_count
+        self.comment_count = comment_count
+        self.last_view_at = last_view_at
+        self.trending_score = 0
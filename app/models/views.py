@@ -17,6 +17,8 @@ class Views(db.Model):
     user = relationship("User", back_populates="views")
     video = relationship("Video", back_populates="views")
 
+    __table_args__ = (db.Index("ix_views_video_created", "video_id", "created_at"),)
+
     def __init__(self, video_id: int, user_id: int | None = None):
         self.video_id = video_id
         self.user_id = user_id
@@ -0,0 +1,135 @@
+from flask import current_app
+
+from .context import db, storage_manager
+from .models.video import Video
+from .seek_previews import seek_sprite_path, seek_vtt_path
+from .signals import video_deleted, video_published
+
+
+def manifest_path(video_hash: str) -> str:
+    return f"transcoded/{video_hash}/manifest.mpd"
+
+
+def hls_manifest_path(video_hash: str) -> str:
+    return f"transcoded/{video_hash}/master.m3u8"
+
+
+def thumbnail_path(video_hash: str) -> str:
+    return f"transcoded/{video_hash}/small-thumbnail0000000000.jpeg"
+
+
+# The job writes the thumbnail alongside the manifest; both are checked in
+# one concurrent round trip so a video is never published without it.
+def manifest_ready(video_hash: str, use_cache: bool = True) -> bool:
+    found = storage_manager.paths_exist(
+        [manifest_path(video_hash), thumbnail_path(video_hash)], use_cache=use_cache
+    )
+    return all(found.values())
+
+
+# Callers have seen the manifest and thumbnail, so from here on the object
+# URLs are derived without touching the bucket. Jobs created before HLS output
+# only wrote the DASH manifest, and jobs created before seek previews no
+# sprite sheets, so which of them exist is checked once here and recorded.
+def publish_video(video: Video) -> None:
+    found = storage_manager.paths_exist(
+        [hls_manifest_path(video.hash), *seek_preview_paths(video.hash)],
+        use_cache=False,
+    )
+
+    video.status = 0
+    video.thumbnail_url = storage_manager.public_url(thumbnail_path(video.hash))
+    video.manifests = "dash,hls" if found[hls_manifest_path(video.hash)] else "dash"
+    video.seek_previews = int(
+        all(found[path] for path in seek_preview_paths(video.hash))
+    )
+
+    db.session.commit()
+
+    video_published.send(
+        current_app._get_current_object(),
+        video_id=video.id,
+        video_hash=video.hash,
+        title=video.title,
+        hidden=video.hidden,
+    )
+
+
+# the thumbnails track and the first sheet it points at
+def seek_preview_paths(video_hash: str) -> list[str]:
+    return [seek_vtt_path(video_hash), seek_sprite_path(video_hash, 0)]
+
+
+# Records seek previews for videos published before they were tracked on the
+# row; returns how many videos have them.
+def backfill_seek_previews(batch_size: int = 100) -> int:
+    recorded = 0
+    last_id = 0
+
+    while True:
+        videos = db.session.execute(
+            db.select(Video.id, Video.hash)
+            .where(Video.status == 0, Video.seek_previews == 0, Video.id > last_id)
+            .order_by(Video.id)
+            .limit(batch_size)
+        ).all()
+
+        if not videos:
+            return recorded
+
+        found = storage_manager.paths_exist(
+            [path for video in videos for path in seek_preview_paths(video.hash)],
+            use_cache=False,
+        )
+        ready = [
+            video.id
+            for video in videos
+            if all(found[path] for path in seek_preview_paths(video.hash))
+        ]
+
+        if ready:
+            db.session.execute(
+                db.update(Video).where(Video.id.in_(ready)).values(seek_previews=1)
+            )
+            db.session.commit()
+
+        recorded += len(ready)
+        last_id = videos[-1].id
+
+
+# Applies a finished transcoder job to its video, for the Pub/Sub callback and
+# the local engine alike. Returns "not_found", "already_processed",
+# "unavailable" (the outputs are not visible yet), "published", "failed" or
+# "invalid_state".
+def complete_transcoder_job(job_name: str, job_state: str) -> str:
+    video = db.session.scalar(db.select(Video).where(Video.job == job_name))
+
+    if not video or video.status == 4:
+        return "not_found"
+
+    if video.status == 0:
+        return "already_processed"
+
+    if job_state == "FAILED":
+        video.job = None
+        video.status = 3
+        db.session.commit()
+        return "failed"
+
+    if job_state != "SUCCEEDED":
+        return "invalid_state"
+
+    # job callbacks arrive once, so they must not see a cached miss
+    if not manifest_ready(video.hash, use_cache=False):
+        return "unavailable"
+
+    video.job = None
+    publish_video(video)
+
+    return "published"
+
+
+def notify_video_deleted(video_id: int, video_hash: str) -> None:
+    video_deleted.send(
+        current_app._get_current_object(), video_id=video_id, video_hash=video_hash
+    )
@@ -0,0 +1,72 @@
+from sqlalchemy import delete
+
+from .context import db, purge_queue, storage_manager
+from .models.comment import Comment
+from .models.likes import Likes
+from .models.video import Video
+from .models.video_activity import VideoActivity
+from .models.video_stats import VideoStats
+from .models.views import Views
+from .publishing import notify_video_deleted
+
+PURGE_CHUNK = 5000
+
+
+# The video disappears from every page right away (status 4, deleted); its
+# rows and bucket objects are removed by the purge queue.
+def delete_video(video: Video) -> None:
+    video_id, video_hash = video.id, video.hash
+
+    video.status = 4
+    db.session.commit()
+
+    notify_video_deleted(video_id, video_hash)
+    purge_queue.submit(video_id, video_hash)
+
+
+def report(message: str) -> None:
+    print(f"[purge] {message}")
+
+
+# Removes a video marked deleted (status 4): its bucket objects first, then
+# its rows in chunks, one short transaction per chunk, and the video row last,
+# so an interrupted purge is still found and resumed by 'flask videos purge'.
+@purge_queue.handler
+def purge_video(video_id: int, video_hash: str) -> None:
+    for prefix in (f"uploads/{video_hash}", f"transcoded/{video_hash}/"):
+        deleted = storage_manager.delete_prefix(
+            prefix,
+            progress=lambda done, total: report(f"{prefix}: {done}/{total} object(s)"),
+        )
+        report(f"{prefix}: {deleted} object(s) deleted")
+
+    for model in (Likes, Comment, Views, VideoActivity, VideoStats):
+        deleted = 0
+
+        while True:
+            result = db.session.execute(
+                delete(model)
+                .where(model.video_id == video_id)
+                .with_dialect_options(mysql_limit=PURGE_CHUNK)
+            )
+            db.session.commit()
+
+            deleted += result.rowcount
+
+            if result.rowcount < PURGE_CHUNK:
+                break
+
+            report(f"video {video_id}: {deleted} {model.__tablename__} row(s) so far")
+
+        report(f"video {video_id}: {deleted} {model.__tablename__} row(s) deleted")
+
+    db.session.execute(delete(Video).where(Video.id == video_id, Video.status == 4))
+    db.session.commit()
+
+    report(f"video {video_id} ({video_hash}) purged")
+
+
+def pending_purges() -> list[tuple[int, str]]:
+    return db.session.execute(
+        db.select(Video.id, Video.hash).where(Video.status == 4)
+    ).all()
@@ -0,0 +1,57 @@
+from threading import Lock
+from typing import Any, Hashable, Optional
+
+from cachetools import LRUCache, TTLCache
+
+
+class ResultCache:
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        # with a ttl, entries also expire so values other workers change
+        # (counters) are never more than ttl seconds stale
+        self.entries: LRUCache = (
+            LRUCache(maxsize=maxsize)
+            if ttl is None
+            else TTLCache(maxsize=maxsize, ttl=ttl)
+        )
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Any:
+        with self.lock:
+            value = self.entries.get(key)
+
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self.lock:
+            self.entries[key] = value
+
+    def discard(self, key: Hashable) -> None:
+        with self.lock:
+            if self.entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+
+            return {
+                "size": len(self.entries),
+                "maxsize": self.entries.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
@@ -1,6 +1,9 @@
 from . import (
+    channel,
     main,
+    metrics,
     search,
+    storage,
     transcoder,
     video,
     upload,
@@ -0,0 +1,37 @@
+from flask import Blueprint, render_template, request, url_for
+from flask_login import current_user
+
+from ..context import db
+from ..listing import LISTING_SORTS, list_videos
+from ..models.user import User
+
+route_channel_bp = Blueprint("channel", __name__, url_prefix="/channel")
+
+
+@route_channel_bp.route("/<int:user_id>", methods=["GET"])
+def route_channel(user_id):
+    channel_user = db.session.get(User, user_id)
+
+    if not channel_user:
+        return render_template(
+            "redirect.html",
+            redirect_url=url_for("main.route_index"),
+            message="Channel not found.",
+            timeout=5,
+        )
+
+    sort = request.args.get("sort", "recent")
+
+    if sort not in LISTING_SORTS:
+        sort = "recent"
+
+    videos, next_cursor = list_videos(sort=sort, user_id=channel_user.id)
+
+    return render_template(
+        "channel.html",
+        user=current_user,
+        channel_user=channel_user,
+        sort=sort,
+        videos=videos,
+        next_cursor=next_cursor,
+    )
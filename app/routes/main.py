@@ -1,97 +1,135 @@
+from typing import NamedTuple
+
 from flask import Blueprint, render_template
 from flask_login import current_user
-from sqlalchemy import func, text
 
 from ..context import (
     db,
+    random_sampler,
+    shelf_cache,
 )
-from ..models.likes import Likes
-from ..models.user import User
+from ..listing import video_card_select
 from ..models.video import Video
-from ..models.views import Views
+from ..models.video_stats import VideoStats
+from ..signals import video_deleted, video_published
+from ..trending import refresh_trending_scores_if_due
 
 main_bp = Blueprint("main", __name__, url_prefix="/")
 
 
-@main_bp.route("/", methods=["GET"])
-def route_index():
-    most_watched = db.session.execute(
-        db.select(Video, func.count(Views.id).label("view_count"), User.picture)
-        .outerjoin(Views, Video.id == Views.video_id)
-        .join(User, User.id == Video.user_id)
-        .where(Video.hidden == 0)
-        .where(Video.status == 0)
-        .group_by(Video.id, User.picture)
-        .order_by(func.count(Views.id).desc())
-        .limit(4)
-    ).all()
+class VideoCard(NamedTuple):
+    id: int
+    hash: str
+    title: str
+    thumbnail_url: str
 
-    most_liked = db.session.execute(
-        db.select(Video, func.count(Views.id).label("view_count"), User.picture)
-        .outerjoin(Views, Video.id == Views.video_id)  # For view count
-        .join(Likes, Video.id == Likes.video_id)  # For like count ordering
-        .join(User, User.id == Video.user_id)
-        .where(Video.hidden == 0)
-        .group_by(Video.id, User.picture)
-        .order_by(func.count(Likes.id).desc())
-        .limit(4)
-    ).all()
 
-    trending = db.session.execute(
-        db.select(Video, func.count(Views.id).label("view_count"), User.picture)
-        .outerjoin(Views, Video.id == Views.video_id)
-        .join(User, User.id == Video.user_id)
-        .where(Views.created_at >= text("NOW() - INTERVAL 1 DAY"))
-        .where(Video.hidden == 0)
-        .where(Video.status == 0)
-        .group_by(Video.id, User.picture)
-        .order_by(func.count(Views.id).desc())
-        .limit(4)
-    ).all()
+def to_video_cards(rows) -> list[tuple[VideoCard, int, str | None]]:
+    # cached shelves outlive the session, so keep plain values instead of ORM rows
+    return [
+        (
+            VideoCard(video.id, video.hash, video.title, video.thumbnail_url),
+            view_count,
+            picture,
+        )
+        for video, view_count, picture in rows
+    ]
 
-    random_videos = db.session.execute(
-        db.select(Video, func.count(Views.id).label("view_count"), User.picture)
-        .outerjoin(Views, Video.id == Views.video_id)
-        .join(User, User.id == Video.user_id)
-        .where(Video.hidden == 0)
-        .where(Video.status == 0)
-        .group_by(Video.id, User.picture)
-        .order_by(db.func.random())
-        .limit(4)
-    ).all()
 
-    most_recent = db.session.execute(
-        db.select(Video, func.count(Views.id).label("view_count"), User.picture)
-        .outerjoin(Views, Video.id == Views.video_id)
-        .join(User, User.id == Video.user_id)
-        .where(Video.hidden == 0)
-        .where(Video.status == 0)
-        .group_by(Video.id, User.picture)
-        .order_by(db.desc(Video.id))
-        .limit(4)
+@shelf_cache.register("most_watched", ttl=300)
+def load_most_watched():
+    return to_video_cards(
+        db.session.execute(
+            video_card_select().order_by(VideoStats.view_count.desc()).limit(4)
+        ).all()
+    )
+
+
+@shelf_cache.register("most_liked", ttl=300)
+def load_most_liked():
+    return to_video_cards(
+        db.session.execute(
+            video_card_select()
+            .where(VideoStats.like_count > 0)
+            .order_by(VideoStats.like_count.desc())
+            .limit(4)
+        ).all()
+    )
+
+
+@shelf_cache.register("trending", ttl=60)
+def load_trending():
+    refresh_trending_scores_if_due()
+
+    return to_video_cards(
+        db.session.execute(
+            video_card_select()
+            .where(VideoStats.trending_score > 0)
+            .order_by(VideoStats.trending_score.desc())
+            .limit(4)
+        ).all()
+    )
+
+
+@random_sampler.loader
+def load_random_candidates():
+    return db.session.scalars(
+        db.select(Video.id).where(Video.hidden == 0).where(Video.status == 0)
     ).all()
 
+
+@shelf_cache.register("most_recent", ttl=60)
+def load_most_recent():
+    return to_video_cards(
+        db.session.execute(
+            video_card_select().order_by(db.desc(Video.id)).limit(4)
+        ).all()
+    )
+
+
+@video_published.connect
+@video_deleted.connect
+def invalidate_shelves(sender, **extra):
+    shelf_cache.invalidate()
+
+
+@video_published.connect
+def add_random_candidate(sender, video_id, hidden=0, **extra):
+    if not hidden:
+        random_sampler.add(video_id)
+
+
+@video_deleted.connect
+def discard_random_candidate(sender, video_id, **extra):
+    random_sampler.discard(video_id)
+
+
+@main_bp.route("/", methods=["GET"])
+def route_index():
     user_videos = []
     if current_user.is_authenticated:
         user_videos = db.session.execute(
-            db.select(Video, func.count(Views.id).label("view_count"), User.picture)
-            .outerjoin(Views, Video.id == Views.video_id)
-            .join(User, User.id == Video.user_id)
-            .where(Video.hidden == 0)
-            .where(Video.status == 0)
+            video_card_select()
             .where(Video.user_id == current_user.id)
-            .group_by(Video.id, User.picture)
             .order_by(db.desc(Video.id))
             .limit(4)
         ).all()
 
+    random_ids = random_sampler.sample(4)
+    random_videos = (
+        db.session.execute(video_card_select().where(Video.id.in_(random_ids))).all()
+        if random_ids
+        else []
+    )
+
     return render_template(
         "index.html",
         user=current_user,
-        most_watched=most_watched,
-        most_liked=most_liked,
-        trending=trending,
+        # (cards, version) pairs; the version keys the rendered shelf
+        most_watched=shelf_cache.get_versioned("most_watched"),
+        most_liked=shelf_cache.get_versioned("most_liked"),
+        trending=shelf_cache.get_versioned("trending"),
         random_videos=random_videos,
         user_videos=user_videos,
-        most_recent=most_recent,
+        most_recent=shelf_cache.get_versioned("most_recent"),
     )
@@ -0,0 +1,28 @@
+import hmac
+
+from flask import Blueprint, jsonify, request
+
+from ..context import gae, metrics
+
+route_metrics_bp = Blueprint("metrics", __name__, url_prefix="/api/metrics")
+
+
+# Session, queue, cache and query numbers are internal, so they are only
+# served to callers presenting PSEUDOTUBE_METRICS_TOKEN as a bearer token;
+# without a token configured the endpoint does not exist.
+@route_metrics_bp.route("/", methods=["GET"])
+def route_metrics():
+    if not gae.METRICS_TOKEN:
+        return jsonify({"error": "Not found"}), 404
+
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+
+    if scheme.lower() != "bearer" or not hmac.compare_digest(
+        token.encode(), gae.METRICS_TOKEN.encode()
+    ):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    response = jsonify(metrics.snapshot())
+    response.cache_control.no_store = True
+
+    return response, 200
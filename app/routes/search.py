@@ -1,19 +1,55 @@
 from flask import request, url_for
-from flask import Blueprint, render_template
+from flask import Blueprint, jsonify, render_template
 from flask_login import current_user
-from sqlalchemy import func
 
-from ..context import (
-    db,
-)
-from ..models.user import User
+from ..context import db, search_cache, suggest_index
 from ..models.video import Video
-from ..models.views import Views
+from ..models.video_stats import VideoStats
+from ..search import MAX_PAGE, search_videos
+from ..signals import video_deleted, video_published
 
 route_search_bp = Blueprint("search", __name__, url_prefix="/search")
 
 
-@route_search_bp.route("/search", methods=["GET"])
+@suggest_index.loader
+def load_suggest_videos():
+    return db.session.execute(
+        db.select(Video.id, Video.title, VideoStats.view_count)
+        .join(VideoStats, VideoStats.video_id == Video.id)
+        .where(Video.hidden == 0)
+        .where(Video.status == 0)
+    ).all()
+
+
+@video_published.connect
+def add_suggest_video(sender, video_id, title, hidden=0, **extra):
+    if not hidden:
+        suggest_index.add(video_id, title)
+
+
+@video_deleted.connect
+def discard_suggest_video(sender, video_id, **extra):
+    suggest_index.discard(video_id)
+
+
+@video_published.connect
+@video_deleted.connect
+def invalidate_search_cache(sender, **extra):
+    search_cache.clear()
+
+
+@route_search_bp.route("/suggest", methods=["GET"])
+def route_search_suggest():
+    prefix = request.args.get("q", "")[:64]
+
+    response = jsonify({"suggestions": suggest_index.suggest(prefix)})
+    response.cache_control.public = True
+    response.cache_control.max_age = 60
+
+    return response
+
+
+@route_search_bp.route("/", methods=["GET"])
 def route_search():
     if request.method == "POST":
         search_query = request.form.get("search-query", "").strip()
@@ -23,23 +59,21 @@ def route_search():
     if not search_query:
         return render_template(
             "redirect.html",
-            redirect_url=url_for("main_bp.main.route_index"),
+            redirect_url=url_for("main.route_index"),
             message="Search query cannot be empty.",
             timeout=5,
         )
 
-    videos = db.session.execute(
-        db.select(Video, func.count(Views.id).label("view_count"), User.picture)
-        .outerjoin(Views, Video.id == Views.video_id)
-        .join(User, User.id == Video.user_id)
-        .where(Video.status == 0)
-        .where(Video.title.ilike(f"%{search_query}%"))
-        .group_by(Video.id, User.picture)
-    ).all()
+    # the pager shows the page actually searched
+    page = max(1, min(request.args.get("page", 1, type=int), MAX_PAGE))
+
+    videos, has_more = search_videos(search_query, page)
 
     return render_template(
         "search_results.html",
         user=current_user,
         search_query=search_query,
         videos=videos,
+        page=page,
+        has_more=has_more,
     )
@@ -0,0 +1,49 @@
+import mimetypes
+
+from flask import Blueprint, jsonify, request, send_from_directory
+
+from ..context import storage_manager
+
+# Registered only with PSEUDOTUBE_STORAGE_TYPE=local.
+route_storage_bp = Blueprint("storage", __name__, url_prefix="/storage")
+
+mimetypes.add_type("application/dash+xml", ".mpd")
+mimetypes.add_type("video/iso.segment", ".m4s")
+mimetypes.add_type("application/vnd.apple.mpegurl", ".m3u8")
+
+# a rendition never changes once its job has written it
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+# send_file answers Range requests with 206 partial content, sets ETag and
+# Last-Modified from the file, and answers conditional requests with 304;
+# the file itself goes out through the server's file wrapper, which gunicorn
+# turns into sendfile(), so segment bytes never pass through Python.
+@route_storage_bp.route("/<path:path>", methods=["GET", "HEAD"])
+def route_storage_file(path):
+    return send_from_directory(
+        storage_manager.backend.root,
+        path,
+        conditional=True,
+        etag=True,
+        max_age=IMMUTABLE_MAX_AGE if path.startswith("transcoded/") else None,
+    )
+
+
+@route_storage_bp.route("/upload/<path:path>", methods=["PUT"])
+def route_storage_upload(path):
+    backend = storage_manager.backend
+    expires = request.args.get("expires", type=int)
+    signature = request.args.get("signature", "")
+
+    if expires is None or not backend.verify_upload(path, expires, signature):
+        return jsonify({"error": "Invalid or expired upload URL"}), 403
+
+    try:
+        backend.write(request.stream, path)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    storage_manager.forget_path(path)
+
+    return jsonify({"message": "Upload complete"}), 200
@@ -1,7 +1,8 @@
 from time import time
 from ..models.video import Video
 from flask import Blueprint, request, jsonify, session
-from ..context import db, storage_manager
+from ..context import db
+from ..publishing import complete_transcoder_job, manifest_ready, publish_video
 
 route_transcoder_bp = Blueprint("transcoder", __name__, url_prefix="/api/transcoder")
 
@@ -16,31 +17,20 @@ def route_transcoder_status():
         if not job_name or not job_state:
             return jsonify({"error": "Missing job_name or job_state"}), 400
 
-        video = db.session.scalar(db.select(Video).where(Video.job == job_name))
+        result = complete_transcoder_job(job_name, job_state)
 
-        if not video:
+        if result == "not_found":
             return jsonify({"error": "Video not found"}), 404
 
-        if video.status == 0:
+        if result == "already_processed":
             return jsonify({"message": "Video already processed"}), 200
 
-        if not storage_manager.path_exists(f"transcoded/{video.hash}/manifest.mpd"):
+        if result == "unavailable":
             return jsonify({"error": "Video file is still unavailable"}), 404
 
-        video.job = None
-
-        if job_state == "SUCCEEDED":
-            video.status = 0
-            video.thumbnail_url = storage_manager.get_public_url(
-                f"transcoded/{video.hash}/small-thumbnail0000000000.jpeg"
-            )
-        elif job_state == "FAILED":
-            video.status = 2  # Failed status
-        else:
+        if result == "invalid_state":
             return jsonify({"error": "Invalid job state"}), 400
 
-        db.session.commit()
-
         return jsonify({"message": "Job status updated successfully"}), 200
     else:
         timestamp = time()
@@ -57,18 +47,14 @@ def route_transcoder_status():
 
         video = db.session.scalar(db.select(Video).where(Video.hash == video_hash))
 
-        if not video:
+        if not video or video.status == 4:
             return jsonify({"error": "Video not found"}), 404
 
         if video.status == 0:
             return jsonify({"status": "processed"}), 200
         else:
-            if storage_manager.path_exists(f"transcoded/{video.hash}/manifest.mpd"):
-                video.status = 0
-                video.thumbnail_url = storage_manager.get_public_url(
-                    f"transcoded/{video.hash}/small-thumbnail0000000000.jpeg"
-                )
-                db.session.commit()
+            if manifest_ready(video.hash):
+                publish_video(video)
                 return jsonify({"status": "processed"}), 200
 
             if video.status == 1:
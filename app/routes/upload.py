@@ -1,5 +1,3 @@
-from threading import Thread
-
 import json
 import os
 import subprocess
@@ -15,14 +13,17 @@ from flask import (
     request,
     session,
     url_for,
-    current_app,
 )
 from flask_login import current_user
 from google.auth.transport import requests as google_requests
 from google.oauth2 import id_token
 
-from ..context import db, gae, storage_manager, transcoder_service
+from ..context import db, gae, storage_manager, transcode_queue, transcoder_service
 from ..models.video import Video
+from ..ladder import plan_ladder
+from ..models.video_stats import VideoStats
+from ..publishing import complete_transcoder_job
+from ..seek_previews import plan_seek_sprites, seek_vtt, seek_vtt_path
 
 route_upload_bp = Blueprint("upload", __name__, url_prefix="/upload")
 
@@ -93,7 +94,8 @@ def upload():
 
     upload_hash = session["last_upload_hash"]
 
-    if not storage_manager.path_exists(f"uploads/{upload_hash}"):
+    # the client has just finished the upload, so skip the existence cache
+    if not storage_manager.path_exists(f"uploads/{upload_hash}", use_cache=False):
         return render_template(
             "redirect.html",
             redirect_url=url_for("main.route_index"),
@@ -105,28 +107,23 @@ def upload():
     title = data.get("title", "Untitled Video")
     description = data.get("description", "")
 
-    db.session.add(
-        Video(
-            title=title,
-            description=description,
-            hash=upload_hash,
-            thumbnail_url="",
-            user_id=current_user.id,
-            hidden=0,
-            status=2,
-        )
+    video = Video(
+        title=title,
+        description=description,
+        hash=upload_hash,
+        thumbnail_url="",
+        user_id=current_user.id,
+        hidden=0,
+        status=2,
     )
 
+    db.session.add(video)
+    db.session.flush()
+    db.session.add(VideoStats(video_id=video.id))
+
     db.session.commit()
 
-    thread = Thread(
-        target=create_upload_job,
-        args=(
-            current_app._get_current_object(),
-            upload_hash,
-        ),
-    )
-    thread.start()
+    transcode_queue.submit(upload_hash)
 
     session.pop("last_upload_timestamp")
     session.pop("last_upload_url")
@@ -155,13 +152,18 @@ def get_video_metadata(upload_hash):
             gae.GCF_FFPROBE,
             headers=headers,
             data=json.dumps(
-                {"gcs_path": f"gs://{gae.GCP_BUCKET_NAME}/uploads/{upload_hash}"}
+                {"gcs_path": storage_manager.uri(f"uploads/{upload_hash}")}
             ),
         )
 
         metadata = response.json()
     else:
-        url = storage_manager.get_public_url(f"uploads/{upload_hash}")
+        # ffprobe reads local files directly and bucket objects over HTTPS
+        url = (
+            storage_manager.uri(f"uploads/{upload_hash}")
+            if storage_manager.storage_type == "local"
+            else storage_manager.get_public_url(f"uploads/{upload_hash}")
+        )
 
         result = subprocess.run(
             [
@@ -171,7 +173,7 @@ def get_video_metadata(upload_hash):
                 "-select_streams",
                 "v:0",
                 "-show_entries",
-                "stream=width,height,r_frame_rate,duration",
+                "stream=width,height,r_frame_rate,duration,bit_rate:format=bit_rate",
                 "-of",
                 "json",
                 url,
@@ -185,12 +187,17 @@ def get_video_metadata(upload_hash):
         stream = decoded_result["streams"][0]
 
         fps = float(Fraction(stream["r_frame_rate"]))
+        # the container's rate covers formats that do not store a stream rate
+        bit_rate = stream.get("bit_rate") or decoded_result.get("format", {}).get(
+            "bit_rate"
+        )
 
         metadata = {
             "width": stream["width"],
             "height": stream["height"],
             "fps": fps,
             "duration": float(stream.get("duration", 0)),
+            "bit_rate": int(bit_rate) if bit_rate else None,
         }
 
     if not metadata:
@@ -199,37 +206,79 @@ def get_video_metadata(upload_hash):
     return metadata
 
 
-def create_upload_job(app, upload_hash):
-    with app.app_context():
-        video = Video.query.filter_by(hash=upload_hash).first()
+# Runs on the transcode queue, which retries it on failure and may run it
+# again after a worker dies, so each step is safe to repeat: a video that was
+# deleted, or published, or already has a Cloud Transcoder job is left alone,
+# and the thumbnails track is written, idempotently, before the job is
+# created. A local ffmpeg job runs right here, so the queue job (its lease
+# renewed by the queue's heartbeat) spans the whole encode and is only done
+# once the video is published; an encode that fails or dies with its worker
+# is started over.
+@transcode_queue.handler
+def create_upload_job(upload_hash):
+    video = Video.query.filter_by(hash=upload_hash).first()
+    local = gae.TRANSCODER_ENGINE == "ffmpeg"
+
+    if not video or video.status in (0, 4) or (video.job and not local):
+        return
+
+    metadata = get_video_metadata(upload_hash)
+    seek_sprites = plan_seek_sprites(
+        metadata["width"], metadata["height"], metadata["duration"]
+    )
 
-        if not video:
-            raise ValueError(f"Video ({upload_hash}) not found in the database.")
+    renditions = plan_ladder(
+        metadata["width"],
+        metadata["height"],
+        metadata["fps"],
+        metadata.get("bit_rate"),
+    )
 
-        try:
-            metadata = get_video_metadata(upload_hash)
+    # the tile layout is known up front, so the thumbnails track is written
+    # now and only points at sheets once the job has run
+    storage_manager.upload_bytes(
+        seek_vtt(
+            upload_hash, seek_sprites, metadata["duration"], storage_manager.public_url
+        ).encode(),
+        seek_vtt_path(upload_hash),
+        "text/vtt",
+    )
 
-            job = transcoder_service.create_transcoder_job(
-                f"gs://{gae.GCP_BUCKET_NAME}/uploads/{upload_hash}",
-                f"gs://{gae.GCP_BUCKET_NAME}/transcoded/{upload_hash}/",
-                metadata["width"],
-                metadata["height"],
-                metadata["fps"],
-                metadata["duration"],
-            )
+    job = transcoder_service.create_transcoder_job(
+        storage_manager.uri(f"uploads/{upload_hash}"),
+        storage_manager.uri(f"transcoded/{upload_hash}/"),
+        renditions,
+        seek_sprites,
+    )
+
+    if not job:
+        raise ValueError("Failed to create transcoder job.")
+
+    # the owner may have deleted the video (status 4) in the meantime
+    updated = db.session.execute(
+        db.update(Video)
+        .where(Video.id == video.id, Video.status != 4)
+        .values(job=job.name, status=1)
+    ).rowcount
+    db.session.commit()
+
+    if not local or not updated:
+        return
 
-            if not job:
-                raise ValueError("Failed to create transcoder job.")
+    transcoder_service.run_transcoder_job(job)
+    result = complete_transcoder_job(job.name, "SUCCEEDED")
 
-            if not video:
-                raise ValueError(f"Video ({upload_hash}) not found in the database.")
+    if result == "unavailable":
+        raise RuntimeError(f"Outputs of {job.name} are not visible yet.")
 
-            video.job = job.name
-            video.status = 1
 
-            db.session.commit()
+@transcode_queue.on_abandon
+def fail_upload_job(upload_hash, error):
+    print(f"Error processing video {upload_hash}: {error}")
 
-        except Exception:
-            video.status = 3
-            db.session.commit()
-            print(f"Error processing video {upload_hash}: {str(Exception)}")
+    db.session.execute(
+        db.update(Video)
+        .where(Video.hash == upload_hash, Video.status != 4)
+        .values(status=3)
+    )
+    db.session.commit()
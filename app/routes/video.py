@@ -1,16 +1,67 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, get_template_attribute, jsonify, request
 from flask_login import current_user
 from time import time
+from ..comments import COMMENTS_PAGE_SIZE, comment_json, list_comments
 from ..context import db
+from ..likes import set_like
+from ..listing import PAGE_SIZE, list_videos, video_card_json
+from ..purge import delete_video
+from ..stats import bump_video_stats
+from ..view_ingest import queue_view
+from ..watch_tokens import get_watch_token, redeem_watch_token
 
 from ..models.comment import Comment
 from ..models.video import Video
-from ..models.likes import Likes
-from ..models.views import Views
 
 route_video_bp = Blueprint("video", __name__, url_prefix="/api/video")
 
 
+@route_video_bp.route("/list", methods=["GET"])
+def route_video_list():
+    try:
+        rows, next_cursor = list_videos(
+            sort=request.args.get("sort", "recent"),
+            user_id=request.args.get("user", type=int),
+            cursor=request.args.get("cursor"),
+            limit=request.args.get("limit", PAGE_SIZE, type=int),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(
+        {
+            "videos": [video_card_json(*row) for row in rows],
+            "next_cursor": next_cursor,
+        }
+    ), 200
+
+
+@route_video_bp.route("/comments/<video_hash>", methods=["GET"])
+def route_video_comments(video_hash):
+    video_id = db.session.scalar(
+        db.select(Video.id).where(Video.hash == video_hash, Video.status == 0)
+    )
+
+    if not video_id:
+        return jsonify({"error": "Video not found"}), 404
+
+    try:
+        rows, next_cursor = list_comments(
+            video_id,
+            cursor=request.args.get("cursor"),
+            limit=request.args.get("limit", COMMENTS_PAGE_SIZE, type=int),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(
+        {
+            "comments": [comment_json(*row) for row in rows],
+            "next_cursor": next_cursor,
+        }
+    ), 200
+
+
 @route_video_bp.route("/comment/<video_hash>", methods=["POST"])
 def route_video_comment(video_hash):
     if not current_user.is_authenticated:
@@ -40,9 +91,19 @@ def route_video_comment(video_hash):
     )
 
     db.session.add(comment)
+    bump_video_stats(video.id, comments=1)
     db.session.commit()
 
-    return jsonify({"message": "Comment added successfully"}), 201
+    # the client inserts the rendered comment instead of reloading the page
+    comment_item = get_template_attribute("comment.html", "comment_item")
+
+    return jsonify(
+        {
+            "message": "Comment added successfully",
+            "comment": comment_json(comment, current_user.picture),
+            "html": str(comment_item(comment, current_user.picture)),
+        }
+    ), 201
 
 
 @route_video_bp.route("/like/<video_hash>", methods=["POST", "DELETE"])
@@ -53,84 +114,42 @@ def route_video_like(video_hash):
     if not video_hash:
         return jsonify({"error": "Missing video hash"}), 400
 
-    video = db.session.scalar(db.select(Video).where(Video.hash == video_hash))
-
-    if not video:
-        return jsonify({"error": "Video not found"}), 404
-
-    if video.status != 0:
-        return jsonify({"error": "Video is not available"}), 404
-
-    existing_like = db.session.scalar(
-        db.select(Likes).where(
-            Likes.video_id == video.id, Likes.user_id == current_user.id
-        )
+    video_id = db.session.scalar(
+        db.select(Video.id).where(Video.hash == video_hash, Video.status == 0)
     )
 
-    method = request.method
-
-    if method == "DELETE":
-        if not existing_like:
-            return jsonify({"error": "Like not found"}), 404
-
-        db.session.delete(existing_like)
-        db.session.commit()
-
-        return jsonify({"message": "Video like removed successfully"}), 200
-
-    elif method == "POST":
-        if existing_like:
-            return jsonify({"error": "Video already liked"}), 400
-
-        db.session.add(Likes(video_id=video.id, user_id=current_user.id))
-        db.session.commit()
+    if not video_id:
+        return jsonify({"error": "Video not found"}), 404
 
-        return jsonify({"message": "Video liked successfully"}), 200
+    # idempotent: liking twice or unliking a video that is not liked is a no-op
+    liked = request.method == "POST"
+    changed = set_like(video_id, current_user.id, liked)
 
-    else:
-        return jsonify({"liked": existing_like}), 200
+    return jsonify({"liked": liked, "changed": changed}), 200
 
 
 @route_video_bp.route("/view/<watch_id>", methods=["POST"])
 def route_video_view(watch_id):
-    if "watching_list" not in session:
-        return jsonify({"error": "No video watch session found"}), 400
-
-    watching_list = session["watching_list"]
+    watching = get_watch_token(watch_id)
 
-    if watch_id not in watching_list:
+    if watching is None:
         return jsonify({"error": "Invalid watch session ID"}), 400
 
-    watching = watching_list[watch_id]
-
     if watching["watched"]:
         return jsonify({"error": "Video already watched"}), 400
 
-    video_hash = watching["video_hash"]
-
-    video = db.session.scalar(db.select(Video).where(Video.hash == video_hash))
-
-    if time() - watching["watch_start_ts"] <= video.duration * 0.15:
+    if time() - watching["watch_start_ts"] <= watching["duration"] * 0.15:
         return jsonify({"error": "Video view too soon after start"}), 400
 
-    if not video:
-        return jsonify({"error": "Video not found"}), 404
-
-    if video.status != 0:
-        return jsonify({"error": "Video is not available"}), 404
-
-    db.session.add(
-        Views(
-            video_id=video.id,
-            user_id=current_user.id if current_user.is_authenticated else None,
-        )
+    # written in batches by the ingest buffer
+    queue_view(
+        watching["video_id"],
+        current_user.id if current_user.is_authenticated else None,
     )
 
-    db.session.commit()
+    redeem_watch_token(watch_id)
 
-    session["watching_list"][watch_id]["watched"] = True
-
-    return jsonify({"message": "Video view recorded successfully"}), 200
+    return jsonify({"message": "Video view recorded successfully"}), 202
 
 
 @route_video_bp.route("/<video_hash>", methods=["DELETE"])
@@ -143,7 +162,7 @@ def route_video_delete(video_hash):
 
     video = db.session.scalar(db.select(Video).where(Video.hash == video_hash))
 
-    if not video:
+    if not video or video.status == 4:
         return jsonify({"error": "Video not found"}), 404
 
     if video.user_id != current_user.id:
@@ -151,20 +170,6 @@ def route_video_delete(video_hash):
             {"error": "You do not have permission to delete this video"}
         ), 403
 
-    likes = db.session.scalars(db.select(Likes).where(Likes.video_id == video.id)).all()
-    comments = db.session.scalars(
-        db.select(Comment).where(Comment.video_id == video.id)
-    ).all()
-    views = db.session.scalars(db.select(Views).where(Views.video_id == video.id)).all()
-
-    for like in likes:
-        db.session.delete(like)
-    for comment in comments:
-        db.session.delete(comment)
-    for view in views:
-        db.session.delete(view)
-
-    db.session.delete(video)
-    db.session.commit()
+    delete_video(video)
 
-    return jsonify({"message": "Video deleted successfully"}), 200
+    return jsonify({"message": "Video deleted successfully"}), 202
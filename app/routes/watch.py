@@ -1,26 +1,29 @@
-import time
-import uuid
-
-from sqlalchemy import func
-from flask import Blueprint, render_template, session, url_for, redirect
+from flask import Blueprint, render_template, request, url_for, redirect
 from flask_login import current_user
 
-from ..context import db, storage_manager
+from ..comments import list_comments
+from ..context import counter_cache, db, watch_cache
+from ..signals import video_deleted, video_published
+from ..watch_page import choose_manifest_url, load_watch_page, viewer_liked
+from ..watch_tokens import issue_watch_token
 
-from ..models.comment import Comment
-from ..models.likes import Likes
-from ..models.user import User
 from ..models.video import Video
-from ..models.views import Views
 
 route_watch_bp = Blueprint("watch", __name__, url_prefix="/watch")
 
 
+@video_published.connect
+@video_deleted.connect
+def invalidate_watch_page(sender, video_id, video_hash, **extra):
+    watch_cache.discard(video_hash)
+    counter_cache.discard(video_id)
+
+
 @route_watch_bp.route("/<video_hash>", methods=["GET"])
 def route_watch(video_hash):
-    video = db.session.scalar(db.select(Video).where(Video.hash == video_hash))
+    page = load_watch_page(video_hash)
 
-    if not video:
+    if not page:
         return render_template(
             "redirect.html",
             redirect_url=url_for("main.route_index"),
@@ -28,76 +31,27 @@ def route_watch(video_hash):
             timeout=60,
         )
 
-    video_stream_url = None
-
-    try:
-        video_stream_url = storage_manager.get_public_url(
-            f"transcoded/{video.hash}/manifest.mpd"
-        )
-
-        if video.status != 0:
-            video.status = 0
-            video.thumbnail_url = storage_manager.get_public_url(
-                f"transcoded/{video.hash}/small-thumbnail0000000000.jpeg"
-            )
-
-    except RuntimeError as e:
-        if "does not exist in the bucket" in str(e) and video.status == 0:
-            video.status = 1
+    video = page.video
 
-    db.session.commit()
+    # only the first page is embedded, the rest is loaded as the viewer scrolls
+    comments, comments_cursor = list_comments(video.id)
 
     video_info = {
         "video": video,
-        "video_url": video_stream_url,
-        "uploader": db.session.scalar(db.select(User).where(User.id == video.user_id)),
-        "view_count": (
-            db.session.execute(
-                db.select(func.count(Views.id)).where(Views.video_id == video.id)
-            ).scalar_one_or_none()
-            or 0
-        ),
-        "like_count": (
-            db.session.execute(
-                db.select(func.count(Likes.id)).where(Likes.video_id == video.id)
-            ).scalar_one_or_none()
-            or 0
-        ),
-        # include user avatar per comment
-        "comments": (
-            db.session.execute(
-                db.select(Comment, User.picture.label("user_picture"))
-                .join(User, Comment.user_id == User.id)
-                .where(Comment.video_id == video.id)
-                .order_by(Comment.created_at.desc())
-            ).all()
-        ),
-        "liked": (
-            db.session.scalar(
-                db.select(Likes).where(
-                    Likes.video_id == video.id,
-                    Likes.user_id == current_user.id
-                    if current_user.is_authenticated
-                    else None,
-                )
-            )
-            is not None
-        ),
-    }
-
-    watch_id = uuid.uuid4().hex
-
-    if "watching_list" not in session:
-        session["watching_list"] = {}
-
-    watching_list = session["watching_list"]
-    watching_list[watch_id] = {
-        "video_hash": video.hash,
-        "watch_start_ts": time.time(),
-        "watched": False,
+        "video_url": choose_manifest_url(video, request.user_agent.string),
+        "thumbnails_url": video.thumbnails_url,
+        "uploader": page.uploader,
+        "view_count": page.view_count,
+        "like_count": page.like_count,
+        "comments": comments,
+        "comments_cursor": comments_cursor,
+        # comments are never edited, so the ids and avatars identify the
+        # rendered first page exactly
+        "comments_key": tuple((comment.id, picture) for comment, picture in comments),
+        "liked": viewer_liked(video.id),
     }
 
-    session["watching_list"] = watching_list
+    watch_id = issue_watch_token(video.id, video.hash, video.duration)
 
     return render_template(
         "watch.html", user=current_user, video_info=video_info, watch_id=watch_id
@@ -108,7 +62,7 @@ def route_watch(video_hash):
 def route_waitfor(video_hash):
     video = db.session.scalar(db.select(Video).where(Video.hash == video_hash))
 
-    if not video:
+    if not video or video.status == 4:
         return render_template(
             "redirect.html",
             redirect_url=url_for("main.route_index"),
@@ -0,0 +1,62 @@
+import random
+from array import array
+from threading import Lock
+from time import monotonic
+from typing import Callable, Iterable, Optional
+
+
+# Uniform sampling over a set of ids kept in a compact array. Removal swaps the
+# last id into the freed slot so add/discard/sample never scan the array.
+class RandomSampler:
+    def __init__(self, ttl: float = 600):
+        self.ttl = ttl
+        self.ids = array("q")
+        self.positions: dict[int, int] = {}
+        self.loaded_at: Optional[float] = None
+        self.load_ids: Optional[Callable[[], Iterable[int]]] = None
+        self.lock = Lock()
+
+    def loader(self, load_ids: Callable[[], Iterable[int]]):
+        self.load_ids = load_ids
+        return load_ids
+
+    def reload(self) -> None:
+        if self.load_ids is None:
+            raise RuntimeError("RandomSampler has no loader registered.")
+
+        ids = array("q", self.load_ids())
+
+        with self.lock:
+            self.ids = ids
+            self.positions = {video_id: i for i, video_id in enumerate(ids)}
+            self.loaded_at = monotonic()
+
+    def add(self, video_id: int) -> None:
+        with self.lock:
+            if video_id in self.positions:
+                return
+
+            self.positions[video_id] = len(self.ids)
+            self.ids.append(video_id)
+
+    def discard(self, video_id: int) -> None:
+        with self.lock:
+            position = self.positions.pop(video_id, None)
+
+            if position is None:
+                return
+
+            last = self.ids.pop()
+
+            if last != video_id:
+                self.ids[position] = last
+                self.positions[last] = position
+
+    def sample(self, n: int) -> list[int]:
+        # other workers publish and delete too, so the set is rebuilt every ttl
+        if self.loaded_at is None or monotonic() - self.loaded_at > self.ttl:
+            self.reload()
+
+        with self.lock:
+            picks = random.sample(range(len(self.ids)), min(n, len(self.ids)))
+            return [self.ids[i] for i in picks]
@@ -0,0 +1,83 @@
+from sqlalchemy import UniqueConstraint, inspect, text
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.schema import AddConstraint, CreateColumn
+
+from .context import db
+from .models.video import Video
+from .models.video_stats import VideoStats
+
+# Rows that would violate a unique key added to an existing table; the oldest
+# row of each duplicate group is kept.
+DEDUPLICATE = {
+    "uq_likes_video_user": (
+        "DELETE newer FROM likes newer JOIN likes older"
+        " ON newer.video_id = older.video_id AND newer.user_id = older.user_id"
+        " AND newer.id > older.id"
+    ),
+}
+
+
+# db.create_all() only creates missing tables, so columns and indexes added to
+# existing models are brought in here.
+def upgrade_schema() -> list[str]:
+    applied = []
+
+    with db.engine.begin() as connection:
+        inspector = inspect(connection)
+
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                table.create(connection)
+                applied.append(f"create table {table.name}")
+                continue
+
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+
+                ddl = CreateColumn(column).compile(dialect=connection.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+                applied.append(f"add column {table.name}.{column.name}")
+
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            existing |= {
+                constraint["name"]
+                for constraint in inspector.get_unique_constraints(table.name)
+            }
+
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+
+                if index.unique and index.name in DEDUPLICATE:
+                    connection.execute(text(DEDUPLICATE[index.name]))
+
+                index.create(connection)
+                applied.append(f"create index {index.name}")
+
+            for constraint in table.constraints:
+                if not isinstance(constraint, UniqueConstraint):
+                    continue
+
+                if constraint.name is None or constraint.name in existing:
+                    continue
+
+                if constraint.name in DEDUPLICATE:
+                    connection.execute(text(DEDUPLICATE[constraint.name]))
+
+                connection.execute(AddConstraint(constraint))
+                applied.append(f"add constraint {constraint.name}")
+
+        # listings inner-join video_stats, so every video needs a counter row
+        result = connection.execute(
+            insert(VideoStats)
+            .prefix_with("IGNORE")
+            .from_select(["video_id"], db.select(Video.id))
+        )
+
+        if result.rowcount:
+            applied.append(f"create {result.rowcount} missing video_stats row(s)")
+
+    return applied
@@ -0,0 +1,69 @@
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import match
+
+from .context import db, search_cache
+from .listing import video_card_select
+from .models.video import Video
+from .models.video_stats import VideoStats
+
+RESULTS_PER_PAGE = 20
+MAX_PAGE = 50
+
+# relevance is scaled by 1 + POPULARITY_WEIGHT * ln(1 + views), so popularity
+# breaks near-ties without letting a viral video outrank an exact title match
+POPULARITY_WEIGHT = 0.15
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def relevance(query: str):
+    # InnoDB FULLTEXT natural language mode ranks with a BM25-style TF-IDF
+    return match(Video.title, Video.description, against=query).in_natural_language_mode()
+
+
+def search_statement(query: str):
+    score = relevance(query) * (
+        1 + POPULARITY_WEIGHT * func.ln(1 + VideoStats.view_count)
+    )
+
+    return (
+        video_card_select()
+        .where(relevance(query))
+        .order_by(score.desc(), Video.id.desc())
+    )
+
+
+def search_videos(query: str, page: int = 1, per_page: int = RESULTS_PER_PAGE):
+    page = max(1, min(page, MAX_PAGE))
+    query = normalize_query(query)
+    key = (query, page, per_page)
+
+    # only ordered ids are cached; hydrating them is a primary key lookup
+    cached = search_cache.get(key)
+
+    if cached is not None:
+        video_ids, has_more = cached
+        return hydrate_videos(video_ids), has_more
+
+    rows = db.session.execute(
+        search_statement(query).limit(per_page + 1).offset((page - 1) * per_page)
+    ).all()
+
+    has_more = len(rows) > per_page and page < MAX_PAGE
+    rows = rows[:per_page]
+
+    search_cache.put(key, ([video.id for video, _, _ in rows], has_more))
+
+    return rows, has_more
+
+
+def hydrate_videos(video_ids: list[int]):
+    if not video_ids:
+        return []
+
+    rows = db.session.execute(video_card_select().where(Video.id.in_(video_ids))).all()
+    by_id = {row[0].id: row for row in rows}
+
+    return [by_id[video_id] for video_id in video_ids if video_id in by_id]
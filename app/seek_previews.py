@@ -0,0 +1,76 @@
+from math import ceil
+from typing import Callable, NamedTuple
+
+from .transcoder import make_even
+
+TILE_SIZE = 160
+MIN_INTERVAL = 2
+# tiles per video; longer videos get a coarser interval instead of more sheets
+MAX_TILES = 200
+SHEET_COLUMNS = 10
+SHEET_ROWS = 10
+
+
+class SeekSprites(NamedTuple):
+    interval: int
+    tile_width: int
+    tile_height: int
+    columns: int
+    rows: int
+
+
+def seek_sprite_path(video_hash: str, sheet: int) -> str:
+    return f"transcoded/{video_hash}/seek-sprite{sheet:010d}.jpeg"
+
+
+def seek_vtt_path(video_hash: str) -> str:
+    return f"transcoded/{video_hash}/seek.vtt"
+
+
+# One tile every interval seconds, scaled to fit TILE_SIZE with the source
+# aspect ratio, packed SHEET_COLUMNS x SHEET_ROWS into each sheet image.
+def plan_seek_sprites(width: int, height: int, duration: float) -> SeekSprites:
+    interval = max(MIN_INTERVAL, ceil(duration / MAX_TILES))
+
+    if width >= height:
+        tile_width, tile_height = TILE_SIZE, make_even(TILE_SIZE * height // width)
+    else:
+        tile_width, tile_height = make_even(TILE_SIZE * width // height), TILE_SIZE
+
+    return SeekSprites(
+        interval, tile_width, max(2, tile_height), SHEET_COLUMNS, SHEET_ROWS
+    )
+
+
+def vtt_timestamp(seconds: float) -> str:
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(int(minutes), 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:06.3f}"
+
+
+# A WebVTT thumbnails track: one cue per tile, pointing at its rectangle in
+# the sheet with a media fragment ("#xywh=x,y,w,h").
+def seek_vtt(
+    video_hash: str,
+    sprites: SeekSprites,
+    duration: float,
+    base_url: Callable[[str], str],
+) -> str:
+    per_sheet = sprites.columns * sprites.rows
+    cues = ["WEBVTT", ""]
+
+    for tile in range(max(1, ceil(duration / sprites.interval))):
+        start = tile * sprites.interval
+        end = min(start + sprites.interval, duration) if duration else start + 1
+        sheet, position = divmod(tile, per_sheet)
+        row, column = divmod(position, sprites.columns)
+
+        cues += [
+            f"{vtt_timestamp(start)} --> {vtt_timestamp(end)}",
+            f"{base_url(seek_sprite_path(video_hash, sheet))}#xywh="
+            f"{column * sprites.tile_width},{row * sprites.tile_height},"
+            f"{sprites.tile_width},{sprites.tile_height}",
+            "",
+        ]
+
+    return "\n".join(cues)
@@ -0,0 +1,173 @@
+import pickle
+import secrets
+from datetime import datetime, timedelta
+from time import monotonic, perf_counter
+
+from flask import Flask, Request, Response
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from sqlalchemy.dialects.mysql import insert
+from werkzeug.datastructures import CallbackDict
+
+from .context import db, metrics
+from .models.server_session import ServerSession
+from .result_cache import ResultCache
+
+SESSION_LIFETIME = timedelta(days=31)
+# expiry is pushed forward at most once a day, so plain reads stay reads
+SESSION_REFRESH = timedelta(days=1)
+PURGE_INTERVAL = 600
+PURGE_BATCH = 1000
+
+
+class StoredSession(CallbackDict, SessionMixin):
+    def __init__(
+        self,
+        initial: dict | None = None,
+        sid: str | None = None,
+        version: int = 0,
+        expires_at: datetime | None = None,
+        new: bool = False,
+    ):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+
+        self.sid = sid or secrets.token_urlsafe(24)
+        self.version = version
+        self.expires_at = expires_at
+        self.new = new
+        self.modified = False
+
+
+# Sessions live in the sessions table as pickled dicts; the cookie only holds
+# the signed session id and the version of the data last written for it.
+# Each worker keeps recently used sessions in an LRU, and a cached copy is
+# used only while its version matches the cookie, so a write made by another
+# worker is never shadowed.
+class ServerSessionInterface(SessionInterface):
+    def __init__(self, maxsize: int = 4096):
+        self.cache = ResultCache(maxsize=maxsize)
+        self.purged_at = monotonic()
+
+    def signer(self, app: Flask) -> Signer:
+        return Signer(app.secret_key, salt="pseudotube-session")
+
+    def open_session(self, app: Flask, request: Request) -> StoredSession | None:
+        # static files never touch the session, so skip the lookup entirely
+        if app.static_url_path and request.path.startswith(app.static_url_path + "/"):
+            return self.make_null_session(app)
+
+        started = perf_counter()
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        session = self._load(app, cookie) if cookie else None
+        metrics.observe("session.open", perf_counter() - started)
+
+        return session or StoredSession(new=True)
+
+    def save_session(
+        self, app: Flask, session: SessionMixin, response: Response
+    ) -> None:
+        if not isinstance(session, StoredSession):
+            return
+
+        started = perf_counter()
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                with db.engine.begin() as connection:
+                    connection.execute(
+                        db.delete(ServerSession).where(ServerSession.id == session.sid)
+                    )
+
+                self.cache.discard(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+
+            return
+
+        now = datetime.now()
+        stale = (
+            session.expires_at is None
+            or session.expires_at - now < SESSION_LIFETIME - SESSION_REFRESH
+        )
+
+        if not (session.modified or session.new or stale):
+            return
+
+        version = session.version + (session.modified or session.new)
+        expires_at = now + SESSION_LIFETIME
+        data = pickle.dumps(dict(session), protocol=pickle.HIGHEST_PROTOCOL)
+
+        with db.engine.begin() as connection:
+            connection.execute(
+                insert(ServerSession)
+                .values(
+                    id=session.sid, version=version, data=data, expires_at=expires_at
+                )
+                .on_duplicate_key_update(
+                    version=version, data=data, expires_at=expires_at
+                )
+            )
+
+            if monotonic() - self.purged_at > PURGE_INTERVAL:
+                self.purged_at = monotonic()
+                connection.execute(
+                    db.delete(ServerSession)
+                    .where(ServerSession.expires_at < now)
+                    .with_dialect_options(mysql_limit=PURGE_BATCH)
+                )
+
+        self.cache.put(session.sid, (version, data, expires_at))
+
+        cookie = self.signer(app).sign(f"{session.sid}.{version}").decode()
+
+        response.set_cookie(
+            name,
+            cookie,
+            expires=expires_at,
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+        metrics.observe("session.save", perf_counter() - started)
+        metrics.record("session.payload_bytes", len(data))
+        metrics.record("session.cookie_bytes", len(cookie))
+
+    def _load(self, app: Flask, cookie: str) -> StoredSession | None:
+        try:
+            sid, version = self.signer(app).unsign(cookie).decode().rsplit(".", 1)
+            version = int(version)
+        except (BadSignature, ValueError):
+            return None
+
+        cached = self.cache.get(sid)
+
+        if cached is not None and cached[0] == version:
+            _, data, expires_at = cached
+        else:
+            with db.engine.connect() as connection:
+                row = connection.execute(
+                    db.select(
+                        ServerSession.version,
+                        ServerSession.data,
+                        ServerSession.expires_at,
+                    ).where(ServerSession.id == sid)
+                ).first()
+
+            if row is None:
+                return None
+
+            version, data, expires_at = row
+            self.cache.put(sid, (version, data, expires_at))
+
+        if expires_at < datetime.now():
+            return None
+
+        return StoredSession(pickle.loads(data), sid, version, expires_at)
@@ -0,0 +1,101 @@
+from threading import Lock, Thread
+from time import monotonic
+from typing import Any, Callable, Optional
+
+from flask import Flask
+
+
+class Shelf:
+    def __init__(self, name: str, loader: Callable[[], Any], ttl: float):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+
+        # (value, version) swapped as one tuple, so readers never pair a
+        # value with another load's version
+        self.entry: tuple[Any, int] = (None, 0)
+        self.loaded_at: Optional[float] = None
+        self.stale = False
+        self.refreshing = False
+
+        # load_lock serializes rebuilds, state_lock only guards `refreshing`
+        self.load_lock = Lock()
+        self.state_lock = Lock()
+
+    def is_fresh(self) -> bool:
+        return (
+            self.loaded_at is not None
+            and not self.stale
+            and monotonic() - self.loaded_at < self.ttl
+        )
+
+
+# Stale-while-revalidate cache for listings shared by every visitor. Only the
+# very first load of a shelf happens inline (single-flight); afterwards expired
+# or invalidated shelves keep serving their last value while one background
+# thread rebuilds them.
+class ShelfCache:
+    def __init__(self):
+        self.app: Optional[Flask] = None
+        self.shelves: dict[str, Shelf] = {}
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+
+    def register(self, name: str, ttl: float):
+        def decorator(loader):
+            self.shelves[name] = Shelf(name, loader, ttl)
+            return loader
+
+        return decorator
+
+    def get(self, name: str) -> Any:
+        return self.get_versioned(name)[0]
+
+    # The version changes on every load, so it can key anything derived from
+    # the value, such as rendered fragments.
+    def get_versioned(self, name: str) -> tuple[Any, int]:
+        shelf = self.shelves[name]
+
+        if shelf.loaded_at is None:
+            with shelf.load_lock:
+                if shelf.loaded_at is None:
+                    self._load(shelf)
+
+        elif not shelf.is_fresh():
+            self._refresh_in_background(shelf)
+
+        return shelf.entry
+
+    def invalidate(self, *names: str) -> None:
+        for name in names or self.shelves:
+            self.shelves[name].stale = True
+
+    def _load(self, shelf: Shelf) -> None:
+        # cleared before loading so an invalidation that races the load is kept
+        shelf.stale = False
+        value = shelf.loader()
+
+        shelf.entry = (value, shelf.entry[1] + 1)
+        shelf.loaded_at = monotonic()
+
+    def _refresh_in_background(self, shelf: Shelf) -> None:
+        if self.app is None:
+            raise RuntimeError("ShelfCache is not bound to an application.")
+
+        with shelf.state_lock:
+            if shelf.refreshing:
+                return
+            shelf.refreshing = True
+
+        Thread(target=self._refresh, args=(shelf,), daemon=True).start()
+
+    def _refresh(self, shelf: Shelf) -> None:
+        try:
+            with self.app.app_context(), shelf.load_lock:
+                self._load(shelf)
+        except Exception as e:
+            print(f"Failed to refresh shelf {shelf.name}: {e}")
+        finally:
+            with shelf.state_lock:
+                shelf.refreshing = False
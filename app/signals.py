@@ -0,0 +1,8 @@
+from blinker import Namespace
+
+_signals = Namespace()
+
+# Sent after the change is committed, with video_id and video_hash keyword args;
+# video_published also carries the title and hidden flag.
+video_published = _signals.signal("video-published")
+video_deleted = _signals.signal("video-deleted")
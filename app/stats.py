@@ -0,0 +1,107 @@
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert
+
+from .context import counter_cache, db
+from .models.comment import Comment
+from .models.likes import Likes
+from .models.video import Video
+from .models.video_stats import VideoStats
+from .models.views import Views
+
+
+def bump_video_stats(
+    video_id: int,
+    views: int = 0,
+    likes: int = 0,
+    comments: int = 0,
+    viewed_at: datetime | None = None,
+) -> None:
+    # Single upsert so the counters stay correct even for videos that predate
+    # the video_stats table; the caller owns the transaction.
+    stmt = insert(VideoStats).values(
+        video_id=video_id,
+        view_count=max(views, 0),
+        like_count=likes,
+        comment_count=max(comments, 0),
+        last_view_at=viewed_at,
+    )
+
+    update = {
+        "view_count": VideoStats.view_count + views,
+        # not floored: coalesced like deltas from different workers may land
+        # out of order, and clamping an intermediate value would make it drift
+        "like_count": VideoStats.like_count + likes,
+        "comment_count": VideoStats.comment_count + comments,
+    }
+
+    if viewed_at is not None:
+        update["last_view_at"] = func.greatest(
+            func.coalesce(VideoStats.last_view_at, viewed_at), viewed_at
+        )
+
+    db.session.execute(stmt.on_duplicate_key_update(**update))
+
+    # other workers catch up when their cached counters expire
+    counter_cache.discard(video_id)
+
+
+def reconcile_video_stats(dry_run: bool = False) -> list[tuple[int, dict]]:
+    view_rows = db.session.execute(
+        db.select(Views.video_id, func.count(Views.id), func.max(Views.created_at))
+        .group_by(Views.video_id)
+    ).all()
+    views = {video_id: (count, last) for video_id, count, last in view_rows}
+
+    likes = dict(
+        db.session.execute(
+            db.select(Likes.video_id, func.count(Likes.id)).group_by(Likes.video_id)
+        ).all()
+    )
+
+    comments = dict(
+        db.session.execute(
+            db.select(Comment.video_id, func.count(Comment.id)).group_by(
+                Comment.video_id
+            )
+        ).all()
+    )
+
+    current = {stats.video_id: stats for stats in db.session.scalars(db.select(VideoStats))}
+
+    drift = []
+
+    for video_id in db.session.scalars(db.select(Video.id)):
+        view_count, last_view_at = views.get(video_id, (0, None))
+        expected = {
+            "view_count": view_count,
+            "like_count": likes.get(video_id, 0),
+            "comment_count": comments.get(video_id, 0),
+            "last_view_at": last_view_at,
+        }
+
+        stats = current.get(video_id)
+
+        if stats is None:
+            drift.append((video_id, expected))
+            if not dry_run:
+                db.session.add(VideoStats(video_id=video_id, **expected))
+            continue
+
+        changed = {
+            key: value
+            for key, value in expected.items()
+            if getattr(stats, key) != value
+        }
+
+        if changed:
+            drift.append((video_id, changed))
+            if not dry_run:
+                for key, value in changed.items():
+                    setattr(stats, key, value)
+
+    if not dry_run:
+        db.session.commit()
+
+    return drift
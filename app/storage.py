@@ -1,28 +1,80 @@
+import hmac
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from hashlib import sha256
 from json import loads
-from typing import Literal, Optional
-from uuid import uuid4
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from time import perf_counter, time
+from typing import Any, BinaryIO, Callable, Literal, Optional
 
-from flask import jsonify
+from cachetools import TTLCache
+from flask import current_app, url_for
 from google.auth.credentials import Credentials
+from google.auth.transport.requests import AuthorizedSession
 from google.cloud import storage
+from google.cloud.storage.retry import DEFAULT_RETRY
 from google.oauth2 import service_account
+from requests.adapters import HTTPAdapter
+from werkzeug.security import safe_join
 
+from .metrics import Metrics
 
-class StorageManager:
-    ALLOWED_VIDEO_MIME_TYPES = [
-        "video/mp4",
-        "video/webm",
-        "video/ogg",
-        "video/x-matroska",  # mkv
-        "video/quicktime",  # mov
-    ]
 
+# What StorageManager needs from a place to keep objects. Paths are object
+# names such as "transcoded/<hash>/manifest.mpd", relative to the bucket or
+# to the local storage root. A backend missing any of these fails when it is
+# instantiated, not in the middle of a request.
+class StorageBackend(ABC):
+    @abstractmethod
+    def exists(self, path: str) -> bool:
+        ...
+
+    @abstractmethod
+    def public_url(self, path: str) -> str:
+        ...
+
+    # the location tools outside the app (ffprobe, transcoders) read from
+    @abstractmethod
+    def uri(self, path: str) -> str:
+        ...
+
+    # the inverse of uri
+    @abstractmethod
+    def path_of(self, uri: str) -> str:
+        ...
+
+    @abstractmethod
+    def generate_upload_url(self, path: str, expires_in_minutes: int) -> str:
+        ...
+
+    @abstractmethod
+    def upload_bytes(self, data: bytes, path: str, content_type: str) -> None:
+        ...
+
+    @abstractmethod
+    def list_paths(self, prefix: str) -> list[str]:
+        ...
+
+    @abstractmethod
+    def delete_many(self, paths: list[str]) -> None:
+        ...
+
+
+# Every call has a per-attempt timeout (connect, read) and an overall
+# deadline, within which transient errors (429, 5xx, connection resets) are
+# retried with jittered exponential backoff. Connections come from one pool
+# sized for the request threads plus the StorageManager executor.
+class GCSBackend(StorageBackend):
     def __init__(
         self,
         bucket_name: str,
         credentials_json: str,
-        storage_type: Literal["gs"] = "gs",
+        pool_size: int = 16,
+        timeout: tuple[float, float] = (3.05, 10),
+        deadline: float = 20,
     ):
         self.bucket_name = bucket_name
         self.credentials: Optional[Credentials] = None
@@ -30,20 +82,250 @@ class StorageManager:
         self.client: Optional[storage.Client] = None
         self.bucket: Optional[storage.Bucket] = None
 
-        if storage_type == "gs":
-            self._setup_google_storage()
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retry = DEFAULT_RETRY.with_timeout(deadline).with_delay(
+            initial=0.1, maximum=2.0, multiplier=2.0
+        )
+
+        self._setup_google_storage()
 
     def _setup_google_storage(self) -> None:
         try:
             self.credentials = service_account.Credentials.from_service_account_info(
                 loads(self.credentials_json)
             )
-            self.client = storage.Client(credentials=self.credentials)
+
+            session = AuthorizedSession(self.credentials)
+            adapter = HTTPAdapter(
+                pool_connections=self.pool_size, pool_maxsize=self.pool_size
+            )
+            session.mount("https://", adapter)
+
+            self.client = storage.Client(
+                project=self.credentials.project_id,
+                credentials=self.credentials,
+                _http=session,
+            )
             self.bucket = self.client.bucket(self.bucket_name)
 
         except Exception as e:
             raise ValueError(f"Failed to initialize Google Cloud Storage client: {e}")
 
+    def exists(self, path: str) -> bool:
+        return self.bucket.blob(path).exists(timeout=self.timeout, retry=self.retry)
+
+    def public_url(self, path: str) -> str:
+        return f"https://storage.googleapis.com/{self.bucket_name}/{path}"
+
+    def uri(self, path: str) -> str:
+        return f"gs://{self.bucket_name}/{path}"
+
+    def path_of(self, uri: str) -> str:
+        prefix = f"gs://{self.bucket_name}/"
+
+        if not uri.startswith(prefix):
+            raise ValueError(f"{uri} is not in bucket {self.bucket_name}.")
+
+        return uri[len(prefix) :]
+
+    # signed locally with the service account key, no request is made
+    def generate_upload_url(self, path: str, expires_in_minutes: int) -> str:
+        return self.bucket.blob(path).generate_signed_url(
+            version="v4",
+            expiration=timedelta(minutes=expires_in_minutes),
+            # content_type="video/mp4",
+            method="PUT",
+        )
+
+    def upload_bytes(self, data: bytes, path: str, content_type: str) -> None:
+        # make sure CORS is not a problem; overwriting the same bytes is
+        # idempotent, so the upload is retried like any other call
+        self.bucket.blob(path).upload_from_string(
+            data, content_type=content_type, timeout=self.timeout, retry=self.retry
+        )
+
+    def list_paths(self, prefix: str) -> list[str]:
+        blobs = self.client.list_blobs(
+            self.bucket, prefix=prefix, timeout=self.timeout, retry=self.retry
+        )
+        return [blob.name for blob in blobs]
+
+    def delete_many(self, paths: list[str]) -> None:
+        # one HTTP request for up to 100 deletes; failures show up on the
+        # next listing instead of raising
+        with self.client.batch(raise_exception=False):
+            for path in paths:
+                self.bucket.delete_blob(path, timeout=self.timeout)
+
+
+# Objects are plain files under root and are served by the app itself (see
+# routes/storage.py); uploads go to a PUT URL signed with the app's secret
+# key, mirroring GCS signed URLs.
+class LocalBackend(StorageBackend):
+    def __init__(self, root: str, base_url: str = "/storage"):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+
+        os.makedirs(self.root, exist_ok=True)
+
+    def full_path(self, path: str) -> str:
+        full_path = safe_join(self.root, path)
+
+        if full_path is None:
+            raise ValueError(f"Path {path} is outside the storage root.")
+
+        return full_path
+
+    def exists(self, path: str) -> bool:
+        return os.path.isfile(self.full_path(path))
+
+    def public_url(self, path: str) -> str:
+        return f"{self.base_url}/{path}"
+
+    def uri(self, path: str) -> str:
+        return self.full_path(path)
+
+    def path_of(self, uri: str) -> str:
+        path = os.path.relpath(uri, self.root).replace(os.sep, "/")
+
+        if path.startswith("../"):
+            raise ValueError(f"{uri} is outside the storage root.")
+
+        # keep the trailing slash of prefixes like "transcoded/<hash>/"
+        return path + "/" if uri.endswith("/") else path
+
+    def signature(self, path: str, expires: int) -> str:
+        message = f"{path}:{expires}".encode()
+        return hmac.new(
+            current_app.secret_key.encode(), message, sha256
+        ).hexdigest()
+
+    def verify_upload(self, path: str, expires: int, signature: str) -> bool:
+        return expires >= time() and hmac.compare_digest(
+            self.signature(path, expires), signature
+        )
+
+    def generate_upload_url(self, path: str, expires_in_minutes: int) -> str:
+        expires = int(time()) + expires_in_minutes * 60
+
+        return url_for(
+            "storage.route_storage_upload",
+            path=path,
+            expires=expires,
+            signature=self.signature(path, expires),
+        )
+
+    def write(self, stream: BinaryIO, path: str) -> int:
+        full_path = self.full_path(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+        # written next to the target and renamed, so readers never see a
+        # partial file
+        with NamedTemporaryFile(dir=os.path.dirname(full_path), delete=False) as f:
+            try:
+                written = 0
+
+                while chunk := stream.read(1024 * 1024):
+                    f.write(chunk)
+                    written += len(chunk)
+            except BaseException:
+                os.unlink(f.name)
+                raise
+
+        os.replace(f.name, full_path)
+
+        return written
+
+    def upload_bytes(self, data: bytes, path: str, content_type: str) -> None:
+        full_path = self.full_path(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+        with open(full_path, "wb") as f:
+            f.write(data)
+
+    def list_paths(self, prefix: str) -> list[str]:
+        directory = os.path.dirname(self.full_path(prefix))
+        paths = []
+
+        for parent, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.relpath(os.path.join(parent, name), self.root)
+                path = path.replace(os.sep, "/")
+
+                if path.startswith(prefix):
+                    paths.append(path)
+
+        return paths
+
+    def delete_many(self, paths: list[str]) -> None:
+        for path in paths:
+            full_path = self.full_path(path)
+
+            try:
+                os.remove(full_path)
+            except FileNotFoundError:
+                pass
+
+            # drop directories the delete left empty, like a bucket would
+            parent = os.path.dirname(full_path)
+
+            while parent != self.root:
+                try:
+                    os.rmdir(parent)
+                except OSError:
+                    break
+
+                parent = os.path.dirname(parent)
+
+
+class StorageManager:
+    ALLOWED_VIDEO_MIME_TYPES = [
+        "video/mp4",
+        "video/webm",
+        "video/ogg",
+        "video/x-matroska",  # mkv
+        "video/quicktime",  # mov
+    ]
+
+    def __init__(
+        self,
+        bucket_name: str,
+        credentials_json: Optional[str],
+        storage_type: Literal["gs", "local"] = "gs",
+        root: Optional[str] = None,
+        metrics: Optional[Metrics] = None,
+        pool_size: int = 16,
+        exists_ttl: float = 300,
+        missing_ttl: float = 5,
+    ):
+        self.bucket_name = bucket_name
+        self.storage_type = storage_type
+        self.metrics = metrics or Metrics()
+        self.backend: StorageBackend
+
+        # batched operations get half of the connection pool, so a large
+        # purge cannot starve request threads of connections
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, pool_size // 2), thread_name_prefix="storage"
+        )
+
+        if storage_type == "gs":
+            self.backend = GCSBackend(bucket_name, credentials_json, pool_size)
+        elif storage_type == "local":
+            self.backend = LocalBackend(root or "storage")
+        else:
+            raise ValueError(f"Unknown storage type: {storage_type}")
+
+        # Existence checks are only needed while a video is processing, when
+        # the waitfor page polls every second; objects that exist are cached
+        # for minutes, missing ones only for a few seconds.
+        self.existing: TTLCache = TTLCache(maxsize=4096, ttl=exists_ttl)
+        self.missing: TTLCache = TTLCache(maxsize=4096, ttl=missing_ttl)
+        self.exists_lock = Lock()
+        self.exists_calls = 0
+        self.exists_hits = 0
+
     # def upload_video(self, file_path: str, file_name: str) -> str:
     #     if not self.bucket:
     #         raise ValueError("Google Cloud Storage bucket is not initialized.")
@@ -57,59 +339,181 @@ class StorageManager:
     #         raise RuntimeError(f"Failed to upload video: {e}")
     #
     def upload_thumbnail(self, file_bytes: bytes, file_name: str) -> str:
-        if not self.bucket:
-            raise ValueError("Google Cloud Storage bucket is not initialized.")
-
         try:
-            blob = self.bucket.blob(file_name)
-            # make sure CORS is not a problem
-            blob.upload_from_string(file_bytes, content_type="image/jpeg")
+            self.call(
+                "upload", self.backend.upload_bytes, file_bytes, file_name, "image/jpeg"
+            )
 
-            return f"https://storage.googleapis.com/{self.bucket_name}/{file_name}"
+            return self.public_url(file_name)
         except Exception as e:
             raise RuntimeError(f"Failed to upload thumbnail: {e}")
 
+    def upload_bytes(self, data: bytes, path: str, content_type: str) -> None:
+        try:
+            self.call("upload", self.backend.upload_bytes, data, path, content_type)
+        except Exception as e:
+            raise RuntimeError(f"Failed to upload {path}: {e}")
+
     def generate_upload_url(
         self,
         file_name: str,
         expires_in_minutes: int = 5,
     ) -> str:
-        if not self.bucket:
-            raise ValueError("Google Cloud Storage bucket is not initialized.")
+        try:
+            return self.backend.generate_upload_url(file_name, expires_in_minutes)
+        except Exception as e:
+            raise RuntimeError(f"Failed to generate signed upload URL: {e}")
+
+    def path_exists(self, path: str, use_cache: bool = True) -> bool:
+        if use_cache:
+            with self.exists_lock:
+                if path in self.existing or path in self.missing:
+                    self.exists_hits += 1
+                    return path in self.existing
 
         try:
-            blob = self.bucket.blob(file_name)
+            exists = self.call("exists", self.backend.exists, path)
+        except Exception as e:
+            raise RuntimeError(f"Failed to check if path exists: {e}")
 
-            url = blob.generate_signed_url(
-                version="v4",
-                expiration=timedelta(minutes=expires_in_minutes),
-                # content_type="video/mp4",
-                method="PUT",
+        self._remember(path, exists)
+
+        return exists
+
+    # Checks several paths at once, the uncached ones concurrently on the
+    # storage executor.
+    def paths_exist(self, paths: list[str], use_cache: bool = True) -> dict[str, bool]:
+        found: dict[str, bool] = {}
+
+        if use_cache:
+            with self.exists_lock:
+                for path in paths:
+                    if path in self.existing or path in self.missing:
+                        self.exists_hits += 1
+                        found[path] = path in self.existing
+
+        pending = [path for path in dict.fromkeys(paths) if path not in found]
+
+        try:
+            checked = self.executor.map(
+                lambda path: self.call("exists", self.backend.exists, path), pending
             )
 
-            return url
+            for path, exists in zip(pending, checked):
+                self._remember(path, exists)
+                found[path] = exists
         except Exception as e:
-            raise RuntimeError(f"Failed to generate signed upload URL: {e}")
+            raise RuntimeError(f"Failed to check if paths exist: {e}")
+
+        return found
+
+    def _remember(self, path: str, exists: bool) -> None:
+        with self.exists_lock:
+            self.exists_calls += 1
+            self.missing.pop(path, None)
+            self.existing.pop(path, None)
+            (self.existing if exists else self.missing)[path] = True
+
+    def forget_path(self, path: str) -> None:
+        with self.exists_lock:
+            self.existing.pop(path, None)
+            self.missing.pop(path, None)
+
+    def exists_stats(self) -> dict:
+        with self.exists_lock:
+            return {
+                "calls": self.exists_calls,
+                "cache_hits": self.exists_hits,
+                "existing": len(self.existing),
+                "missing": len(self.missing),
+            }
+
+    # Deletes every object under the prefix, sending the deletes in batches
+    # on the storage executor. Failed deletes are found by listing the prefix
+    # again, and retried until it is empty; the listing after the last
+    # attempt decides whether anything remains. Progress is reported as
+    # (objects gone or sent for deletion, objects found), both counted over
+    # every listing so far; the number of objects deleted is returned.
+    def delete_prefix(
+        self,
+        prefix: str,
+        batch_size: int = 100,
+        attempts: int = 3,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> int:
+        found: set[str] = set()
+
+        def delete_batch(paths: list[str]) -> int:
+            try:
+                self.call("delete", self.backend.delete_many, paths)
+            except Exception as e:
+                # the next listing still has them
+                print(f"Failed to delete {len(paths)} object(s) under {prefix}: {e}")
+
+            return len(paths)
+
+        for attempt in range(attempts + 1):
+            try:
+                paths = self.call("list", self.backend.list_paths, prefix)
+            except Exception as e:
+                raise RuntimeError(f"Failed to list {prefix}: {e}")
 
-    def path_exists(self, path: str) -> bool:
-        if not self.bucket:
-            raise ValueError("Google Cloud Storage bucket is not initialized.")
+            found.update(paths)
+
+            if not paths:
+                return len(found)
+
+            if attempt == attempts:
+                break
+
+            done = len(found) - len(paths)
+
+            batches = [
+                paths[i : i + batch_size] for i in range(0, len(paths), batch_size)
+            ]
+
+            for sent in self.executor.map(delete_batch, batches):
+                done += sent
+
+                if progress:
+                    progress(done, len(found))
+
+            for path in paths:
+                self.forget_path(path)
+
+        raise RuntimeError(
+            f"{len(paths)} object(s) under {prefix} remain after {attempts} attempts."
+        )
+
+    # Runs one backend operation, recording its latency as storage.<op> and
+    # counting failures, which the backend has already retried.
+    def call(self, op: str, method: Callable[..., Any], *args) -> Any:
+        started = perf_counter()
 
         try:
-            blob = self.bucket.blob(path)
-            return blob.exists()
-        except Exception as e:
-            raise RuntimeError(f"Failed to check if path exists: {e}")
+            return method(*args)
+        except Exception:
+            self.metrics.incr(f"storage.{op}.errors")
+            raise
+        finally:
+            self.metrics.observe(f"storage.{op}", perf_counter() - started)
 
-    def get_public_url(self, path: str) -> str:
-        if not self.bucket:
-            raise RuntimeError("Google Cloud Storage bucket is not initialized.")
+    # The URL of an object is deterministic, so paths already known to exist
+    # (the outputs of a finished job) are resolved without a request.
+    def public_url(self, path: str) -> str:
+        return self.backend.public_url(path)
 
+    def uri(self, path: str) -> str:
+        return self.backend.uri(path)
+
+    def path_of(self, uri: str) -> str:
+        return self.backend.path_of(uri)
+
+    def get_public_url(self, path: str) -> str:
         try:
-            blob = self.bucket.blob(path)
-            if not blob.exists():
+            if not self.path_exists(path):
                 raise ValueError(f"Path {path} does not exist in the bucket.")
 
-            return f"https://storage.googleapis.com/{self.bucket_name}/{path}"
+            return self.public_url(path)
         except Exception as e:
             raise RuntimeError(f"Failed to get public URL: {e}")
@@ -0,0 +1,182 @@
+import re
+from array import array
+from bisect import bisect_left
+from heapq import nlargest
+from math import log1p
+from threading import Lock, Thread
+from time import monotonic
+from typing import Callable, Iterable, Optional
+
+from flask import Flask
+
+TERM_PATTERN = re.compile(r"\w+")
+
+MIN_TERM_LENGTH = 2
+MAX_TITLE_TERM_LENGTH = 64
+# top-k for prefixes this short is memoized, since their ranges span a large
+# part of the vocabulary; longer prefixes only cover a handful of terms
+MEMO_PREFIX_LENGTH = 2
+
+
+def normalize_text(value: str) -> str:
+    return " ".join(TERM_PATTERN.findall(value.lower()))
+
+
+def title_terms(title: str) -> set[str]:
+    normalized = normalize_text(title)
+
+    terms = {word for word in normalized.split() if len(word) >= MIN_TERM_LENGTH}
+
+    if normalized:
+        terms.add(normalized[:MAX_TITLE_TERM_LENGTH])
+
+    return terms
+
+
+# Prefix autocomplete over normalized title words and whole titles, weighted by
+# the popularity of the videos they come from. Terms live in one sorted list
+# with a parallel array of weights, so a lookup is two binary searches plus a
+# top-k over the matching slice.
+class SuggestIndex:
+    def __init__(self, ttl: float = 900, limit: int = 8):
+        self.ttl = ttl
+        self.limit = limit
+
+        self.terms: list[str] = []
+        self.weights = array("d")
+        self.videos: dict[int, tuple[set[str], float]] = {}
+        self.memo: dict[str, list[str]] = {}
+
+        self.app: Optional[Flask] = None
+        self.load_videos: Optional[Callable[[], Iterable[tuple]]] = None
+        self.loaded_at: Optional[float] = None
+        self.reloading = False
+        self.lock = Lock()
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+
+    def loader(self, load_videos: Callable[[], Iterable[tuple]]):
+        self.load_videos = load_videos
+        return load_videos
+
+    def reload(self) -> None:
+        if self.load_videos is None:
+            raise RuntimeError("SuggestIndex has no loader registered.")
+
+        videos = {}
+        term_weights: dict[str, float] = {}
+
+        for video_id, title, view_count in self.load_videos():
+            terms = title_terms(title)
+            weight = 1 + log1p(view_count or 0)
+            videos[video_id] = (terms, weight)
+
+            for term in terms:
+                term_weights[term] = term_weights.get(term, 0) + weight
+
+        terms = sorted(term_weights)
+        weights = array("d", (term_weights[term] for term in terms))
+
+        with self.lock:
+            self.terms, self.weights, self.videos = terms, weights, videos
+            self.memo = {}
+            self.loaded_at = monotonic()
+
+    def add(self, video_id: int, title: str, view_count: int = 0) -> None:
+        with self.lock:
+            self._remove(video_id)
+
+            terms = title_terms(title)
+            weight = 1 + log1p(view_count)
+            self.videos[video_id] = (terms, weight)
+
+            for term in terms:
+                self._adjust(term, weight)
+
+    def discard(self, video_id: int) -> None:
+        with self.lock:
+            self._remove(video_id)
+
+    def suggest(self, prefix: str, limit: Optional[int] = None) -> list[str]:
+        self._ensure_loaded()
+
+        prefix = normalize_text(prefix)
+        limit = min(limit or self.limit, self.limit)
+
+        if not prefix:
+            return []
+
+        with self.lock:
+            if len(prefix) <= MEMO_PREFIX_LENGTH:
+                if prefix not in self.memo:
+                    self.memo[prefix] = self._top(prefix, self.limit)
+                return self.memo[prefix][:limit]
+
+            return self._top(prefix, limit)
+
+    def _top(self, prefix: str, limit: int) -> list[str]:
+        lo = bisect_left(self.terms, prefix)
+        hi = bisect_left(self.terms, prefix + "\U0010ffff", lo)
+
+        best = nlargest(limit, range(lo, hi), key=self.weights.__getitem__)
+        return [self.terms[i] for i in best]
+
+    def _remove(self, video_id: int) -> None:
+        entry = self.videos.pop(video_id, None)
+
+        if entry is None:
+            return
+
+        terms, weight = entry
+
+        for term in terms:
+            self._adjust(term, -weight)
+
+    def _adjust(self, term: str, delta: float) -> None:
+        i = bisect_left(self.terms, term)
+
+        if i < len(self.terms) and self.terms[i] == term:
+            weight = self.weights[i] + delta
+
+            if weight <= 1e-9:
+                del self.terms[i]
+                del self.weights[i]
+            else:
+                self.weights[i] = weight
+
+        elif delta > 0:
+            self.terms.insert(i, term)
+            self.weights.insert(i, delta)
+
+        for length in range(1, MEMO_PREFIX_LENGTH + 1):
+            self.memo.pop(term[:length], None)
+
+    def _ensure_loaded(self) -> None:
+        if self.loaded_at is None:
+            with self.lock:
+                loaded = self.loaded_at is not None
+
+            if not loaded:
+                self.reload()
+
+        elif monotonic() - self.loaded_at > self.ttl:
+            # popularity drifts and other workers publish too; rebuild off the
+            # request path and keep serving the current index meanwhile
+            with self.lock:
+                if self.reloading:
+                    return
+
+                self.reloading = True
+
+            Thread(target=self._background_reload, daemon=True).start()
+
+    def _background_reload(self) -> None:
+        try:
+            with self.app.app_context():
+                self.reload()
+        except Exception as e:
+            print(f"Failed to reload suggestion index: {e}")
+        finally:
+            with self.lock:
+                self.reloading = False
@@ -0,0 +1,69 @@
+from queue import Queue
+from threading import Lock, Thread
+from time import perf_counter, sleep
+from typing import Callable, Optional
+
+from flask import Flask
+
+from .metrics import Metrics
+
+
+# A single background thread running the registered handler for each
+# submitted task, retrying failures with exponential backoff. Tasks only live
+# in memory, so handlers must leave enough state in the database for a
+# restart to find and resume unfinished work.
+class TaskQueue:
+    def __init__(
+        self, name: str, metrics: Metrics, attempts: int = 3, backoff: float = 5
+    ):
+        self.name = name
+        self.metrics = metrics
+        self.attempts = attempts
+        self.backoff = backoff
+
+        self.queue: Queue = Queue()
+        self.lock = Lock()
+
+        self.app: Optional[Flask] = None
+        self.handle: Optional[Callable[..., None]] = None
+        self.thread: Optional[Thread] = None
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+
+    def handler(self, handle: Callable[..., None]):
+        self.handle = handle
+        return handle
+
+    def submit(self, *args) -> None:
+        self.queue.put(args)
+        self.metrics.gauge(f"{self.name}.queue_depth", self.queue.qsize())
+
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def _run(self) -> None:
+        while True:
+            args = self.queue.get()
+            started = perf_counter()
+
+            for attempt in range(self.attempts):
+                try:
+                    with self.app.app_context():
+                        self.handle(*args)
+
+                    self.metrics.incr(f"{self.name}.completed")
+                    break
+
+                except Exception as e:
+                    self.metrics.incr(f"{self.name}.errors")
+                    print(f"{self.name} task {args} failed (attempt {attempt + 1}): {e}")
+                    sleep(self.backoff * 2**attempt)
+
+            else:
+                self.metrics.incr(f"{self.name}.abandoned")
+
+            self.metrics.observe(f"{self.name}.task", perf_counter() - started)
+            self.metrics.gauge(f"{self.name}.queue_depth", self.queue.qsize())
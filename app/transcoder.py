@@ -23,6 +23,20 @@ def make_even(x):
     return x if x % 2 == 0 else x - 1
 
 
+def video_stream(rendition) -> VideoStream:
+    settings = dict(
+        width_pixels=rendition.width,
+        height_pixels=rendition.height,
+        bitrate_bps=rendition.bitrate_bps,
+        frame_rate=rendition.frame_rate,
+    )
+
+    if rendition.codec == "h264":
+        return VideoStream(h264=VideoStream.H264CodecSettings(**settings))
+
+    return VideoStream(h265=VideoStream.H265CodecSettings(**settings))
+
+
 class TranscoderService:
     def __init__(
         self,
@@ -50,43 +64,23 @@ class TranscoderService:
             credentials=self.credentials
         )
 
+    # Renditions come from ladder.plan_ladder, which imports make_even from
+    # here, so they are taken as plain tuples (key, codec, width, height,
+    # bitrate_bps, frame_rate).
     def create_transcoder_job(
         self,
         input_uri,
         output_uri,
-        width=1920,
-        height=1080,
-        fps: float = 60,
-        duration: float = 0,
+        renditions,
+        seek_sprites=None,
     ):
         parent = f"projects/{self.PROJECT_ID}/locations/{self.LOCATION}"
 
-        resolution_steps = {}
-
-        for i in range(5, 1, -1):
-            scale_height = make_even(int(height * (i / 5)))
-            scale_width = make_even(int(width * (i / 5)))
-
-            resolution_steps[f"{scale_height}p"] = {
-                "height": scale_height,
-                "width": scale_width,
-                "bitrate_bps": int(4500000 * (scale_height / 1080)),
-                "frame_rate": min(120, fps) if scale_height >= 720 else min(30, fps),
-            }
-
         elementary_streams = [
             ElementaryStream(
-                key=f"video_{key}",
-                video_stream=VideoStream(
-                    h265=VideoStream.H265CodecSettings(
-                        height_pixels=resolution["height"],
-                        width_pixels=resolution["width"],
-                        bitrate_bps=resolution["bitrate_bps"],
-                        frame_rate=resolution["frame_rate"],
-                    )
-                ),
+                key=f"video_{rendition.key}", video_stream=video_stream(rendition)
             )
-            for key, resolution in resolution_steps.items()
+            for rendition in renditions
         ] + [
             ElementaryStream(
                 key="audio",
@@ -97,17 +91,19 @@ class TranscoderService:
             )
         ]
 
+        # CMAF: one fMP4 segment set per stream, referenced by both the DASH
+        # manifest and the HLS playlists, so nothing is stored twice
         mux_streams = [
             MuxStream(
-                key=f"dash_{key}",
+                key=f"cmaf_{rendition.key}",
                 container="fmp4",
-                elementary_streams=[f"video_{key}"],
+                elementary_streams=[f"video_{rendition.key}"],
                 segment_settings=SegmentSettings(segment_duration=Duration(seconds=6)),
             )
-            for key in resolution_steps
+            for rendition in renditions
         ] + [
             MuxStream(
-                key="dash_audio",
+                key="cmaf_audio",
                 container="fmp4",
                 elementary_streams=["audio"],
                 segment_settings=SegmentSettings(segment_duration=Duration(seconds=6)),
@@ -138,15 +134,35 @@ class TranscoderService:
                         #     seconds=randint(0, int(duration)) if duration > 0 else 0
                         # ),
                     ),
-                ],
+                ]
+                + (
+                    [
+                        # seek previews, one tile every interval seconds
+                        SpriteSheet(
+                            file_prefix="seek-sprite",
+                            sprite_width_pixels=seek_sprites.tile_width,
+                            sprite_height_pixels=seek_sprites.tile_height,
+                            column_count=seek_sprites.columns,
+                            row_count=seek_sprites.rows,
+                            interval=Duration(seconds=seek_sprites.interval),
+                            quality=70,
+                        )
+                    ]
+                    if seek_sprites
+                    else []
+                ),
                 mux_streams=mux_streams,
                 manifests=[
                     Manifest(
                         file_name="manifest.mpd",
                         type_="DASH",
-                        mux_streams=[f"dash_{key}" for key in resolution_steps]
-                        + ["dash_audio"],
-                    )
+                        mux_streams=[mux_stream.key for mux_stream in mux_streams],
+                    ),
+                    Manifest(
+                        file_name="master.m3u8",
+                        type_="HLS",
+                        mux_streams=[mux_stream.key for mux_stream in mux_streams],
+                    ),
                 ],
             ),
         )
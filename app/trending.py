@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+from math import log
+from threading import Lock
+from time import monotonic
+
+from sqlalchemy import func, text, update
+from sqlalchemy.dialects.mysql import insert
+
+from .context import db
+from .models.likes import Likes
+from .models.video_activity import VideoActivity
+from .models.video_stats import VideoStats
+from .models.views import Views
+
+HALF_LIFE_HOURS = 24
+LIKE_WEIGHT = 3
+# activity older than this contributes < 1% of its weight and is ignored
+SCORE_WINDOW = timedelta(days=7)
+REFRESH_INTERVAL_SECONDS = 300
+
+_refresh_lock = Lock()
+_last_refresh: float | None = None
+
+
+def hour_bucket(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def bump_video_activity(
+    video_id: int, views: int = 0, likes: int = 0, at: datetime | None = None
+) -> None:
+    stmt = insert(VideoActivity).values(
+        video_id=video_id,
+        bucket=hour_bucket(at or datetime.now()),
+        views=views,
+        likes=likes,
+    )
+
+    db.session.execute(
+        stmt.on_duplicate_key_update(
+            views=VideoActivity.views + views,
+            likes=VideoActivity.likes + likes,
+        )
+    )
+
+
+def refresh_trending_scores(now: datetime | None = None) -> None:
+    now = now or datetime.now()
+
+    age_hours = func.timestampdiff(text("HOUR"), VideoActivity.bucket, now)
+    weight = func.exp(-log(2) / HALF_LIFE_HOURS * age_hours)
+
+    scores = (
+        db.select(
+            VideoActivity.video_id,
+            func.sum(
+                (VideoActivity.views + LIKE_WEIGHT * VideoActivity.likes) * weight
+            ).label("score"),
+        )
+        .where(VideoActivity.bucket >= hour_bucket(now - SCORE_WINDOW))
+        .group_by(VideoActivity.video_id)
+        .subquery()
+    )
+
+    db.session.execute(
+        update(VideoStats)
+        .where(VideoStats.trending_score != 0)
+        .values(trending_score=0)
+    )
+    db.session.execute(
+        update(VideoStats)
+        .where(VideoStats.video_id == scores.c.video_id)
+        .values(trending_score=func.greatest(scores.c.score, 0))
+    )
+
+    db.session.commit()
+
+
+def refresh_trending_scores_if_due() -> None:
+    global _last_refresh
+
+    with _refresh_lock:
+        if (
+            _last_refresh is not None
+            and monotonic() - _last_refresh < REFRESH_INTERVAL_SECONDS
+        ):
+            return
+
+        refresh_trending_scores()
+        _last_refresh = monotonic()
+
+
+def backfill_video_activity() -> int:
+    db.session.execute(db.delete(VideoActivity))
+
+    view_bucket = func.date_format(Views.created_at, "%Y-%m-%d %H:00:00")
+    db.session.execute(
+        insert(VideoActivity).from_select(
+            ["video_id", "bucket", "views", "likes"],
+            db.select(Views.video_id, view_bucket, func.count(Views.id), 0).group_by(
+                Views.video_id, view_bucket
+            ),
+        )
+    )
+
+    like_bucket = func.date_format(Likes.created_at, "%Y-%m-%d %H:00:00")
+    likes_stmt = insert(VideoActivity).from_select(
+        ["video_id", "bucket", "views", "likes"],
+        db.select(Likes.video_id, like_bucket, 0, func.count(Likes.id)).group_by(
+            Likes.video_id, like_bucket
+        ),
+    )
+    db.session.execute(
+        likes_stmt.on_duplicate_key_update(likes=likes_stmt.inserted.likes)
+    )
+
+    db.session.commit()
+
+    return db.session.scalar(db.select(func.count()).select_from(VideoActivity))
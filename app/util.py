@@ -0,0 +1,50 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(urlsafe_b64decode(padded.encode()))
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+
+    return values
+
+
+# Decodes a keyset cursor of (sort key, id). Cursors come from clients, so
+# both are type-checked: the key is an ISO datetime string when key_type is
+# datetime, otherwise a key_type value, and the id an int.
+def decode_keyset_cursor(cursor: str, key_type: type) -> tuple:
+    values = decode_cursor(cursor)
+
+    if len(values) != 2:
+        raise ValueError("Invalid cursor")
+
+    key, last_id = values
+
+    if type(last_id) is not int:
+        raise ValueError("Invalid cursor")
+
+    if key_type is datetime:
+        if not isinstance(key, str):
+            raise ValueError("Invalid cursor")
+
+        try:
+            return datetime.fromisoformat(key), last_id
+        except ValueError:
+            raise ValueError("Invalid cursor")
+
+    if type(key) is not key_type:
+        raise ValueError("Invalid cursor")
+
+    return key, last_id
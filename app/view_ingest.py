@@ -0,0 +1,59 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy.dialects.mysql import insert
+
+from .context import db, view_buffer
+from .models.video import Video
+from .models.views import Views
+from .stats import bump_video_stats
+from .trending import bump_video_activity, hour_bucket
+
+
+def queue_view(video_id: int, user_id: int | None) -> None:
+    view_buffer.add((video_id, user_id, datetime.now()))
+
+
+# One transaction per batch: a single multi-row INSERT for the raw views, then
+# one counter upsert per video and one rollup upsert per (video, hour).
+@view_buffer.flusher
+def flush_views(events: list[tuple[int, int | None, datetime]]) -> None:
+    # views of videos deleted since they were queued are discarded
+    live = set(
+        db.session.scalars(
+            db.select(Video.id).where(
+                Video.id.in_({video_id for video_id, _, _ in events}),
+                Video.status == 0,
+            )
+        )
+    )
+
+    events = [event for event in events if event[0] in live]
+
+    if not events:
+        return
+
+    db.session.execute(
+        insert(Views).values(
+            [
+                {"video_id": video_id, "user_id": user_id, "created_at": viewed_at}
+                for video_id, user_id, viewed_at in events
+            ]
+        )
+    )
+
+    views = Counter(video_id for video_id, _, _ in events)
+    last_viewed = {}
+    buckets = Counter()
+
+    for video_id, _, viewed_at in events:
+        last_viewed[video_id] = max(last_viewed.get(video_id, viewed_at), viewed_at)
+        buckets[video_id, hour_bucket(viewed_at)] += 1
+
+    for video_id, count in views.items():
+        bump_video_stats(video_id, views=count, viewed_at=last_viewed[video_id])
+
+    for (video_id, bucket), count in buckets.items():
+        bump_video_activity(video_id, views=count, at=bucket)
+
+    db.session.commit()
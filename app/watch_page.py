@@ -0,0 +1,166 @@
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from flask_login import current_user
+
+from .context import counter_cache, db, storage_manager, watch_cache
+from .models.likes import Likes
+from .models.user import User
+from .models.video import Video
+from .models.video_stats import VideoStats
+from .publishing import hls_manifest_path, manifest_path
+from .seek_previews import seek_vtt_path
+
+
+class WatchVideo(NamedTuple):
+    id: int
+    hash: str
+    title: str
+    description: str | None
+    user_id: int
+    hidden: int
+    status: int
+    created_at: datetime
+    duration: float | None
+    video_url: str | None
+    hls_url: str | None
+    thumbnails_url: str | None
+
+
+class WatchUploader(NamedTuple):
+    id: int
+    name: str
+    picture: str | None
+
+
+class WatchPage(NamedTuple):
+    video: WatchVideo
+    uploader: WatchUploader
+    view_count: int
+    like_count: int
+
+
+def watch_page_select():
+    return (
+        db.select(
+            Video,
+            User.name,
+            User.picture,
+            VideoStats.view_count,
+            VideoStats.like_count,
+        )
+        .join(User, User.id == Video.user_id)
+        .outerjoin(VideoStats, VideoStats.video_id == Video.id)
+    )
+
+
+# The video and uploader part of a ready video's page only changes when it is
+# deleted, so it is cached per hash. The worker that deletes it drops the
+# entry right away; every other worker notices within the counter ttl, since
+# the counters they re-read every few seconds carry the status along. Videos
+# that are not ready yet are never cached, as their publishing is only heard
+# of by the worker it happens in.
+def load_watch_page(video_hash: str) -> Optional[WatchPage]:
+    cached = watch_cache.get(video_hash)
+
+    if cached is not None:
+        video, uploader = cached
+        view_count, like_count, status = load_counters(video.id)
+
+        if status == 0:
+            return WatchPage(video, uploader, view_count, like_count)
+
+        watch_cache.discard(video_hash)
+
+    # deleted videos (status 4) are gone as far as viewers are concerned
+    row = db.session.execute(
+        watch_page_select().where(Video.hash == video_hash, Video.status != 4)
+    ).first()
+
+    if row is None:
+        return None
+
+    video, name, picture, view_count, like_count = row
+
+    page = WatchPage(
+        WatchVideo(
+            video.id,
+            video.hash,
+            video.title,
+            video.description,
+            video.user_id,
+            video.hidden,
+            video.status,
+            video.created_at,
+            video.duration,
+            # a ready video's manifest is known to exist
+            storage_manager.public_url(manifest_path(video.hash))
+            if video.status == 0
+            else None,
+            storage_manager.public_url(hls_manifest_path(video.hash))
+            if video.status == 0 and "hls" in video.manifests.split(",")
+            else None,
+            # videos transcoded before seek previews have no thumbnails track
+            storage_manager.public_url(seek_vtt_path(video.hash))
+            if video.status == 0 and video.seek_previews
+            else None,
+        ),
+        WatchUploader(video.user_id, name, picture),
+        view_count or 0,
+        # may dip below zero until another worker's like deltas are flushed
+        max(like_count or 0, 0),
+    )
+
+    if video.status == 0:
+        watch_cache.put(video_hash, (page.video, page.uploader))
+
+    counter_cache.put(video.id, (page.view_count, page.like_count, video.status))
+
+    return page
+
+
+# iPhones only gained Media Source Extensions with iOS 17.1 (and only as
+# ManagedMediaSource), so they get the HLS playlist, which Safari plays
+# natively; everything else gets DASH through the player's MSE pipeline.
+# Both reference the same CMAF segments.
+def choose_manifest_url(video: WatchVideo, user_agent: str) -> str | None:
+    if video.hls_url and ("iPhone" in user_agent or "iPod" in user_agent):
+        return video.hls_url
+
+    return video.video_url
+
+
+# Returns the view and like counts, and the video's status (4 once it is
+# purged), cached for a few seconds.
+def load_counters(video_id: int) -> tuple[int, int, int]:
+    counters = counter_cache.get(video_id)
+
+    if counters is None:
+        row = db.session.execute(
+            db.select(Video.status, VideoStats.view_count, VideoStats.like_count)
+            .outerjoin(VideoStats, VideoStats.video_id == Video.id)
+            .where(Video.id == video_id)
+        ).first()
+
+        if row is None:
+            counters = (0, 0, 4)
+        else:
+            counters = (row.view_count or 0, max(row.like_count or 0, 0), row.status)
+
+        counter_cache.put(video_id, counters)
+
+    return counters
+
+
+def viewer_liked(video_id: int) -> bool:
+    if not current_user.is_authenticated:
+        return False
+
+    return (
+        db.session.scalar(
+            db.select(Likes.id)
+            .where(Likes.video_id == video_id, Likes.user_id == current_user.id)
+            .limit(1)
+        )
+        is not None
+    )
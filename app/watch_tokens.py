@@ -0,0 +1,58 @@
+from time import time
+from uuid import uuid4
+
+from flask import session
+
+# A watch token is issued per watch page view and redeemed once by the view
+# beacon; tokens that are never redeemed expire, and a session keeps at most
+# MAX_WATCH_TOKENS of them.
+WATCH_TOKEN_TTL = 6 * 3600
+MAX_WATCH_TOKENS = 16
+
+
+# The token carries what the view beacon needs to validate the view, so
+# redeeming it does not look the video up again.
+def issue_watch_token(video_id: int, video_hash: str, duration: float | None) -> str:
+    now = time()
+
+    tokens = {
+        watch_id: token
+        for watch_id, token in session.get("watching_list", {}).items()
+        if now - token["watch_start_ts"] < WATCH_TOKEN_TTL
+    }
+
+    watch_id = uuid4().hex
+    tokens[watch_id] = {
+        "video_id": video_id,
+        "video_hash": video_hash,
+        "duration": duration or 0,
+        "watch_start_ts": now,
+        "watched": False,
+    }
+
+    if len(tokens) > MAX_WATCH_TOKENS:
+        newest = sorted(tokens, key=lambda key: tokens[key]["watch_start_ts"])
+        tokens = {key: tokens[key] for key in newest[-MAX_WATCH_TOKENS:]}
+
+    session["watching_list"] = tokens
+
+    return watch_id
+
+
+def get_watch_token(watch_id: str) -> dict | None:
+    token = session.get("watching_list", {}).get(watch_id)
+
+    # tokens issued before they carried the video id are treated as expired
+    if token is None or "video_id" not in token:
+        return None
+
+    if time() - token["watch_start_ts"] >= WATCH_TOKEN_TTL:
+        return None
+
+    return token
+
+
+def redeem_watch_token(watch_id: str) -> None:
+    session["watching_list"][watch_id]["watched"] = True
+    # the token is nested, so the session cannot see the change by itself
+    session.modified = True
@@ -0,0 +1,134 @@
+import atexit
+from collections import deque
+from threading import Condition, Lock, Thread
+from time import monotonic, perf_counter, sleep
+from typing import Any, Callable, Optional
+
+from flask import Flask
+
+from .metrics import Metrics
+
+MAX_ATTEMPTS = 3
+
+
+# Write-behind queue: requests enqueue events and return, and a background
+# thread hands them to the registered flusher in batches, whenever max_events
+# are waiting or every interval seconds. The queue is also drained by the
+# producer once it holds maxsize events and at interpreter exit (gunicorn
+# worker shutdown). A failed batch is requeued and only dropped after
+# MAX_ATTEMPTS, so a poisoned batch cannot block the queue forever.
+class WriteBuffer:
+    def __init__(
+        self,
+        name: str,
+        metrics: Metrics,
+        max_events: int = 500,
+        interval: float = 0.25,
+        maxsize: int = 50_000,
+    ):
+        self.name = name
+        self.metrics = metrics
+        self.max_events = max_events
+        self.interval = interval
+        self.maxsize = maxsize
+
+        self.events: deque = deque()
+        self.attempts = 0
+        self.condition = Condition()
+        self.flush_lock = Lock()
+
+        self.app: Optional[Flask] = None
+        self.flush_events: Optional[Callable[[list], None]] = None
+        self.thread: Optional[Thread] = None
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+        atexit.register(self.flush)
+
+    def flusher(self, flush_events: Callable[[list], None]):
+        self.flush_events = flush_events
+        return flush_events
+
+    def add(self, event: Any) -> None:
+        with self.condition:
+            self.events.append(event)
+            depth = len(self.events)
+
+            if depth >= self.max_events:
+                self.condition.notify()
+
+        self.metrics.incr(f"{self.name}.events")
+        self.metrics.gauge(f"{self.name}.queue_depth", depth)
+
+        # the thread is started lazily so it runs in the forked worker
+        if self.thread is None or not self.thread.is_alive():
+            self._start()
+
+        if depth >= self.maxsize:
+            self.flush()
+
+    def flush(self) -> None:
+        # a failing batch is dropped after MAX_ATTEMPTS, so this terminates
+        while self.events:
+            self._flush_batch()
+
+    def _start(self) -> None:
+        with self.condition:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                deadline = monotonic() + self.interval
+
+                while len(self.events) < self.max_events:
+                    remaining = deadline - monotonic()
+
+                    if remaining <= 0:
+                        break
+
+                    self.condition.wait(remaining)
+
+            if self.events and not self._flush_batch():
+                sleep(self.interval * self.attempts)
+
+    def _flush_batch(self) -> bool:
+        with self.flush_lock:
+            with self.condition:
+                batch = [
+                    self.events.popleft()
+                    for _ in range(min(self.max_events, len(self.events)))
+                ]
+
+            if not batch:
+                return True
+
+            started = perf_counter()
+
+            try:
+                with self.app.app_context():
+                    self.flush_events(batch)
+
+            except Exception as e:
+                self.attempts += 1
+                self.metrics.incr(f"{self.name}.flush_errors")
+
+                if self.attempts < MAX_ATTEMPTS:
+                    print(f"Failed to flush {len(batch)} {self.name}, will retry: {e}")
+
+                    with self.condition:
+                        self.events.extendleft(reversed(batch))
+
+                    return False
+
+                print(f"Dropping {len(batch)} {self.name} after retries: {e}")
+                self.metrics.incr(f"{self.name}.dropped", len(batch))
+
+            self.attempts = 0
+            self.metrics.observe(f"{self.name}.flush", perf_counter() - started)
+            self.metrics.record(f"{self.name}.batch_size", len(batch))
+            self.metrics.gauge(f"{self.name}.queue_depth", len(self.events))
+
+            return True
@@ -0,0 +1,97 @@
+// Infinite scroll for video listings.
+// Each .video-feed section pages through /api/video/list with the keyset cursor
+// returned by the previous page, loading the next page when its sentinel
+// scrolls into view.
+document.addEventListener('DOMContentLoaded', function () {
+	document.querySelectorAll('.video-feed').forEach(initFeed);
+});
+
+function initFeed(feed) {
+	const grid = feed.querySelector('.grid');
+	const sentinel = feed.querySelector('.feed-sentinel');
+
+	let cursor = feed.dataset.cursor || null;
+	let done = feed.dataset.done === 'true';
+	let loading = false;
+
+	if (!grid || !sentinel || done) {
+		return;
+	}
+
+	const observer = new IntersectionObserver(async (entries) => {
+		if (!entries[0].isIntersecting || loading || done) {
+			return;
+		}
+
+		loading = true;
+
+		try {
+			const params = new URLSearchParams({ sort: feed.dataset.sort || 'recent' });
+			if (feed.dataset.user) params.set('user', feed.dataset.user);
+			if (cursor) params.set('cursor', cursor);
+
+			const response = await fetch('/api/video/list?' + params.toString());
+
+			if (!response.ok) {
+				throw new Error('HTTP ' + response.status);
+			}
+
+			const data = await response.json();
+			data.videos.forEach(video => grid.appendChild(createVideoCard(video)));
+
+			cursor = data.next_cursor;
+			done = !cursor;
+
+			if (done) {
+				observer.disconnect();
+			}
+		} catch (error) {
+			console.error('Error loading videos:', error);
+			done = true;
+			observer.disconnect();
+		}
+
+		loading = false;
+	}, { rootMargin: '400px' });
+
+	observer.observe(sentinel);
+}
+
+function createVideoCard(video) {
+	const card = document.createElement('div');
+	card.className = 'card';
+
+	const link = document.createElement('a');
+	link.href = '/watch/' + encodeURIComponent(video.hash);
+	link.className = 'card-link';
+
+	const thumb = document.createElement('div');
+	thumb.className = 'card-thumb';
+	thumb.style.backgroundImage = `url('${video.thumbnail_url}')`;
+
+	const header = document.createElement('div');
+	header.className = 'card-header';
+
+	const title = document.createElement('div');
+	title.className = 'card-title';
+
+	const avatar = document.createElement('img');
+	avatar.src = video.uploader_picture || '';
+	avatar.alt = 'Uploader avatar';
+	avatar.className = 'video-card-avatar';
+
+	title.appendChild(avatar);
+	title.appendChild(document.createTextNode(video.title));
+
+	const metadata = document.createElement('div');
+	metadata.className = 'card-metadata';
+	metadata.textContent = video.view_count;
+
+	header.appendChild(title);
+	header.appendChild(metadata);
+	link.appendChild(thumb);
+	link.appendChild(header);
+	card.appendChild(link);
+
+	return card;
+}
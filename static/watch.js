@@ -14,7 +14,6 @@ async function initPlayer(manifUrl) {
 	const delete_button = document.getElementById('delete-button');
 	const video = document.getElementById('video-player');
 	const like_count = document.getElementById('like-count');
-	const commentForm = document.getElementById('comment-form');
 	const uiContainer = document.getElementById('video-container');
 	const player = new shaka.Player();
 	await player.attach(video);
@@ -48,6 +47,10 @@ async function initPlayer(manifUrl) {
 		console.error(e);
 	}
 
+	if (video.dataset.thumbnails) {
+		initSeekPreview(player, uiContainer, video.dataset.thumbnails);
+	}
+
 
 	const stats = player.getStats()
 
@@ -66,18 +69,20 @@ async function initPlayer(manifUrl) {
 	}, 1000)
 
 	like_button.addEventListener('click', async () => {
-		// const likeCount = document.getElementById('like-count');
-
-		console.log(video_liked)
-		console.log(video_liked ? 'Unliking video' : 'Liking video');
 		try {
 			const response = await fetch('/api/video/like/' + video_hash, {
 				method: video_liked ? 'DELETE' : 'POST',
 			});
 
 			if (response.ok) {
-				video_liked = !video_liked;
-				like_count.textContent = parseInt(like_count.textContent) + (video_liked ? 1 : -1);
+				// the server answers with the resulting state; the count only
+				// moves when this request actually changed it
+				const data = await response.json();
+				video_liked = data.liked;
+
+				if (data.changed) {
+					like_count.textContent = parseInt(like_count.textContent) + (video_liked ? 1 : -1);
+				}
 			} else {
 				console.error('Failed to like the video');
 			}
@@ -105,6 +110,120 @@ async function initPlayer(manifUrl) {
 			}
 		});
 	}
+}
+
+// Seek previews come from a WebVTT thumbnails track whose cues point into a
+// few sprite sheets, so scrubbing only fetches (and then reuses) those images
+// instead of downloading segments.
+async function initSeekPreview(player, uiContainer, thumbnailsUrl) {
+	if (!player.addThumbnailsTrack) {
+		return;
+	}
+
+	let track;
+
+	try {
+		track = await player.addThumbnailsTrack(thumbnailsUrl, 'text/vtt');
+	} catch (e) {
+		console.error('Failed to load seek previews:', e);
+		return;
+	}
+
+	const seekBar = uiContainer.querySelector('.shaka-seek-bar');
+
+	if (!seekBar) {
+		return;
+	}
+
+	const preview = document.createElement('div');
+	preview.className = 'seek-preview';
+	uiContainer.appendChild(preview);
+
+	const show = async (fraction) => {
+		const range = player.seekRange();
+		const time = range.start + fraction * (range.end - range.start);
+		const thumbnail = await player.getThumbnails(track.id, time);
+
+		if (!thumbnail) {
+			return;
+		}
+
+		const bar = seekBar.getBoundingClientRect();
+		const container = uiContainer.getBoundingClientRect();
+		const left = bar.left - container.left + fraction * bar.width - thumbnail.width / 2;
+
+		preview.style.width = thumbnail.width + 'px';
+		preview.style.height = thumbnail.height + 'px';
+		preview.style.backgroundImage = 'url("' + thumbnail.uris[0] + '")';
+		preview.style.backgroundPosition = -thumbnail.positionX + 'px ' + -thumbnail.positionY + 'px';
+		preview.style.left = Math.max(0, Math.min(left, container.width - thumbnail.width)) + 'px';
+		preview.style.bottom = container.bottom - bar.top + 8 + 'px';
+		preview.style.display = 'block';
+	};
+
+	seekBar.addEventListener('mousemove', (event) => {
+		const bar = seekBar.getBoundingClientRect();
+		show(Math.max(0, Math.min(1, (event.clientX - bar.left) / bar.width)));
+	});
+	seekBar.addEventListener('input', () => {
+		show((seekBar.value - seekBar.min) / (seekBar.max - seekBar.min || 1));
+	});
+	seekBar.addEventListener('mouseleave', () => {
+		preview.style.display = 'none';
+	});
+	seekBar.addEventListener('change', () => {
+		preview.style.display = 'none';
+	});
+}
+
+// Comments are keyset-paginated: the watch page embeds the first page and
+// the rest is fetched from /api/video/comments as the list scrolls into view.
+function initComments() {
+	const comments = document.getElementById('comments');
+	const sentinel = document.getElementById('comments-sentinel');
+	const commentForm = document.getElementById('comment-form');
+	const video_hash = comments.dataset.hash;
+
+	let cursor = comments.dataset.cursor || null;
+	let done = comments.dataset.done === 'true';
+	let loading = false;
+
+	if (!done) {
+		const observer = new IntersectionObserver(async (entries) => {
+			if (!entries[0].isIntersecting || loading || done) {
+				return;
+			}
+
+			loading = true;
+
+			try {
+				const params = new URLSearchParams({ cursor: cursor });
+				const response = await fetch('/api/video/comments/' + video_hash + '?' + params.toString());
+
+				if (!response.ok) {
+					throw new Error('HTTP ' + response.status);
+				}
+
+				const data = await response.json();
+				data.comments.forEach(comment => comments.appendChild(createComment(comment)));
+
+				cursor = data.next_cursor;
+				done = !cursor;
+
+				if (done) {
+					observer.disconnect();
+				}
+			} catch (error) {
+				console.error('Error loading comments:', error);
+				done = true;
+				observer.disconnect();
+			}
+
+			loading = false;
+		}, { rootMargin: '400px' });
+
+		observer.observe(sentinel);
+	}
 
 	commentForm.addEventListener('submit', async (event) => {
 		event.preventDefault();
@@ -125,8 +244,15 @@ async function initPlayer(manifUrl) {
 			});
 
 			if (response.ok) {
+				const data = await response.json();
+				const placeholder = document.getElementById('no-comments');
+
+				if (placeholder) {
+					placeholder.remove();
+				}
+
 				commentInput.value = ''; // Clear the input field
-				location.reload(); // Reload to show the new comment
+				comments.insertAdjacentHTML('afterbegin', data.html);
 			} else {
 				console.error('Failed to post comment');
 			}
@@ -136,5 +262,34 @@ async function initPlayer(manifUrl) {
 	});
 }
 
+function createComment(comment) {
+	const item = document.createElement('div');
+	item.className = 'comment';
+
+	const avatar = document.createElement('img');
+	avatar.src = comment.user_picture || '';
+	avatar.alt = 'Commenter avatar';
+	avatar.className = 'comment-avatar';
+
+	const content = document.createElement('div');
+	content.className = 'comment-content';
+
+	const meta = document.createElement('div');
+	meta.className = 'comment-meta';
+	meta.textContent = comment.date;
+
+	const text = document.createElement('div');
+	text.className = 'comment-text';
+	text.textContent = comment.text;
+
+	content.appendChild(meta);
+	content.appendChild(text);
+	item.appendChild(avatar);
+	item.appendChild(content);
+
+	return item;
+}
+
 shaka.polyfill.installAll();
 document.addEventListener('DOMContentLoaded', initApp);
+document.addEventListener('DOMContentLoaded', initComments);
@@ -0,0 +1,148 @@
+import random
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterable, Iterator
+
+from sqlalchemy import text
+
+from app.context import db
+from app.models.comment import Comment
+from app.models.likes import Likes
+from app.models.user import User
+from app.models.video import Video
+from app.models.video_stats import VideoStats
+from app.models.views import Views
+
+BATCH_SIZE = 10_000
+
+# titles and descriptions are drawn from a fixed vocabulary, so full-text
+# queries for these words match a predictable share of the catalogue
+WORDS = (
+    "cat dog funny cute video music live cover remix tutorial guide review "
+    "unboxing travel vlog cooking recipe game gameplay speedrun trailer news "
+    "science space ocean mountain city night rain piano guitar drums dance "
+    "football goal highlights interview podcast lecture history art paint "
+    "build repair garden coffee street train plane drone timelapse"
+).split()
+
+
+def insert_batches(model, rows: Iterable[dict]) -> None:
+    rows = iter(rows)
+
+    while batch := list(islice(rows, BATCH_SIZE)):
+        db.session.execute(db.insert(model), batch)
+        db.session.commit()
+
+
+# Empties every table; TRUNCATE, since DELETE would take minutes on the
+# largest corpora.
+def clear_database() -> None:
+    db.session.remove()
+
+    with db.engine.begin() as connection:
+        connection.execute(text("SET FOREIGN_KEY_CHECKS = 0"))
+
+        for table in db.metadata.sorted_tables:
+            connection.execute(text(f"TRUNCATE TABLE {table.name}"))
+
+        connection.execute(text("SET FOREIGN_KEY_CHECKS = 1"))
+
+
+def seed_users(count: int) -> None:
+    insert_batches(
+        User,
+        (
+            {
+                "id": user_id,
+                "email": f"user{user_id}@example.com",
+                "provider": "google",
+                "name": f"User {user_id}",
+            }
+            for user_id in range(1, count + 1)
+        ),
+    )
+
+
+# Seeds an empty database with users and ready, public videos (ids 1..videos)
+# with their video_stats rows, plus raw views, likes and comments per video.
+# The counters are long-tailed like real ones rather than reconciled with the
+# raw rows. The same seed always produces the same catalogue.
+def seed_catalogue(
+    videos: int,
+    users: int = 100,
+    views_per_video: int = 0,
+    likes_per_video: int = 0,
+    comments_per_video: int = 0,
+    seed: int = 0,
+) -> None:
+    rng = random.Random(seed)
+    now = datetime.now()
+
+    seed_users(users)
+
+    def video_rows() -> Iterator[dict]:
+        for video_id in range(1, videos + 1):
+            yield {
+                "id": video_id,
+                "title": " ".join(rng.choices(WORDS, k=rng.randint(2, 6))),
+                "description": " ".join(rng.choices(WORDS, k=rng.randint(0, 30))),
+                "hash": f"{video_id:032x}",
+                "thumbnail_url": "",
+                "user_id": rng.randint(1, users),
+                "hidden": 0,
+                "status": 0,
+                "created_at": now - timedelta(minutes=videos - video_id),
+                "duration": rng.uniform(5, 1200),
+            }
+
+    insert_batches(Video, video_rows())
+
+    insert_batches(
+        VideoStats,
+        (
+            {
+                "video_id": video_id,
+                "view_count": int(rng.paretovariate(1.2) * 100),
+                "like_count": int(rng.paretovariate(1.5) * 5),
+                "comment_count": comments_per_video,
+                "trending_score": rng.random(),
+            }
+            for video_id in range(1, videos + 1)
+        ),
+    )
+
+    insert_batches(
+        Views,
+        (
+            {"video_id": video_id, "user_id": rng.randint(1, users)}
+            for video_id in range(1, videos + 1)
+            for _ in range(views_per_video)
+        ),
+    )
+
+    insert_batches(
+        Likes,
+        (
+            {"video_id": video_id, "user_id": user_id}
+            for video_id in range(1, videos + 1)
+            for user_id in rng.sample(range(1, users + 1), min(likes_per_video, users))
+        ),
+    )
+
+    insert_batches(
+        Comment,
+        (
+            {
+                "video_id": video_id,
+                "user_id": rng.randint(1, users),
+                "text": " ".join(rng.choices(WORDS, k=8)),
+            }
+            for video_id in range(1, videos + 1)
+            for _ in range(comments_per_video)
+        ),
+    )
+
+    # fresh index statistics, so plans are chosen as on a settled database
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            connection.execute(text(f"ANALYZE TABLE {table.name}"))
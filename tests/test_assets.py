@@ -0,0 +1,49 @@
+import pytest
+from flask import Flask, url_for
+
+from app.assets import ROOT_ASSETS, StaticAssets
+
+
+@pytest.fixture
+def static_folder(tmp_path):
+    for filename in (*ROOT_ASSETS, "watch.js"):
+        (tmp_path / filename).write_bytes(b"content of " + filename.encode())
+
+    return tmp_path
+
+
+def make_client(static_folder, debug: bool):
+    app = Flask(
+        __name__, static_folder=str(static_folder), static_url_path="/static"
+    )
+    app.debug = debug
+    StaticAssets().init_app(app)
+    return app.test_client()
+
+
+@pytest.mark.parametrize("debug", [False, True])
+@pytest.mark.parametrize("filename", ROOT_ASSETS)
+def test_root_assets_are_served(static_folder, debug, filename):
+    response = make_client(static_folder, debug).get(f"/{filename}")
+
+    assert response.status_code == 200
+    assert response.get_data() == b"content of " + filename.encode()
+
+
+def test_static_files_are_fingerprinted_outside_debug(static_folder):
+    client = make_client(static_folder, debug=False)
+
+    with client.application.test_request_context():
+        url = url_for("static", filename="watch.js")
+
+    assert url != "/static/watch.js"
+    assert "immutable" in client.get(url).headers["Cache-Control"]
+
+
+def test_static_files_are_served_as_is_in_debug(static_folder):
+    client = make_client(static_folder, debug=True)
+
+    with client.application.test_request_context():
+        assert url_for("static", filename="watch.js") == "/static/watch.js"
+
+    assert client.get("/static/watch.js").status_code == 200
@@ -0,0 +1,134 @@
+import gzip
+import zlib
+
+import pytest
+from flask import Flask, Response, stream_with_context
+
+from app import compression
+from app.compression import MIN_SIZE, ResponseCompressor
+from app.metrics import Metrics
+
+BODY = "<p>" + "pseudotube " * 200 + "</p>"
+
+
+@pytest.fixture
+def metrics():
+    return Metrics()
+
+
+@pytest.fixture
+def client(metrics):
+    app = Flask(__name__)
+    ResponseCompressor(metrics).init_app(app)
+
+    @app.route("/page")
+    def page():
+        response = Response(BODY, mimetype="text/html")
+        response.set_etag("page-v1")
+        return response
+
+    @app.route("/small")
+    def small():
+        return Response("x" * (MIN_SIZE - 1), mimetype="text/html")
+
+    @app.route("/image")
+    def image():
+        return Response(b"\0" * 4096, mimetype="image/jpeg")
+
+    @app.route("/empty")
+    def empty():
+        return Response(status=204)
+
+    @app.route("/missing")
+    def missing():
+        return Response(BODY, status=304, mimetype="text/html")
+
+    @app.route("/stream")
+    def stream():
+        def chunks():
+            for index in range(3):
+                yield f"<li>chunk {index}</li>" * 50
+
+        return Response(stream_with_context(chunks()), mimetype="text/html")
+
+    return app.test_client()
+
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+def test_buffered_response_is_gzipped(client, metrics):
+    response = client.get("/page", headers=GZIP)
+
+    assert response.status_code == 200
+    assert response.content_encoding == "gzip"
+    assert "Accept-Encoding" in response.vary
+    assert gzip.decompress(response.get_data()).decode() == BODY
+    assert response.content_length == len(response.get_data())
+
+    assert list(metrics.values["response_raw_bytes.page"]) == [len(BODY)]
+    assert list(metrics.values["response_bytes.page"]) == [len(response.get_data())]
+
+
+def test_strong_etag_is_weakened(client):
+    response = client.get("/page", headers=GZIP)
+
+    assert response.get_etag() == ("page-v1", True)
+
+
+def test_uncompressed_without_accept_encoding(client):
+    response = client.get("/page", headers={"Accept-Encoding": "identity"})
+
+    assert response.content_encoding is None
+    assert response.get_data(as_text=True) == BODY
+    assert response.get_etag() == ("page-v1", False)
+
+
+@pytest.mark.parametrize("path", ["/small", "/image", "/empty", "/missing"])
+def test_small_binary_and_bodiless_responses_are_skipped(client, path):
+    response = client.get(path, headers=GZIP)
+
+    assert response.content_encoding is None
+
+
+def test_head_is_skipped(client):
+    assert client.head("/page", headers=GZIP).content_encoding is None
+
+
+def test_streamed_response_is_gzipped_chunk_by_chunk(client, metrics):
+    response = client.get("/stream", headers=GZIP, buffered=False)
+
+    assert response.content_encoding == "gzip"
+    assert "Content-Length" not in response.headers
+
+    # every chunk is flushed, so it decodes as soon as it arrives
+    decompressor = zlib.decompressobj(31)
+    decoded = []
+
+    for chunk in response.response:
+        decoded.append(decompressor.decompress(chunk).decode())
+
+    response.close()
+
+    assert decoded[0] == "<li>chunk 0</li>" * 50
+    assert "".join(decoded) == "".join(f"<li>chunk {i}</li>" * 50 for i in range(3))
+    assert decompressor.eof
+    assert metrics.counters["response_streamed.stream"] == 1
+
+
+def test_brotli_is_preferred_when_available(client):
+    brotli = pytest.importorskip("brotli")
+
+    response = client.get("/page", headers={"Accept-Encoding": "gzip, br"})
+
+    assert response.content_encoding == "br"
+    assert brotli.decompress(response.get_data()).decode() == BODY
+
+
+def test_brotli_only_clients_get_identity_without_brotli(client, monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+
+    response = client.get("/page", headers={"Accept-Encoding": "br"})
+
+    assert response.content_encoding is None
+    assert response.get_data(as_text=True) == BODY
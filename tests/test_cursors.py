@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import pytest
+
+from app.comments import list_comments
+from app.listing import list_videos
+from app.util import decode_keyset_cursor, encode_cursor
+
+CREATED_AT = datetime(2024, 5, 1, 12, 30)
+
+
+def test_keyset_cursor_round_trip():
+    cursor = encode_cursor(CREATED_AT.isoformat(), 42)
+
+    assert decode_keyset_cursor(cursor, datetime) == (CREATED_AT, 42)
+    assert decode_keyset_cursor(encode_cursor(1500, 7), int) == (1500, 7)
+
+
+@pytest.mark.parametrize(
+    "values, key_type",
+    [
+        ((12345, 1), datetime),
+        ((None, 1), datetime),
+        ((["2024-05-01"], 1), datetime),
+        (("yesterday", 1), datetime),
+        (("1500", 1), int),
+        ((1.5, 1), int),
+        ((True, 1), int),
+        ((CREATED_AT.isoformat(), "1"), datetime),
+        ((CREATED_AT.isoformat(), None), datetime),
+        ((CREATED_AT.isoformat(),), datetime),
+        ((CREATED_AT.isoformat(), 1, 2), datetime),
+    ],
+)
+def test_keyset_cursor_rejects_wrong_types(values, key_type):
+    with pytest.raises(ValueError):
+        decode_keyset_cursor(encode_cursor(*values), key_type)
+
+
+# rejected before any query runs, so the API answers 400 rather than 500
+@pytest.mark.parametrize(
+    "sort, values",
+    [("recent", (12345, 1)), ("recent", ({"a": 1}, 1)), ("views", ("12", 1))],
+)
+def test_list_videos_rejects_malformed_cursor(sort, values):
+    with pytest.raises(ValueError):
+        list_videos(sort=sort, cursor=encode_cursor(*values))
+
+
+@pytest.mark.parametrize(
+    "values", [(12345, 1), (None, 1), ("not a date", 1), ("2024-05-01", "1")]
+)
+def test_list_comments_rejects_malformed_cursor(values):
+    with pytest.raises(ValueError):
+        list_comments(1, cursor=encode_cursor(*values))
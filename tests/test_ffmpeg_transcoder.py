@@ -0,0 +1,182 @@
+import os
+import shutil
+import sys
+from threading import Thread
+from time import perf_counter
+
+import pytest
+from flask import Flask
+
+from app.ffmpeg_transcoder import FFmpegTranscoderService, run_ffmpeg
+from app.ladder import Rendition, plan_ladder
+from app.metrics import Metrics
+from app.publishing import hls_manifest_path, manifest_path, thumbnail_path
+from app.seek_previews import plan_seek_sprites, seek_sprite_path
+from app.storage import StorageManager
+
+needs_ffmpeg = pytest.mark.skipif(
+    not (shutil.which("ffmpeg") and shutil.which("ffprobe")),
+    reason="needs ffmpeg and ffprobe on the PATH",
+)
+
+VIDEO_HASH = "0" * 32
+WIDTH, HEIGHT, FPS, DURATION = 640, 360, 30, 4
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return StorageManager("", None, "local", str(tmp_path))
+
+
+# A short test pattern with a tone, stored as an upload.
+@pytest.fixture
+def upload(storage):
+    path = storage.uri(f"uploads/{VIDEO_HASH}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    run_ffmpeg(
+        [
+            "-f", "lavfi", "-i", f"testsrc=size={WIDTH}x{HEIGHT}:rate={FPS}",
+            "-f", "lavfi", "-i", "sine=frequency=440",
+            "-t", str(DURATION), "-c:v", "libx264", "-c:a", "aac",
+            "-f", "mp4", path,
+        ]
+    )  # fmt: skip
+
+    return path
+
+
+@needs_ffmpeg
+def test_job_encodes_packages_and_stores_every_output(storage, upload):
+    service = FFmpegTranscoderService(storage, Metrics(), cores=2)
+    seek_sprites = plan_seek_sprites(WIDTH, HEIGHT, DURATION)
+
+    job = service.create_transcoder_job(
+        upload,
+        storage.uri(f"transcoded/{VIDEO_HASH}/"),
+        plan_ladder(WIDTH, HEIGHT, FPS),
+        seek_sprites,
+    )
+
+    assert service.get_transcoder_job_status(job.name) == "PENDING"
+
+    with Flask(__name__).app_context():
+        service.run_transcoder_job(job)
+
+    assert service.get_transcoder_job_status(job.name) == "SUCCEEDED"
+
+    for path in (
+        manifest_path(VIDEO_HASH),
+        hls_manifest_path(VIDEO_HASH),
+        thumbnail_path(VIDEO_HASH),
+        seek_sprite_path(VIDEO_HASH, 0),
+    ):
+        assert storage.backend.exists(path), path
+
+
+@needs_ffmpeg
+def test_failed_job_raises(storage, tmp_path):
+    service = FFmpegTranscoderService(storage, Metrics(), cores=2)
+    broken = tmp_path / "uploads" / "broken"
+    broken.parent.mkdir()
+    broken.write_bytes(b"not a video")
+
+    job = service.create_transcoder_job(
+        str(broken),
+        storage.uri(f"transcoded/{VIDEO_HASH}/"),
+        plan_ladder(WIDTH, HEIGHT, FPS),
+    )
+
+    with Flask(__name__).app_context(), pytest.raises(Exception):
+        service.run_transcoder_job(job)
+
+    assert service.get_transcoder_job_status(job.name) == "FAILED"
+
+
+# Stands in for ffmpeg, acting on the name of its output file: "noisy" logs far
+# more than a pipe holds before it reports progress, "slow" records its pid and
+# hangs, "broken" exits with an error and "fail" does so once two slow ones
+# are running; anything else succeeds.
+FAKE_FFMPEG = """
+import os, sys, time
+
+output = os.path.basename(sys.argv[-1])
+
+if "noisy" in output:
+    sys.stderr.write("warning: damaged frame\\n" * 20_000)
+    sys.stderr.flush()
+    print("out_time_us=2000000", flush=True)
+elif "slow" in output:
+    with open(os.path.join({pids!r}, output), "w") as f:
+        f.write(str(os.getpid()))
+    time.sleep(60)
+elif "fail" in output or "broken" in output:
+    deadline = time.time() + 10
+    while "fail" in output and len(os.listdir({pids!r})) < 2:
+        if time.time() > deadline:
+            break
+        time.sleep(0.05)
+    sys.stderr.write("invalid data found\\n")
+    sys.exit(1)
+"""
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    bin_dir, pids = tmp_path / "bin", tmp_path / "pids"
+    bin_dir.mkdir()
+    pids.mkdir()
+
+    ffmpeg = bin_dir / "ffmpeg"
+    ffmpeg.write_text(f"#!{sys.executable}\n" + FAKE_FFMPEG.format(pids=str(pids)))
+    ffmpeg.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    return pids
+
+
+def test_run_ffmpeg_survives_a_flood_of_log_lines(fake_ffmpeg, tmp_path):
+    reported = []
+    thread = Thread(
+        target=run_ffmpeg,
+        args=([str(tmp_path / "noisy.mp4")],),
+        kwargs={"progress": reported.append},
+        daemon=True,
+    )
+
+    thread.start()
+    thread.join(30)
+
+    assert not thread.is_alive(), "ffmpeg stalled on a full stderr pipe"
+    assert reported == [2.0]
+
+
+def test_run_ffmpeg_reports_the_error(fake_ffmpeg, tmp_path):
+    with pytest.raises(RuntimeError, match="invalid data found"):
+        run_ffmpeg([str(tmp_path / "broken.mp4")])
+
+
+def test_failed_encode_stops_the_others(fake_ffmpeg, storage, tmp_path):
+    service = FFmpegTranscoderService(storage, Metrics(), cores=16)
+    renditions = [
+        Rendition(key, "h264", 320, 180, 400_000, 30)
+        for key in ("slow_a", "slow_b", "fail_c")
+    ]
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+
+    started = perf_counter()
+
+    with pytest.raises(RuntimeError, match="invalid data found"):
+        service._encode(
+            "ffmpeg/test", "source.mp4", str(workdir), 4, False, renditions, None
+        )
+
+    assert perf_counter() - started < 30
+
+    # every slow encode had started and none of them is still running
+    for name in ("slow_a.mp4", "slow_b.mp4"):
+        pid = int((fake_ffmpeg / name).read_text())
+
+        with pytest.raises(ProcessLookupError):
+            os.kill(pid, 0)
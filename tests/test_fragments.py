@@ -0,0 +1,62 @@
+import pytest
+from flask import Flask, render_template_string
+
+from app.fragments import FragmentCache
+
+TEMPLATE = (
+    '{% call cached_fragment("shelf", name, version) %}'
+    "<b>{{ render() }}</b>"
+    "{% endcall %}"
+)
+
+
+@pytest.fixture
+def fragments():
+    return FragmentCache(maxsize=8)
+
+
+@pytest.fixture
+def render(fragments):
+    app = Flask(__name__)
+    app.add_template_global(fragments.render, "cached_fragment")
+    renders = []
+
+    def render_shelf(name: str, version: int, label: str) -> str:
+        def body() -> str:
+            renders.append((name, version))
+            return label
+
+        with app.app_context():
+            return render_template_string(
+                TEMPLATE, name=name, version=version, render=body
+            )
+
+    render_shelf.renders = renders
+    return render_shelf
+
+
+def test_fragment_is_reused_while_its_version_is_unchanged(render, fragments):
+    assert render("trending", 1, "first") == "<b>first</b>"
+    assert render("trending", 1, "second") == "<b>first</b>"
+
+    assert render.renders == [("trending", 1)]
+    assert fragments.stats()["hits"] == 1
+
+
+def test_new_version_renders_again(render):
+    render("trending", 1, "first")
+
+    assert render("trending", 2, "second") == "<b>second</b>"
+    assert render.renders == [("trending", 1), ("trending", 2)]
+
+
+def test_fragments_are_keyed_by_name(render):
+    assert render("trending", 1, "a") == "<b>a</b>"
+    assert render("recent", 1, "b") == "<b>b</b>"
+
+
+def test_cached_fragment_is_not_escaped_again(render):
+    render("trending", 1, "<i>x</i>")
+
+    # the label is escaped once, on the first render, and kept as markup
+    assert render("trending", 1, "") == "<b>&lt;i&gt;x&lt;/i&gt;</b>"
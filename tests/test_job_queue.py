@@ -0,0 +1,198 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.context import db, metrics
+from app.job_queue import JobQueue
+from app.models.queued_job import QueuedJob
+
+pytestmark = pytest.mark.mysql
+
+ATTEMPTS = 3
+
+
+@pytest.fixture
+def queue(mysql_app):
+    db.session.execute(db.delete(QueuedJob).where(QueuedJob.queue == "test"))
+    db.session.commit()
+
+    # wired by hand: init_app would also start the worker threads
+    queue = JobQueue("test", db, metrics, attempts=ATTEMPTS)
+    queue.app = mysql_app
+    queue.model = QueuedJob
+    # jobs are claimed and run by the tests, not by worker threads
+    queue._start = lambda: None
+
+    # keys in queue.failing raise, the others succeed
+    queue.failing = set()
+    handled = []
+
+    @queue.handler
+    def handle(key):
+        handled.append(key)
+
+        if key in queue.failing:
+            raise RuntimeError(f"{key} failed")
+
+    queue.handled = handled
+
+    abandoned = []
+    queue.on_abandon(lambda key, error: abandoned.append(key))
+    queue.abandoned = abandoned
+
+    return queue
+
+
+# A job held by a worker that died, with its lease already run out.
+def add_expired_job(key: str, attempts: int) -> None:
+    now = datetime.now()
+
+    db.session.execute(
+        db.insert(QueuedJob).values(
+            queue="test",
+            key=key,
+            state="running",
+            attempts=attempts,
+            run_after=now - timedelta(minutes=10),
+            lease_until=now - timedelta(minutes=1),
+            worker="dead:1",
+            created_at=now,
+            updated_at=now,
+        )
+    )
+    db.session.commit()
+
+
+def job_state(key: str) -> str:
+    return load_job(key).state
+
+
+def load_job(key: str) -> QueuedJob:
+    db.session.expire_all()
+
+    return db.session.execute(
+        db.select(QueuedJob).where(QueuedJob.queue == "test", QueuedJob.key == key)
+    ).scalar_one()
+
+
+# Makes a queued job due now, as if its backoff had passed.
+def make_due(key: str, attempts: int) -> None:
+    db.session.execute(
+        db.update(QueuedJob)
+        .where(QueuedJob.queue == "test", QueuedJob.key == key)
+        .values(attempts=attempts, run_after=datetime.now() - timedelta(seconds=1))
+    )
+    db.session.commit()
+
+
+def test_submitting_a_key_twice_queues_one_job(queue):
+    assert queue.submit("once")
+    assert not queue.submit("once")
+
+    assert db.session.scalar(
+        db.select(db.func.count())
+        .select_from(QueuedJob)
+        .where(QueuedJob.queue == "test", QueuedJob.key == "once")
+    ) == 1
+
+
+def test_successful_job_is_done(queue):
+    queue.submit("ok")
+
+    claimed = queue._claim()
+
+    assert claimed[1:] == ("ok", 1)
+    assert job_state("ok") == "running"
+
+    queue._run(*claimed)
+
+    job = load_job("ok")
+
+    assert (job.state, job.attempts, job.lease_until) == ("done", 1, None)
+    assert queue.handled == ["ok"]
+    assert queue._claim() is None
+
+
+def test_failed_attempt_is_retried_after_a_backoff(queue):
+    queue.failing.add("flaky")
+    queue.submit("flaky")
+
+    before = datetime.now()
+    queue._run(*queue._claim())
+
+    job = load_job("flaky")
+
+    assert (job.state, job.attempts) == ("queued", 1)
+    assert job.run_after > before
+    assert job.last_error == "flaky failed"
+    assert queue.abandoned == []
+
+    # not due until the backoff has passed
+    assert queue._claim() is None
+
+    queue.failing.clear()
+    make_due("flaky", 1)
+    queue._run(*queue._claim())
+
+    assert load_job("flaky").state == "done"
+    assert queue.handled == ["flaky", "flaky"]
+
+
+def test_last_failed_attempt_fails_and_abandons(queue):
+    queue.failing.add("broken")
+    queue.submit("broken")
+    make_due("broken", ATTEMPTS - 1)
+
+    claimed = queue._claim()
+
+    assert claimed[2] == ATTEMPTS
+
+    queue._run(*claimed)
+
+    assert job_state("broken") == "failed"
+    assert queue.abandoned == ["broken"]
+    assert queue._claim() is None
+
+
+def test_requeue_restarts_a_failed_job(queue):
+    queue.failing.add("retry-me")
+    queue.submit("retry-me")
+    make_due("retry-me", ATTEMPTS - 1)
+    queue._run(*queue._claim())
+
+    assert not queue.requeue("unknown")
+    assert queue.requeue("retry-me")
+
+    job = load_job("retry-me")
+
+    assert (job.state, job.attempts) == ("queued", 0)
+    assert not queue.requeue("retry-me")
+
+    queue.failing.clear()
+    queue._run(*queue._claim())
+
+    assert job_state("retry-me") == "done"
+
+
+def test_expired_job_with_attempts_left_is_reclaimed(queue):
+    add_expired_job("retry", ATTEMPTS - 1)
+
+    queue._fail_expired()
+    claimed = queue._claim()
+
+    assert claimed is not None
+    assert claimed[1:] == ("retry", ATTEMPTS)
+    assert job_state("retry") == "running"
+    assert queue.abandoned == []
+
+
+def test_expired_job_on_its_last_attempt_fails(queue):
+    add_expired_job("poison", ATTEMPTS)
+
+    assert queue._claim() is None
+
+    queue._fail_expired()
+
+    assert job_state("poison") == "failed"
+    assert queue.abandoned == ["poison"]
+    assert queue._claim() is None
@@ -0,0 +1,110 @@
+from typing import NamedTuple, Optional
+
+import pytest
+
+from app.ladder import MAX_HEVC_RUNGS, MAX_RUNGS, plan_ladder
+
+
+class SourceProfile(NamedTuple):
+    width: int
+    height: int
+    fps: float
+    bit_rate: Optional[int]
+
+
+# The shapes of uploads we see.
+SOURCE_PROFILES = {
+    "4K60 camera": SourceProfile(3840, 2160, 60, 50_000_000),
+    "1080p30 screen recording": SourceProfile(1920, 1080, 30, 2_000_000),
+    "1080p60 gameplay": SourceProfile(1920, 1080, 60, 12_000_000),
+    "1080p portrait phone": SourceProfile(1080, 1920, 30, 17_000_000),
+    "720p30 webcam": SourceProfile(1280, 720, 30, 1_500_000),
+    "480p legacy": SourceProfile(854, 480, 25, 900_000),
+    "360p upload": SourceProfile(640, 360, 30, None),
+    "tiny 176x144": SourceProfile(176, 144, 15, 64_000),
+    "odd-sized 1366x768": SourceProfile(1366, 768, 29.97, 3_000_000),
+    "scope 3840x1600": SourceProfile(3840, 1600, 24, 20_000_000),
+}
+
+
+@pytest.fixture(params=SOURCE_PROFILES.values(), ids=SOURCE_PROFILES.keys())
+def source(request) -> SourceProfile:
+    return request.param
+
+
+@pytest.fixture
+def ladder(source):
+    return plan_ladder(source.width, source.height, source.fps, source.bit_rate)
+
+
+def test_every_ladder_has_h264(ladder):
+    assert any(rendition.codec == "h264" for rendition in ladder)
+
+
+def test_no_rendition_upscales(source, ladder):
+    for rendition in ladder:
+        assert rendition.width <= source.width, rendition.key
+        assert rendition.height <= source.height, rendition.key
+
+
+def test_dimensions_are_even(ladder):
+    for rendition in ladder:
+        assert rendition.width % 2 == 0, rendition.key
+        assert rendition.height % 2 == 0, rendition.key
+
+
+def test_frame_rate_is_never_raised(source, ladder):
+    for rendition in ladder:
+        assert rendition.frame_rate <= source.fps, rendition.key
+
+
+def test_no_rendition_exceeds_source_bitrate(source, ladder):
+    if source.bit_rate is None:
+        pytest.skip("source bitrate unknown")
+
+    for rendition in ladder:
+        assert rendition.bitrate_bps <= source.bit_rate, rendition.key
+
+
+def test_orientation_is_kept(source, ladder):
+    for rendition in ladder:
+        assert (rendition.width >= rendition.height) == (
+            source.width >= source.height
+        ), rendition.key
+
+
+@pytest.mark.parametrize("codec", ["h264", "h265"])
+def test_bitrates_decrease_down_the_ladder(ladder, codec):
+    bitrates = [r.bitrate_bps for r in ladder if r.codec == codec]
+
+    assert bitrates == sorted(bitrates, reverse=True)
+
+
+def test_encodes_are_capped(ladder):
+    codecs = [rendition.codec for rendition in ladder]
+
+    assert codecs.count("h264") <= MAX_RUNGS
+    assert codecs.count("h265") <= MAX_HEVC_RUNGS
+
+
+def test_hevc_only_on_the_top_rungs(ladder):
+    rungs = [int(r.key[5:-1]) for r in ladder if r.codec == "h264"]
+    hevc_rungs = [int(r.key[5:-1]) for r in ladder if r.codec == "h265"]
+
+    assert hevc_rungs == [rung for rung in rungs[:MAX_HEVC_RUNGS] if rung >= 720]
+
+
+@pytest.mark.parametrize(
+    "width, height, keys",
+    [
+        (3840, 2160, ["2160p", "1080p", "720p", "480p", "360p", "240p"]),
+        (2560, 1440, ["1440p", "1080p", "720p", "480p", "360p", "240p"]),
+        (1920, 1080, ["1080p", "720p", "480p", "360p", "240p"]),
+        (854, 480, ["480p", "360p", "240p"]),
+        (176, 144, ["144p"]),
+    ],
+)
+def test_large_sources_keep_the_bottom_rungs(width, height, keys):
+    ladder = plan_ladder(width, height, 30)
+
+    assert [r.key for r in ladder if r.codec == "h264"] == [f"h264_{k}" for k in keys]
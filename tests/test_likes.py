@@ -0,0 +1,108 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import func
+
+from app.context import db, like_buffer
+from app.likes import set_like
+from app.models.likes import Likes
+from app.models.video import Video
+from app.models.video_activity import VideoActivity
+from app.models.video_stats import VideoStats
+from app.purge import purge_video
+
+from .seeding import clear_database, seed_catalogue
+
+pytestmark = pytest.mark.mysql
+
+USERS = 50
+WORKERS = 16
+OPS = 2000
+
+
+@pytest.fixture
+def video_id(mysql_app):
+    clear_database()
+    seed_catalogue(2, users=USERS)
+
+    # the seeded counters are synthetic; this test needs them exact
+    db.session.execute(db.update(VideoStats).values(like_count=0))
+    db.session.commit()
+
+    return 1
+
+
+def like_counts(video_id: int) -> tuple[int, int]:
+    # whatever another thread's buffer flush still holds is written first
+    like_buffer.flush()
+
+    with like_buffer.flush_lock:
+        pass
+
+    db.session.expire_all()
+
+    counted = db.session.scalar(
+        db.select(func.count(Likes.id)).where(Likes.video_id == video_id)
+    )
+    stored = db.session.scalar(
+        db.select(VideoStats.like_count).where(VideoStats.video_id == video_id)
+    )
+
+    return counted, stored
+
+
+def test_repeated_likes_and_unlikes_are_idempotent(mysql_app, video_id):
+    assert set_like(video_id, 1, True)
+    assert not set_like(video_id, 1, True)
+    assert set_like(video_id, 2, True)
+    assert set_like(video_id, 1, False)
+    assert not set_like(video_id, 1, False)
+
+    assert like_counts(video_id) == (1, 1)
+
+
+# Many threads like and unlike the same video for random users at once, as
+# concurrent clicks from several workers would; the coalesced counter must
+# end up equal to the number of likes rows.
+def test_like_count_stays_exact_under_concurrency(mysql_app, video_id):
+    def toggle(seed: int) -> None:
+        rng = random.Random(seed)
+
+        with mysql_app.app_context():
+            for _ in range(OPS // WORKERS):
+                set_like(video_id, rng.randint(1, USERS), rng.random() < 0.5)
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        list(executor.map(toggle, range(WORKERS)))
+
+    counted, stored = like_counts(video_id)
+
+    assert 0 < counted <= USERS
+    assert stored == counted
+
+
+# A video purged between the click and the flush gets no counters back, and
+# the deltas of the other videos in the same batch are still written.
+def test_deltas_of_purged_video_are_dropped(mysql_app, video_id):
+    purged_id = 2
+
+    # the background flush waits until the video is gone
+    with like_buffer.flush_lock:
+        assert set_like(video_id, 1, True)
+        assert set_like(purged_id, 1, True)
+
+        db.session.execute(
+            db.update(Video).where(Video.id == purged_id).values(status=4)
+        )
+        db.session.commit()
+        purge_video(purged_id, f"{purged_id:032x}")
+
+    assert like_counts(video_id) == (1, 1)
+    assert db.session.get(Video, purged_id) is None
+    assert db.session.get(VideoStats, purged_id) is None
+    assert not db.session.scalar(
+        db.select(func.count())
+        .select_from(VideoActivity)
+        .where(VideoActivity.video_id == purged_id)
+    )
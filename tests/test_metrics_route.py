@@ -0,0 +1,41 @@
+import pytest
+from flask import Flask
+
+from app.context import gae
+from app.routes.metrics import route_metrics_bp
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(route_metrics_bp)
+    return app.test_client()
+
+
+def test_metrics_disabled_without_token(client, monkeypatch):
+    monkeypatch.setattr(gae, "METRICS_TOKEN", None)
+
+    assert client.get("/api/metrics/").status_code == 404
+    assert client.get(
+        "/api/metrics/", headers={"Authorization": "Bearer anything"}
+    ).status_code == 404
+
+
+@pytest.mark.parametrize(
+    "authorization", [None, "Bearer wrong", "Basic s3cret", "s3cret", "Bearer "]
+)
+def test_metrics_rejects_missing_or_wrong_token(client, monkeypatch, authorization):
+    monkeypatch.setattr(gae, "METRICS_TOKEN", "s3cret")
+    headers = {"Authorization": authorization} if authorization else {}
+
+    assert client.get("/api/metrics/", headers=headers).status_code == 401
+
+
+def test_metrics_served_with_token(client, monkeypatch):
+    monkeypatch.setattr(gae, "METRICS_TOKEN", "s3cret")
+
+    response = client.get("/api/metrics/", headers={"Authorization": "Bearer s3cret"})
+
+    assert response.status_code == 200
+    assert "counters" in response.get_json()
+    assert "no-store" in response.headers["Cache-Control"]
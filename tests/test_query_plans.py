@@ -0,0 +1,126 @@
+import pytest
+from sqlalchemy import text
+
+from app.comments import comment_select
+from app.context import db
+from app.listing import video_card_select
+from app.models.comment import Comment
+from app.models.likes import Likes
+from app.models.video import Video
+from app.models.video_stats import VideoStats
+from app.models.views import Views
+from app.search import search_statement
+from app.watch_page import watch_page_select
+
+from .seeding import clear_database, seed_catalogue
+
+pytestmark = pytest.mark.mysql
+
+SAMPLE_HASH = f"{1:032x}"
+
+# The hot queries of the routes, with the tables each must reach through an
+# index; reading one of them with a full table scan (EXPLAIN type ALL) is a
+# plan regression.
+HOT_QUERIES = {
+    "video by hash": (
+        lambda: db.select(Video).where(Video.hash == SAMPLE_HASH),
+        {"videos"},
+    ),
+    "watch page by hash": (
+        lambda: watch_page_select().where(Video.hash == SAMPLE_HASH),
+        {"videos", "video_stats"},
+    ),
+    "video by transcoder job": (
+        lambda: db.select(Video).where(Video.job == "projects/sample/jobs/sample"),
+        {"videos"},
+    ),
+    "video likes by viewer": (
+        lambda: db.select(Likes).where(Likes.video_id == 1, Likes.user_id == 1),
+        {"likes"},
+    ),
+    "video comments page": (
+        lambda: comment_select(1)
+        .order_by(Comment.created_at.desc(), Comment.id.desc())
+        .limit(21),
+        {"comments"},
+    ),
+    "video views": (
+        lambda: db.select(Views.id).where(Views.video_id == 1),
+        {"views"},
+    ),
+    "most watched shelf": (
+        lambda: video_card_select().order_by(VideoStats.view_count.desc()).limit(4),
+        {"video_stats"},
+    ),
+    "most liked shelf": (
+        lambda: video_card_select()
+        .where(VideoStats.like_count > 0)
+        .order_by(VideoStats.like_count.desc())
+        .limit(4),
+        {"video_stats"},
+    ),
+    "trending shelf": (
+        lambda: video_card_select()
+        .where(VideoStats.trending_score > 0)
+        .order_by(VideoStats.trending_score.desc())
+        .limit(4),
+        {"video_stats"},
+    ),
+    "most recent shelf": (
+        lambda: video_card_select().order_by(db.desc(Video.id)).limit(4),
+        {"videos"},
+    ),
+    "user videos shelf": (
+        lambda: video_card_select()
+        .where(Video.user_id == 1)
+        .order_by(db.desc(Video.id))
+        .limit(4),
+        {"videos"},
+    ),
+    "recent listing page": (
+        lambda: video_card_select()
+        .order_by(Video.created_at.desc(), Video.id.desc())
+        .limit(25),
+        {"videos"},
+    ),
+    "search results": (
+        lambda: search_statement("cat").limit(21),
+        {"videos"},
+    ),
+    "channel listing page": (
+        lambda: video_card_select()
+        .where(Video.user_id == 1)
+        .order_by(Video.created_at.desc(), Video.id.desc())
+        .limit(25),
+        {"videos"},
+    ),
+}
+
+
+# enough rows that a full scan is never the cheaper plan
+@pytest.fixture(scope="module")
+def catalogue(mysql_app):
+    clear_database()
+    seed_catalogue(
+        5_000, users=200, views_per_video=5, likes_per_video=3, comments_per_video=3
+    )
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_uses_indexes(catalogue, name):
+    build, indexed_tables = HOT_QUERIES[name]
+    compiled = build().compile(
+        dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}
+    )
+
+    rows = [
+        dict(row._mapping) for row in db.session.execute(text(f"EXPLAIN {compiled}"))
+    ]
+
+    full_scans = [
+        row["table"]
+        for row in rows
+        if row.get("table") in indexed_tables and row.get("type") == "ALL"
+    ]
+
+    assert not full_scans, f"{name} scans {full_scans}: {rows}"
@@ -0,0 +1,76 @@
+from time import perf_counter
+
+import pytest
+from sqlalchemy import func
+
+from app.context import db
+from app.metrics import percentile
+from app.models.user import User
+from app.models.video import Video
+from app.models.views import Views
+from app.search import RESULTS_PER_PAGE, normalize_query, search_statement
+
+from .seeding import clear_database, seed_catalogue
+
+pytestmark = [pytest.mark.mysql, pytest.mark.benchmark]
+
+CORPUS_SIZES = (10_000, 100_000, 1_000_000)
+QUERIES = ("a", "cat", "funny dog", "piano cover tutorial", "nothingmatches")
+RUNS = 20
+
+
+# the pre-FULLTEXT search, as the baseline
+def ilike_statement(query: str):
+    return (
+        db.select(Video, func.count(Views.id).label("view_count"), User.picture)
+        .outerjoin(Views, Video.id == Views.video_id)
+        .join(User, User.id == Video.user_id)
+        .where(Video.status == 0)
+        .where(Video.title.ilike(f"%{query}%"))
+        .group_by(Video.id, User.picture)
+    )
+
+
+def fulltext_statement(query: str):
+    return search_statement(normalize_query(query)).limit(RESULTS_PER_PAGE + 1)
+
+
+# One seeded catalogue per size, with a few raw views per video so the
+# baseline's per-row view count costs what it did in production.
+@pytest.fixture(scope="module", params=CORPUS_SIZES, ids=lambda size: f"{size}")
+def corpus(request, mysql_app):
+    clear_database()
+    seed_catalogue(request.param, users=1_000, views_per_video=2)
+    return request.param
+
+
+@pytest.mark.parametrize(
+    "name, build", [("ilike", ilike_statement), ("fulltext", fulltext_statement)]
+)
+def test_search_latency(corpus, name, build, benchmark_report):
+    timings = []
+
+    for query in QUERIES:
+        # warm the buffer pool, so every run measures the same thing
+        db.session.execute(build(query)).all()
+
+        for _ in range(RUNS):
+            started = perf_counter()
+            db.session.execute(build(query)).all()
+            timings.append(perf_counter() - started)
+
+    timings.sort()
+
+    benchmark_report.append(
+        f"search {name:>8} @ {corpus:>9,} videos:"
+        f" p50 {percentile(timings, 0.5) * 1000:.2f} ms,"
+        f" p99 {percentile(timings, 0.99) * 1000:.2f} ms,"
+        f" max {timings[-1] * 1000:.2f} ms"
+    )
+
+
+# a one-letter query no longer materializes the catalogue
+def test_fulltext_results_are_bounded(corpus):
+    for query in QUERIES:
+        rows = db.session.execute(fulltext_statement(query)).all()
+        assert len(rows) <= RESULTS_PER_PAGE + 1
@@ -0,0 +1,45 @@
+import pytest
+from flask import Flask
+
+from app.routes import search
+from app.search import MAX_PAGE
+
+
+# Records the page searched and the template context instead of querying and
+# rendering.
+@pytest.fixture
+def rendered(monkeypatch):
+    calls = []
+
+    def search_videos(query, page):
+        calls.append(page)
+        return [], False
+
+    def render_template(template, **context):
+        calls.append(context)
+        return ""
+
+    monkeypatch.setattr(search, "search_videos", search_videos)
+    monkeypatch.setattr(search, "render_template", render_template)
+
+    return calls
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(search.route_search_bp)
+    return app.test_client()
+
+
+@pytest.mark.parametrize(
+    "page, expected",
+    [("2", 2), ("999", MAX_PAGE), ("-3", 1), ("0", 1), ("x", 1)],
+)
+def test_search_page_is_clamped_once(client, rendered, page, expected):
+    client.get(f"/search/?query=cat&page={page}")
+
+    searched, context = rendered
+
+    assert searched == expected
+    assert context["page"] == expected
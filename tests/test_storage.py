@@ -0,0 +1,87 @@
+import pytest
+
+from app.storage import LocalBackend, StorageBackend, StorageManager
+
+
+@pytest.fixture
+def storage(tmp_path):
+    manager = StorageManager("", None, "local", str(tmp_path))
+
+    for index in range(250):
+        manager.upload_bytes(b"x", f"transcoded/abc/segment{index:03d}.m4s", "")
+
+    manager.upload_bytes(b"x", "transcoded/other/manifest.mpd", "")
+
+    return manager
+
+
+# Fails the first `failures` delete batches, as a flaky bucket would.
+def fail_deletes(manager: StorageManager, failures: int) -> None:
+    delete_many = manager.backend.delete_many
+    remaining = [failures]
+
+    def flaky(paths):
+        if remaining[0] > 0:
+            remaining[0] -= 1
+            raise ConnectionError("connection reset")
+
+        delete_many(paths)
+
+    manager.backend.delete_many = flaky
+
+
+def test_delete_prefix_deletes_only_the_prefix(storage):
+    reports = []
+
+    deleted = storage.delete_prefix(
+        "transcoded/abc/", progress=lambda done, total: reports.append((done, total))
+    )
+
+    assert deleted == 250
+    assert storage.backend.list_paths("transcoded/abc/") == []
+    assert storage.backend.list_paths("transcoded/other/") == [
+        "transcoded/other/manifest.mpd"
+    ]
+    assert reports[-1] == (250, 250)
+    assert all(done <= total for done, total in reports)
+    assert [done for done, _ in reports] == sorted(done for done, _ in reports)
+
+
+def test_delete_prefix_retries_failed_batches(storage):
+    fail_deletes(storage, 1)
+    reports = []
+
+    deleted = storage.delete_prefix(
+        "transcoded/abc/", progress=lambda done, total: reports.append((done, total))
+    )
+
+    assert deleted == 250
+    assert storage.backend.list_paths("transcoded/abc/") == []
+    assert all(total == 250 and done <= total for done, total in reports)
+
+
+# the listing after the last attempt decides, not the attempt count
+def test_delete_prefix_succeeding_on_last_attempt_is_not_an_error(storage):
+    assert storage.delete_prefix("transcoded/abc/", attempts=1) == 250
+
+
+def test_delete_prefix_raises_when_objects_remain(storage):
+    fail_deletes(storage, 1_000)
+
+    with pytest.raises(RuntimeError, match="250 object"):
+        storage.delete_prefix("transcoded/abc/", attempts=2)
+
+
+def test_delete_empty_prefix(storage):
+    assert storage.delete_prefix("transcoded/missing/") == 0
+
+
+def test_incomplete_backend_fails_on_instantiation(tmp_path):
+    class ExistsOnlyBackend(StorageBackend):
+        def exists(self, path: str) -> bool:
+            return False
+
+    assert LocalBackend(str(tmp_path))
+
+    with pytest.raises(TypeError, match="delete_many"):
+        ExistsOnlyBackend()
@@ -0,0 +1,92 @@
+import os
+from time import perf_counter
+
+import pytest
+from flask import Flask
+
+from app.context import storage_manager
+from app.metrics import percentile
+from app.routes.storage import IMMUTABLE_MAX_AGE, route_storage_bp
+from app.storage import LocalBackend
+
+SEGMENT_SIZE = 2_000_000
+SEGMENTS = 20
+RUNS = 5
+RANGE_SIZE = 256 * 1024
+
+
+# The storage routes over a LocalBackend of their own, with synthetic
+# segments written under transcoded/.
+@pytest.fixture
+def segments(tmp_path, monkeypatch):
+    backend = LocalBackend(str(tmp_path))
+    monkeypatch.setattr(storage_manager, "backend", backend)
+
+    def write(size: int, count: int) -> list[str]:
+        paths = [f"transcoded/bench/segment{i:04d}.m4s" for i in range(count)]
+
+        for path in paths:
+            backend.upload_bytes(os.urandom(size), path, "video/iso.segment")
+
+        return [backend.public_url(path) for path in paths]
+
+    return write
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(route_storage_bp)
+    return app.test_client()
+
+
+def test_segments_are_served_whole_and_by_range(segments, client):
+    (url,) = segments(4096, 1)
+
+    full = client.get(url)
+
+    assert full.status_code == 200
+    assert len(full.get_data()) == 4096
+    assert full.cache_control.max_age == IMMUTABLE_MAX_AGE
+
+    partial = client.get(url, headers={"Range": "bytes=0-99"})
+
+    assert partial.status_code == 206
+    assert len(partial.get_data()) == 100
+
+    revalidated = client.get(url, headers={"If-None-Match": full.headers["ETag"]})
+
+    assert revalidated.status_code == 304
+
+
+# The test client reads responses in Python, so this measures the app's
+# per-request overhead; under gunicorn the body is sent with sendfile().
+@pytest.mark.benchmark
+@pytest.mark.parametrize(
+    "name, headers, expected",
+    [("full", {}, 200), ("range", {"Range": f"bytes=0-{RANGE_SIZE - 1}"}, 206)],
+)
+def test_segment_serving_throughput(
+    segments, client, name, headers, expected, benchmark_report
+):
+    urls = segments(SEGMENT_SIZE, SEGMENTS)
+    timings, sent = [], 0
+
+    for _ in range(RUNS):
+        for url in urls:
+            started = perf_counter()
+            response = client.get(url, headers=headers)
+            body = response.get_data()
+            timings.append(perf_counter() - started)
+
+            assert response.status_code == expected
+            sent += len(body)
+
+    timings.sort()
+
+    benchmark_report.append(
+        f"storage {name}: {len(timings)} request(s),"
+        f" {sent / sum(timings) / 1e6:.1f} MB/s,"
+        f" p50 {percentile(timings, 0.5) * 1000:.2f} ms,"
+        f" p99 {percentile(timings, 0.99) * 1000:.2f} ms"
+    )
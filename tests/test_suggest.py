@@ -0,0 +1,112 @@
+from threading import Event
+
+import pytest
+from flask import Flask
+
+from app.routes import search
+from app.signals import video_deleted, video_published
+from app.suggest import SuggestIndex
+
+VIDEOS = [
+    (1, "Cat videos compilation", 10_000),
+    (2, "Car repair guide", 50),
+    (3, "Cats vs dogs", 500),
+    (4, "Dog training", 5),
+]
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = SuggestIndex(limit=3)
+    index.loader(lambda: VIDEOS)
+    index.init_app(Flask(__name__))
+
+    # the signal receivers and the route use the shared index
+    monkeypatch.setattr(search, "suggest_index", index)
+
+    return index
+
+
+def publish(video_id: int, title: str, hidden: int = 0) -> None:
+    video_published.send(
+        None,
+        video_id=video_id,
+        video_hash=f"{video_id:032x}",
+        title=title,
+        hidden=hidden,
+    )
+
+
+def test_prefix_ranks_terms_by_popularity(index):
+    assert index.suggest("ca") == ["cat", "cat videos compilation", "cats"]
+    assert index.suggest("CAR ") == ["car", "car repair guide"]
+    assert index.suggest("dog", limit=1) == ["dogs"]
+    assert index.suggest("  ") == []
+    assert index.suggest("zebra") == []
+
+
+def test_published_and_deleted_videos_follow_the_signals(index):
+    assert index.suggest("zebra") == []
+
+    publish(5, "Zebra crossing")
+
+    assert index.suggest("zebra") == ["zebra", "zebra crossing"]
+
+    publish(6, "Zebras hidden", hidden=1)
+
+    assert "zebras" not in index.suggest("zebra")
+
+    video_deleted.send(None, video_id=5, video_hash=f"{5:032x}")
+
+    assert index.suggest("zebra") == []
+
+
+def test_short_prefix_memo_is_invalidated(index):
+    assert index.suggest("zo") == []
+    assert "zo" in index.memo
+
+    publish(7, "Zoo tour")
+
+    assert "zo" not in index.memo
+    assert index.suggest("zo") == ["zoo", "zoo tour"]
+
+    video_deleted.send(None, video_id=7, video_hash=f"{7:032x}")
+
+    assert index.suggest("zo") == []
+
+
+def test_expired_index_starts_one_background_reload(index, monkeypatch):
+    index.suggest("ca")
+    index.loaded_at -= index.ttl + 1
+
+    started, release = Event(), Event()
+    reloads = []
+
+    def slow_reload():
+        reloads.append(1)
+        started.set()
+        release.wait(5)
+
+    monkeypatch.setattr(index, "reload", slow_reload)
+
+    for _ in range(10):
+        index.suggest("ca")
+
+    assert started.wait(5)
+    release.set()
+
+    assert reloads == [1]
+
+
+def test_suggest_route_response(index):
+    app = Flask(__name__)
+    app.register_blueprint(search.route_search_bp)
+
+    response = app.test_client().get("/search/suggest?q=ca")
+
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "suggestions": ["cat", "cat videos compilation", "cats"]
+    }
+    assert response.cache_control.public
+    assert response.cache_control.max_age == 60
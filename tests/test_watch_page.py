@@ -0,0 +1,147 @@
+from time import perf_counter
+
+import pytest
+from sqlalchemy import event
+
+from app.context import counter_cache, db, storage_manager, watch_cache
+from app.metrics import percentile
+from app.models.video import Video
+from app.publishing import (
+    hls_manifest_path,
+    manifest_path,
+    publish_video,
+    seek_preview_paths,
+    thumbnail_path,
+)
+from app.watch_page import load_watch_page
+
+from .seeding import clear_database, seed_catalogue
+
+pytestmark = pytest.mark.mysql
+
+RUNS = 100
+
+
+def video_hash(video_id: int) -> str:
+    return f"{video_id:032x}"
+
+
+@pytest.fixture(scope="module")
+def catalogue(mysql_app):
+    clear_database()
+    seed_catalogue(50, users=20, comments_per_video=30)
+
+
+@pytest.fixture
+def statements():
+    executed = []
+
+    def record(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(db.engine, "before_cursor_execute", record)
+
+
+def set_status(video_id: int, status: int) -> None:
+    db.session.execute(
+        db.update(Video).where(Video.id == video_id).values(status=status)
+    )
+    db.session.commit()
+
+
+# Requests the page through the test client, the first one with cold caches;
+# reports queries per request and latency, and checks that warm requests
+# never read the video again.
+def test_watch_page_queries_and_latency(
+    catalogue, mysql_app, statements, benchmark_report
+):
+    client = mysql_app.test_client()
+    watch_cache.discard(video_hash(1))
+    counter_cache.discard(1)
+
+    timings, queries, video_reads = [], [], []
+
+    for _ in range(RUNS + 1):
+        statements.clear()
+        started = perf_counter()
+        response = client.get(f"/watch/{video_hash(1)}")
+        timings.append(perf_counter() - started)
+
+        assert response.status_code == 200
+
+        queries.append(len(statements))
+        video_reads.append(sum("FROM videos" in sql for sql in statements))
+
+    warm = sorted(timings[1:])
+
+    benchmark_report.append(
+        f"watch page cold: {queries[0]} queries, {timings[0] * 1000:.2f} ms;"
+        f" warm: {sum(queries[1:]) / RUNS:.1f} queries/request,"
+        f" p50 {percentile(warm, 0.5) * 1000:.2f} ms,"
+        f" p99 {percentile(warm, 0.99) * 1000:.2f} ms"
+    )
+
+    assert video_reads[0] > 0
+    # the counters may expire once during the run, nothing else reads videos
+    assert sum(video_reads[1:]) <= 1
+    assert max(queries[1:]) <= queries[0]
+
+
+def test_unpublished_video_is_not_cached(catalogue):
+    set_status(2, 1)
+    watch_cache.discard(video_hash(2))
+
+    page = load_watch_page(video_hash(2))
+
+    assert page.video.status == 1
+    assert page.video.video_url is None
+    assert watch_cache.get(video_hash(2)) is None
+
+    # published through another worker: seen on the very next request
+    set_status(2, 0)
+
+    assert load_watch_page(video_hash(2)).video.video_url is not None
+
+
+def test_video_deleted_through_another_worker_stops_being_served(catalogue):
+    assert load_watch_page(video_hash(3)) is not None
+    assert watch_cache.get(video_hash(3)) is not None
+
+    # no signal reaches this worker, only the counter ttl runs out
+    set_status(3, 4)
+    counter_cache.discard(3)
+
+    assert load_watch_page(video_hash(3)) is None
+    assert watch_cache.get(video_hash(3)) is None
+
+
+def test_publish_records_seek_previews_and_watch_page_skips_storage(
+    catalogue, monkeypatch
+):
+    set_status(4, 1)
+
+    for path in (
+        manifest_path(video_hash(4)),
+        hls_manifest_path(video_hash(4)),
+        thumbnail_path(video_hash(4)),
+        *seek_preview_paths(video_hash(4)),
+    ):
+        storage_manager.upload_bytes(b"x", path, "application/octet-stream")
+
+    publish_video(db.session.get(Video, 4))
+
+    assert db.session.get(Video, 4).seek_previews == 1
+
+    checks = []
+    monkeypatch.setattr(
+        storage_manager.backend, "exists", lambda path: checks.append(path)
+    )
+    watch_cache.discard(video_hash(4))
+
+    page = load_watch_page(video_hash(4))
+
+    assert page.video.thumbnails_url is not None
+    assert page.video.hls_url is not None
+    assert checks == []